@@ -3,19 +3,39 @@ warnings.filterwarnings("ignore", category=UserWarning)
 from flask import Flask, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 import os, json
+import uuid
 from werkzeug.utils import secure_filename
-import pandas as pd
 from datetime import datetime
-from label_column_selector import select_label_column
-from sklearn.model_selection import train_test_split
-from data_processing import process_data
-from before_after import data_comparison
-from flask_socketio import SocketIO, emit
-import torch
-import torch.nn as nn
-import torch.optim as optim
-from torch.utils.data import DataLoader, TensorDataset
-from sklearn.metrics import precision_score, recall_score, accuracy_score, confusion_matrix
+from utils.artifact_cache import ArtifactCache
+from utils.background_jobs import BackgroundJobs
+from utils.lazy_module import LazyModule
+from utils.native_threads import NativeThreads
+from utils.training_runs import TrainingRuns
+from flask_socketio import SocketIO, emit, join_room
+from progress_channel import DEFAULT_INTERVAL, ProgressChannel
+
+# pandas, torch, sklearn and the modules using them are imported on first use, so the server starts
+# (and serves static files and light routes) without waiting for the machine learning stack
+pd = LazyModule('pandas')
+torch = LazyModule('torch')
+nn = LazyModule('torch.nn')
+label_column_selector = LazyModule('label_column_selector')
+column_projection = LazyModule('column_projection')
+data_processing = LazyModule('data_processing')
+data_splitter = LazyModule('data_splitter')
+pipeline_plan = LazyModule('pipeline_plan')
+before_after = LazyModule('before_after')
+data_profile = LazyModule('data_profile')
+duplicates = LazyModule('duplicates')
+ingestion = LazyModule('ingestion')
+downloads = LazyModule('downloads')
+row_index = LazyModule('row_index')
+resource_manager = LazyModule('resource_manager')
+distributed_training = LazyModule('distributed_training')
+training = LazyModule('training')
+typed_loader = LazyModule('typed_loader')
+model_export = LazyModule('model_export')
+model_cost = LazyModule('model_cost')
 
 
 # Create a Flask application instance
@@ -24,28 +44,67 @@ app = Flask(__name__, static_folder='../client/build', static_url_path='')
 # Set a secret key for the application
 app.config['SECRET_KEY'] = 'secret!'
 
-# Initialize Flask-SocketIO with CORS (Cross-Origin Resource Sharing) allowed for localhost:3000
-socketio = SocketIO(app, cors_allowed_origins="http://localhost:3000")
+# Initialize Flask-SocketIO with CORS (Cross-Origin Resource Sharing) allowed for localhost:3000. The async
+# mode (threading, eventlet or gevent) and the message queue shared by several server processes
+# (e.g. redis://localhost:6379/0) are set by the production entry point, serve.py
+socketio = SocketIO(app, cors_allowed_origins="http://localhost:3000",
+                    async_mode=os.environ.get('SOCKETIO_ASYNC_MODE') or None,
+                    message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None)
 
 # Set up CORS for the Flask app to allow requests from the specified origin
 CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
 
-# Define the folders for uploading files, storing original data, and saving model configurations
+# Define the folders for uploading files, storing original data, saving model configurations and caching derived artifacts
 UPLOAD_FOLDER = 'uploaded_files'
 ORIGINAL_DATA_FOLDER = 'original_data'
 MODEL_CONFIGS = 'model_configs'
+CACHE_FOLDER = 'cache'
+RUNS_FOLDER = 'runs'
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls', 'json', 'txt'}
 
 # Configure the application to use the defined folders
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['ORIGINAL_DATA_FOLDER'] = ORIGINAL_DATA_FOLDER
 app.config['MODEL_CONFIGS'] = MODEL_CONFIGS
+app.config['CACHE_FOLDER'] = CACHE_FOLDER
+app.config['RUNS_FOLDER'] = RUNS_FOLDER
+
+# Threads and cores used by training jobs: 0 threads chooses per job from the model size, and an
+# empty affinity (e.g. '0-7' to pin) leaves the jobs free to run on any core. Only the worker
+# processes of distributed training are pinned; a run in the server process uses the affinity
+# for its thread count alone
+app.config['TRAINING_THREADS'] = int(os.environ.get('TRAINING_THREADS', 0))
+app.config['TRAINING_INTEROP_THREADS'] = int(os.environ.get('TRAINING_INTEROP_THREADS', 0))
+app.config['TRAINING_CPU_AFFINITY'] = os.environ.get('TRAINING_CPU_AFFINITY', '')
+# Number of processes hashing rows when the duplicate index of a dataset is built; 1 hashes in the calling thread
+app.config['DUPLICATE_WORKERS'] = int(os.environ.get('DUPLICATE_WORKERS', 1))
+# Number of local processes training data-parallel replicas; 1 trains in the server process
+app.config['TRAINING_WORKERS'] = int(os.environ.get('TRAINING_WORKERS', 1))
+# Most worker processes a run may request; 0 allows one per core usable for training
+app.config['TRAINING_MAX_WORKERS'] = int(os.environ.get('TRAINING_MAX_WORKERS', 0))
+
+def warm_up():
+    """
+    Imports the lazily loaded modules and applies the process-wide torch settings.
+
+    Optional: without it, each module is loaded by the first request that needs it. Production
+    workers call it in the background once they are serving, so neither startup nor the first
+    training run waits for the machine learning stack.
+    """
+    for module in [pd, torch, nn, label_column_selector, column_projection, data_processing, data_splitter, pipeline_plan,
+                   before_after, data_profile, duplicates, ingestion, downloads, row_index, resource_manager,
+                   distributed_training, training, typed_loader, model_export, model_cost]:
+        module.load()
+    resource_manager.configure_process(app.config)
 
 # Create the folders if they do not exist
-for folder in [UPLOAD_FOLDER, ORIGINAL_DATA_FOLDER, MODEL_CONFIGS]:
+for folder in [UPLOAD_FOLDER, ORIGINAL_DATA_FOLDER, MODEL_CONFIGS, CACHE_FOLDER, RUNS_FOLDER]:
     if not os.path.exists(folder):
         os.makedirs(folder)
 
+# Maximum number of rows returned by a single preview request
+MAX_PREVIEW_ROWS = 1000
+
 # Define a function to check if a file's extension is allowed
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -58,7 +117,13 @@ def catch_all(path):
 
 @app.route('/api/data-summary', methods=['GET'])
 def data_summary():
-    """Generate a summary of the uploaded data file including column details and overall statistics."""
+    """
+    Generate a summary of the uploaded data file including column details and overall statistics.
+
+    Query parameters: mode ('auto', 'approximate' or 'exact'; defaults to 'auto'). Unless 'exact'
+    is requested, the summary is served from the file's cached profile (or an estimate from its
+    head while the profile is built in the background) and carries 95% error bounds.
+    """
     try:
         # Retrieve the path of the original uploaded file
         original_file_path = get_original_uploaded_file_path()
@@ -66,29 +131,69 @@ def data_summary():
         if not original_file_path:
             return jsonify({'error': 'No data file uploaded'}), 404
 
-        # Read the dataset
-        df = pd.read_csv(original_file_path)
-        # Create a summary of the data
+        if request.args.get('mode', 'auto') == 'exact':
+            return jsonify(exact_summary(original_file_path))
+
+        # Serve the cheapest available statistics and refresh them in the background if they are not exact
+        stats = data_profile.summarize(original_file_path, app.config['CACHE_FOLDER'])
+        refreshing = data_profile.refresh_in_background(original_file_path, app.config['CACHE_FOLDER'], app.config['DUPLICATE_WORKERS']) if stats['method'] != 'exact' else False
+        num_rows = stats['num_rows']
+        bounds = stats['error_bounds']
         summary = {
-            'columns': df.columns.tolist(),
+            'columns': stats['columns'],
             'summary': {
                 col: {
-                    'data_type': convert_dtype(str(df[col].dtype)),  # Convert data types for readability
-                    'missing_values': int(df[col].isnull().sum()),  # Count missing values
-                    'percent_missing': float((df[col].isnull().sum() / len(df)) * 100)  # Calculate percentage of missing values
-                } for col in df.columns
+                    'data_type': convert_dtype(stats['dtypes'][col]),  # Convert data types for readability
+                    'missing_values': stats['missing'][col],  # Count missing values
+                    'percent_missing': float(stats['missing'][col] / num_rows * 100) if num_rows else 0.0  # Calculate percentage of missing values
+                } for col in stats['columns']
             },
-            'row_count': len(df),  # Total number of rows
-            'duplicate_count': int(df.duplicated().sum())  # Count duplicate rows
+            'row_count': num_rows,  # Total number of rows
+            'duplicate_count': stats['duplicate_count'],  # Count duplicate rows
+            'approximate': stats['approximate'],
+            'method': stats['method'],
+            'error_bounds': {
+                'row_count': bounds['row_count'],
+                'duplicate_count': bounds['duplicate_count'],
+                'missing_values': bounds['missing_values'],
+                'percent_missing': {col: float(bound / num_rows * 100) if num_rows else 0.0 for col, bound in bounds['missing_values'].items()}
+            },
+            'refreshing': refreshing  # Whether exact statistics are being computed in the background
         }
-        
         return jsonify(summary)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+def exact_summary(original_file_path):
+    """Computes the data summary by reading the whole file."""
+    # Read the dataset with its compact schema
+    df = typed_loader.read_typed(original_file_path, app.config['CACHE_FOLDER'])
+    # Create a summary of the data
+    return {
+        'columns': df.columns.tolist(),
+        'summary': {
+            col: {
+                'data_type': convert_dtype(str(df[col].dtype)),  # Convert data types for readability
+                'missing_values': int(df[col].isnull().sum()),  # Count missing values
+                'percent_missing': float((df[col].isnull().sum() / len(df)) * 100)  # Calculate percentage of missing values
+            } for col in df.columns
+        },
+        'row_count': len(df),  # Total number of rows
+        'duplicate_count': duplicates.get_duplicate_index(original_file_path, app.config['CACHE_FOLDER'], workers=app.config['DUPLICATE_WORKERS']).duplicate_count,  # Count duplicate rows from the cached row-hash index
+        'approximate': False,
+        'method': 'exact',
+        'refreshing': False
+    }
     
 @app.route('/api/visualization-data', methods=['GET'])
 def visualization_data():
-    """Provide data for visualizing the distribution of values in a specific column."""
+    """
+    Provide data for visualizing the distribution of values in a specific column.
+
+    Once the file's profile exists, the counts of the most frequent values are estimated from its
+    count-min sketch instead of reading the column (unless mode=exact is requested); 'error_bound'
+    is then the largest possible overcount.
+    """
     try:
         column_name = request.args.get('columnName')  # Get the column name from the query parameters
 
@@ -96,11 +201,17 @@ def visualization_data():
         if not original_file_path:
             return jsonify({'error': 'No data file uploaded'}), 404
 
-        df = pd.read_csv(original_file_path)
+        profile = data_profile.load_profile(original_file_path, app.config['CACHE_FOLDER']) if request.args.get('mode', 'auto') != 'exact' else None
+        if profile is not None and column_name in profile.columns:
+            labels, values, error_bound = profile.value_counts(column_name)
+            return jsonify({'labels': [label.item() if hasattr(label, 'item') else label for label in labels],
+                            'values': values, 'approximate': True, 'error_bound': error_bound})
 
-        if column_name not in df.columns:
+        if column_name not in column_projection.read_header(original_file_path):
             return jsonify({'error': 'Column not found'}), 404
 
+        # Read only the requested column, with its compact dtype
+        df = typed_loader.read_typed(original_file_path, app.config['CACHE_FOLDER'], usecols=[column_name])
         column_data = df[column_name].value_counts().to_dict()  # Aggregate data by value counts
 
         visualization_data = {
@@ -113,33 +224,31 @@ def visualization_data():
         return jsonify({'error': str(e)}), 500
     
 def convert_dtype(python_dtype):
-    """Convert Python data types to more generic types for JavaScript."""
+    """Convert Python data types, including the compact ones of the typed loader, to more generic types for JavaScript."""
     mapping = {
-        'float64': 'number',
-        'int64': 'number',
         'object': 'string',
+        'category': 'string',
+        'string': 'string',
         'bool': 'boolean',
+        'boolean': 'boolean',
         'datetime64[ns]': 'date'
     }
+    if typed_loader.is_numeric(python_dtype):
+        return 'number'
     return mapping.get(python_dtype, 'unknown')  # Use 'unknown' for data types not explicitly mapped
 
-def get_latest_uploaded_file_path():
-    """Retrieve the path of the most recently uploaded data file."""
-    try:
-        # List all CSV files in the upload directory
-        data_files = [f for f in os.listdir(app.config['UPLOAD_FOLDER']) if f.endswith('.csv') and os.path.isfile(os.path.join(app.config['UPLOAD_FOLDER'], f))]
-        
-        # Return None if no data files are found
-        if not data_files:
-            return None
+def get_current_dataset():
+    """
+    Retrieve the dataset the wizard steps work on: the originally uploaded file and the columns kept after dropping columns.
+
+    Returns:
+    - Tuple (file_path, columns), or (None, None) if no file has been uploaded.
+    """
+    file_path = get_original_uploaded_file_path()
+    if not file_path:
+        return None, None
+    return file_path, column_projection.load_projection(app.config['UPLOAD_FOLDER'], file_path)
 
-        # Identify the latest file based on the last modification time
-        latest_file = max(data_files, key=lambda x: os.path.getmtime(os.path.join(app.config['UPLOAD_FOLDER'], x)))
-        return os.path.join(app.config['UPLOAD_FOLDER'], latest_file)
-    except Exception as e:
-        print(f"Error getting latest uploaded file: {e}")
-        return None
-    
 def get_original_uploaded_file_path():
     """Fetch the path of the originally uploaded file from a specific directory."""
     try:
@@ -175,15 +284,38 @@ def upload_file():
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         filename, file_extension = os.path.splitext(file.filename)
         new_filename = f"{filename}_{timestamp}{file_extension}"
-        secure_filename(new_filename)  # Ensure the filename is secure
+        new_filename = secure_filename(new_filename)  # Ensure the filename is secure
         file_path = os.path.join(app.config['ORIGINAL_DATA_FOLDER'], new_filename)
 
         file.save(file_path)  # Save the file to the designated folder
-        return jsonify({'message': 'File uploaded successfully'}), 200
+
+        # Start profiling the file so the summary pages can be served without scanning it
+        start_profiling = lambda canonical_path: data_profile.refresh_in_background(canonical_path, app.config['CACHE_FOLDER'], app.config['DUPLICATE_WORKERS'])
+        if file_extension.lower() == '.csv':
+            start_profiling(ingestion.ingest_upload(file_path))
+            return jsonify({'message': 'File uploaded successfully'}), 200
+
+        # Convert xlsx, xls, json and txt uploads once into the canonical CSV read by all endpoints, in the background
+        ingestion.ingest_in_background(file_path, start_profiling)
+        return jsonify({'message': 'File uploaded, converting', 'upload': new_filename}), 202
 
     # Return an error if the file type is not allowed
     return jsonify({'error': 'Invalid file type'}), 400
 
+@app.route('/api/upload-status', methods=['GET'])
+def upload_status():
+    """
+    Endpoint reporting the conversion of a non-CSV upload.
+
+    Query parameters: upload (the name returned by /api/upload). The 'state' is 'converting',
+    'ready' or 'failed', with the 'error' of a failed conversion.
+    """
+    upload = secure_filename(request.args.get('upload', ''))
+    status = ingestion.get_status(os.path.join(app.config['ORIGINAL_DATA_FOLDER'], upload)) if upload else None
+    if status is None:
+        return jsonify({'error': 'Upload not found'}), 404
+    return jsonify(status)
+
 @app.route('/api/columns', methods=['GET'])
 def get_columns():
     """Endpoint to retrieve column names from the original uploaded dataset."""
@@ -194,10 +326,8 @@ def get_columns():
         if not file_path:
             return jsonify({'error': 'No data file uploaded'}), 404
 
-        # Read the CSV file to a pandas DataFrame
-        df = pd.read_csv(file_path)
-        # Return the list of columns in the DataFrame
-        return jsonify(df.columns.tolist())
+        # Read only the header of the CSV file and return its list of columns
+        return jsonify(column_projection.read_header(file_path))
     except Exception as e:
         # Return any errors that occur during the process
         return jsonify({'error': str(e)}), 500
@@ -206,23 +336,26 @@ def get_columns():
 def get_columns_for_label():
     """Endpoint to retrieve column names for selecting the label column in the dataset."""
     try:
-        # Get the path of the latest uploaded data file
-        file_path = get_latest_uploaded_file_path()
+        # Get the uploaded dataset and the columns left after dropping columns
+        file_path, columns = get_current_dataset()
         # If no file has been uploaded, return an error message
         if not file_path:
             return jsonify({'error': 'No data file uploaded'}), 404
 
-        # Read the CSV file to a pandas DataFrame
-        df = pd.read_csv(file_path)
-        # Return the list of columns in the DataFrame
-        return jsonify(df.columns.tolist())
+        # Return the list of columns kept in the dataset
+        return jsonify(columns)
     except Exception as e:
         # Return any errors that occur during the process
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/drop-columns', methods=['POST'])
 def drop_columns():
-    """Endpoint to drop specified columns from the dataset."""
+    """
+    Endpoint to drop specified columns from the dataset.
+
+    The dropped columns are recorded as a projection over the original file, which later stages apply
+    when reading it, so dropping or re-adding columns never rewrites the data.
+    """
     try:
         # Retrieve column names to be dropped from the request body
         data = request.get_json()
@@ -231,16 +364,11 @@ def drop_columns():
         # Load the dataset from the original uploaded file path
         dataset_path = get_original_uploaded_file_path()
         # If the dataset file does not exist, return an error message
-        if not os.path.exists(dataset_path):
+        if not dataset_path or not os.path.exists(dataset_path):
             return jsonify({"error": "Dataset file not found"}), 404
 
-        df = pd.read_csv(dataset_path)
-
-        # Drop the specified columns from the DataFrame
-        df.drop(columns=columns_to_drop, inplace=True, errors='ignore')
-
-        # Save the updated dataset back to the upload folder with a new name
-        df.to_csv(os.path.join(UPLOAD_FOLDER, 'post_column_drop_data.csv'), index=False)
+        # Record the columns that remain; unknown column names are ignored
+        column_projection.save_projection(UPLOAD_FOLDER, dataset_path, columns_to_drop)
 
         # Confirm successful column removal
         return jsonify({"message": "Columns dropped successfully"}), 200
@@ -248,40 +376,163 @@ def drop_columns():
         # Return any errors that occur during the process
         return jsonify({"error": str(e)}), 500
 
+def send_download(file_path, download_name, mimetype, compress=True):
+    """
+    Sends a file with conditional and range request support.
+
+    The ETag is derived from the file's content hash, so unchanged files are answered with 304 and
+    interrupted downloads can resume with a Range request. When `compress` is set, a cached gzip or
+    zstd copy is sent instead if the client accepts it (or asks for it with ?encoding=).
+
+    Large files are never read in full within the request: until their hash and compressed copy
+    have been prepared in the background, the ETag is the file's fingerprint and the file is sent
+    uncompressed.
+    """
+    etag = downloads.prepared_content_hash(file_path, app.config['CACHE_FOLDER'])
+    etag = etag or f'fingerprint-{ArtifactCache.fingerprint(file_path)}'
+    encoding = downloads.choose_encoding(request.accept_encodings, request.args.get('encoding')) if compress else None
+    compressed_path = downloads.prepared_compressed_variant(file_path, encoding, app.config['CACHE_FOLDER']) if encoding else None
+    if compressed_path:
+        # Each representation has its own ETag, so byte ranges always refer to the same bytes
+        file_path = compressed_path
+        etag = f'{etag}-{encoding}'
+    else:
+        encoding = None
+
+    # send_file resolves relative paths against the application root rather than the working directory
+    response = send_file(os.path.abspath(file_path), mimetype=mimetype, as_attachment=True, download_name=download_name,
+                         conditional=True, etag=etag, max_age=0)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
 @app.route('/api/latest-data', methods=['GET'])
 def get_latest_data():
-    """Endpoint to download the latest data file uploaded by the user."""
+    """
+    Endpoint to download the dataset uploaded by the user, without the dropped columns.
+
+    Supports If-None-Match, Range and gzip/zstd content encoding; pass ?encoding=identity to
+    download the raw file. While the projected file of a large dataset is being written in the
+    background, 202 is returned with a Retry-After header.
+    """
     try:
-        # Get the path of the latest uploaded data file
-        file_path = get_latest_uploaded_file_path()
+        # Get the uploaded dataset and the columns left after dropping columns
+        source, columns = get_current_dataset()
+        if not source:
+            return jsonify({'error': 'No files uploaded'}), 404
+        # Write the projected columns out only now that a file is actually needed
+        file_path = column_projection.prepared_projection(source, columns, app.config['CACHE_FOLDER'])
+        if file_path is None:
+            return jsonify({'state': 'preparing'}), 202, {'Retry-After': '2'}
         # Send the file back as an attachment to the client
-        return send_file(file_path, as_attachment=True)
-    except IndexError:
-        # If no files are uploaded, return an error message
-        return jsonify({'error': 'No files uploaded'}), 404
+        return send_download(file_path, os.path.basename(source), 'text/csv')
+    except ValueError as e:
+        # Unsupported encoding requested
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         # Return any other errors that occur during the process
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/export-processed-data', methods=['GET'])
+def export_processed_data():
+    """
+    Endpoint to download the processed training, validation and test splits as a zip archive.
+
+    Query parameters: format ('csv', 'jsonl' or 'parquet'; defaults to 'csv').
+    """
+    try:
+        export_format = request.args.get('format', 'csv')
+        # Process the data now if the recorded plan has not been executed yet
+        pipeline_plan.execute_plan(UPLOAD_FOLDER, app.config['CACHE_FOLDER'], app.config['DUPLICATE_WORKERS'])
+        archive_path = downloads.export_processed_splits(UPLOAD_FOLDER, export_format, app.config['CACHE_FOLDER'])
+        # The archive is already deflated, so it is not compressed a second time
+        return send_download(archive_path, f'processed_data_{export_format}.zip', 'application/zip', compress=False)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        # Unsupported export format
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/rows', methods=['GET'])
+def get_rows():
+    """
+    Endpoint to preview a page of rows without parsing the whole file.
+
+    Query parameters: offset, limit (at most MAX_PREVIEW_ROWS), columns (comma-separated projection),
+    filter (repeatable 'column:operator:value', operators eq/ne/gt/ge/lt/le/contains) and
+    dataset ('original', or 'latest' for the dataset without the dropped columns).
+
+    Filtered pages stop scanning shortly after the page's last match, so 'total_rows' is then the
+    number of matches found so far, a lower bound unless 'total_is_exact'. 'has_more' tells whether
+    rows follow the page.
+    """
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', 100)), 0), MAX_PREVIEW_ROWS)
+        columns = [col for col in request.args.get('columns', '').split(',') if col] or None
+        filters = [row_index.parse_filter(expression) for expression in request.args.getlist('filter')]
+
+        # Pick the dataset to preview; the latest dataset is the original file without the dropped columns
+        if request.args.get('dataset', 'original') == 'latest':
+            file_path, kept_columns = get_current_dataset()
+            columns = columns or kept_columns
+        else:
+            file_path = get_original_uploaded_file_path()
+        if not file_path:
+            return jsonify({'error': 'No data file uploaded'}), 404
+
+        # Unfiltered pages are located through the row-offset index; filters need a pruned scan
+        if filters:
+            page, total_rows, has_more, total_is_exact = row_index.filter_rows(file_path, filters, offset, limit, columns)
+        else:
+            index = row_index.get_row_index(file_path, app.config['CACHE_FOLDER'])
+            page = row_index.read_rows(file_path, index, offset, limit, columns)
+            total_rows = index.num_rows
+            has_more, total_is_exact = offset + limit < total_rows, True
+
+        # Replace missing values with None so the rows serialize to valid JSON
+        page = page.astype(object).where(page.notna(), None)
+        return jsonify({
+            'columns': page.columns.tolist(),
+            'rows': page.values.tolist(),
+            'offset': offset,
+            'limit': limit,
+            'total_rows': total_rows,  # Matching rows found when filtered; a lower bound unless total_is_exact
+            'total_is_exact': total_is_exact,
+            'has_more': has_more  # Whether rows follow this page
+        })
+    except ValueError as e:
+        # Malformed paging parameters, unknown columns or filter operators
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/select-label-column', methods=['POST'])
 def select_label():
     """Endpoint to specify which column in the dataset should be used as the label for model training."""
     # Retrieve the label column name from the request body
     data = request.json
-    file_path = get_latest_uploaded_file_path()
+    file_path, columns = get_current_dataset()
     label_column = data.get('labelColumn')
 
     # Validate that a label column name was provided in the request
     if not label_column:
         return jsonify({'error': 'Label column name is required'}), 400
 
+    # Validate that a dataset has been uploaded
+    if not file_path:
+        return jsonify({'error': 'No data file uploaded'}), 404
+
     # Call the function to process label column selection and return the result
-    result, status_code = select_label_column(UPLOAD_FOLDER, file_path, label_column)
+    result, status_code = label_column_selector.select_label_column(UPLOAD_FOLDER, file_path, label_column, columns, app.config['CACHE_FOLDER'])
     return jsonify(result), status_code
 
 @app.route('/api/split-data', methods=['POST'])
 def split_data():
-    """Endpoint to split the uploaded dataset into training, validation, and test datasets."""
+    """Endpoint to split the uploaded dataset into training, validation, and test datasets, optionally stratified, grouped or k-fold."""
     try:
         # Retrieve split sizes from the request body
         data = request.json
@@ -292,57 +543,82 @@ def split_data():
         if train_size + validation_size > 1.0:
             return jsonify({'error': 'Sum of training size and validation size should not exceed 1'}), 400
 
-        # Get the path of the latest uploaded data file
-        file_path = get_latest_uploaded_file_path()
+        # Get the uploaded dataset and the columns left after dropping columns
+        file_path, columns = get_current_dataset()
         if not file_path:
             return jsonify({'error': 'No data file uploaded'}), 404
 
-        # Load the dataset from the file
-        original_df = pd.read_csv(file_path)
-        # Calculate the size of the test dataset
-        test_size = float(max(0, 1 - train_size - validation_size))
+        # Optional stratification by the selected label column, group-aware splitting and k-fold generation
+        stratify_column = data_processing.load_processing_metadata(UPLOAD_FOLDER)[0] if data.get('stratify') else None
+        group_column = data.get('groupColumn') or None
+        k_folds = int(data.get('kFolds') or 0)
+        fold = int(data.get('fold') or 0)
 
-        # Split the dataset
-        train_df, test_df = train_test_split(original_df, test_size=test_size, random_state=42)
-        # Adjust the validation size relative to the remaining data after splitting off the test set
-        val_size_adjusted = validation_size / (train_size + validation_size)
-        train_df, val_df = train_test_split(train_df, test_size=val_size_adjusted, random_state=42)
-
-        # Save the split datasets to their respective files
-        train_df.to_csv(os.path.join(UPLOAD_FOLDER, 'train.csv'), index=False)
-        val_df.to_csv(os.path.join(UPLOAD_FOLDER, 'val.csv'), index=False)
-        test_df.to_csv(os.path.join(UPLOAD_FOLDER, 'test.csv'), index=False)
+        # Record the split of every row instead of writing copies of the data
+        sizes = data_splitter.split_dataset(UPLOAD_FOLDER, file_path, train_size, validation_size, app.config['CACHE_FOLDER'], columns=columns,
+                              stratify_column=stratify_column, group_column=group_column, k_folds=k_folds, fold=fold)
 
         # Return the sizes of each dataset split
-        return jsonify({
-            'message': 'Data split successfully',
-            'train_size': len(train_df),
-            'validation_size': len(val_df),
-            'test_size': len(test_df),
-            'total_size': len(original_df)
-        })
+        return jsonify({'message': 'Data split successfully', **sizes})
+    except ValueError as e:
+        # Invalid split options such as a fold outside the generated folds or a class too small to stratify
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         # Return any errors that occur during the process
         return jsonify({'error': str(e)}), 500
     
 @app.route('/api/process_data', methods=['POST'])
 def process_data_route():
-    """Endpoint to apply preprocessing options to the uploaded dataset."""
+    """
+    Endpoint to apply preprocessing options to the uploaded dataset.
+
+    The options are recorded as a pipeline plan together with the earlier wizard steps. The plan is
+    executed in a single fused pass only when the processed data is needed (training, export or the
+    comparison summary).
+    """
     # Retrieve preprocessing options from the request body
     options = request.json
 
+    # Record the plan; the network parameters are derived from it without processing the data
+    plan = pipeline_plan.save_plan(UPLOAD_FOLDER, options, app.config['CACHE_FOLDER'])
+
     # Check if no options are provided and return a message indicating no processing is required
     if not any(options.values()):
         return jsonify({"message": "No processing required"}), 200
 
-    # Call the process_data function with the provided options
-    process_data(UPLOAD_FOLDER, options)
-    # Return a success message
-    return jsonify({"message": "Data processed successfully"}), 200
+    # Return a success message with the steps the plan will execute
+    return jsonify({"message": "Data processed successfully", "plan": pipeline_plan.optimize_plan(UPLOAD_FOLDER, plan)}), 200
+
+@app.route('/api/pipeline-preview', methods=['GET'])
+def pipeline_preview():
+    """
+    Endpoint to preview the processed data by evaluating the recorded plan on a small sample.
+
+    Query parameters: rows (approximate sample size, at most MAX_PREVIEW_ROWS).
+    """
+    try:
+        num_rows = min(max(int(request.args.get('rows', 200)), 1), MAX_PREVIEW_ROWS)
+        preview = pipeline_plan.preview_plan(UPLOAD_FOLDER, num_rows)
+        # Replace missing values with None so the rows serialize to valid JSON
+        preview = preview.astype(object).where(preview.notna(), None)
+        return jsonify({'columns': preview.columns.tolist(), 'rows': preview.values.tolist()})
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/data-comparison-summary', methods=['GET'])
 def data_comparison_summary():
-    """Endpoint to provide a comparison summary between the original and processed datasets."""
+    """
+    Endpoint to provide a comparison summary between the original and processed datasets.
+
+    Query parameters: mode ('auto', 'approximate' or 'exact'; defaults to 'auto'). The exact
+    comparison is cached per processing plan. Until it exists, 'auto' returns estimates derived from
+    the original file's profile and the plan, with 95% error bounds, and computes the exact
+    comparison in the background.
+    """
     try:
         # Get the path of the original uploaded file
         original_file = get_original_uploaded_file_path()
@@ -350,14 +626,27 @@ def data_comparison_summary():
             # Return an error if the original file is not found
             return jsonify({'error': 'Original file not found'}), 404
 
-        # Call the data_comparison function to generate comparison metrics
-        metrics = data_comparison(UPLOAD_FOLDER, original_file)
+        mode = request.args.get('mode', 'auto')
+        cache_folder = app.config['CACHE_FOLDER']
+        metrics = before_after.load_cached_comparison(UPLOAD_FOLDER, original_file, cache_folder) if mode != 'approximate' else None
+        refreshing = False
+        if metrics is None and mode == 'exact':
+            # Execute the plan if needed and compute the comparison metrics
+            metrics = before_after.exact_comparison(UPLOAD_FOLDER, original_file, cache_folder, app.config['DUPLICATE_WORKERS'])
+        elif metrics is None:
+            metrics = before_after.approximate_comparison(UPLOAD_FOLDER, original_file, cache_folder)
+            if mode == 'auto':
+                refreshing = BackgroundJobs.submit('comparison', before_after.exact_comparison, UPLOAD_FOLDER, original_file, cache_folder, app.config['DUPLICATE_WORKERS']) or BackgroundJobs.is_running('comparison')
         if not metrics:
             # Return an error if there is a problem calculating the metrics
             return jsonify({'error': 'Error calculating metrics'}), 500
-                
+
         # Return the comparison metrics for the 'before' and 'after' states
-        return jsonify({'before': metrics['before'], 'after': metrics['after']})    
+        approximate = 'error_bounds' in metrics['after']
+        return jsonify({'before': metrics['before'], 'after': metrics['after'], 'approximate': approximate, 'refreshing': refreshing})
+    except FileNotFoundError as e:
+        # The data has not been processed yet
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         # Log and return any exceptions that occur
         print({'error': 'Exception occurred: ' + str(e)})
@@ -375,6 +664,34 @@ def get_network_parameters():
         # Return an error if the network_parameters file is not found
         return jsonify({'error': 'network_parameters file not found'}), 404
 
+@app.route('/api/model-cost', methods=['POST'])
+def get_model_cost():
+    """
+    Endpoint estimating the parameters, operations per row, memory and epoch time of a model
+    configuration before it is trained. The epoch time is calibrated by timing batches of the
+    model's layers on this machine, in a background job queued behind training; until it is done,
+    'calibrating' is True and 'epoch_seconds' is null, and the client asks again.
+
+    Request body: config (the model configuration, with or without its output layer) and optionally
+    trainRows and validationRows (the current split's sizes by default).
+    """
+    try:
+        data = request.get_json()
+        network_parameters_path = os.path.join(app.config['UPLOAD_FOLDER'], 'network_parameters.json')
+        if not os.path.exists(network_parameters_path):
+            return jsonify({'error': 'network_parameters file not found'}), 404
+        with open(network_parameters_path, 'r') as file:
+            network_parameters = json.load(file)
+        train_rows, val_rows, test_rows = model_cost.split_rows(app.config['UPLOAD_FOLDER'])
+        rows = (int(data.get('trainRows', train_rows)), int(data.get('validationRows', val_rows)), test_rows)
+        return jsonify(model_cost.estimate_cost(data['config'], network_parameters, rows, app.config, background=True))
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid model configuration: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/save-model-config', methods=['POST'])
 def save_model_config():
     """Endpoint to save a new model configuration."""
@@ -417,23 +734,26 @@ def get_model_config():
 
 def load_data():
     """Utility function to load the processed training, validation, and testing datasets."""
+    # Execute the recorded processing plan if its output is missing or out of date
+    pipeline_plan.execute_plan(app.config['UPLOAD_FOLDER'], app.config['CACHE_FOLDER'], app.config['DUPLICATE_WORKERS'])
+
     # Load the processed datasets from CSV files
     train_df = pd.read_csv(os.path.join(app.config['UPLOAD_FOLDER'], 'processed_train.csv'))
     val_df = pd.read_csv(os.path.join(app.config['UPLOAD_FOLDER'], 'processed_val.csv'))
     test_df = pd.read_csv(os.path.join(app.config['UPLOAD_FOLDER'], 'processed_test.csv'))
     
-    # Load the processed label data for each dataset
+    # Load the processed label codes for each dataset
     processed_y_train = pd.read_csv(os.path.join(app.config['UPLOAD_FOLDER'], 'processed_y_train.csv'))
     processed_y_val = pd.read_csv(os.path.join(app.config['UPLOAD_FOLDER'], 'processed_y_val.csv'))
     processed_y_test = pd.read_csv(os.path.join(app.config['UPLOAD_FOLDER'], 'processed_y_test.csv'))
     
-    # Convert pandas DataFrames to PyTorch tensors for model training
+    # Convert pandas DataFrames to PyTorch tensors for model training; labels are integer class codes
     X_train = torch.tensor(train_df.values, dtype=torch.float32)
-    y_train = torch.tensor(processed_y_train.values, dtype=torch.float32).squeeze()
+    y_train = torch.tensor(processed_y_train['label'].values, dtype=torch.int64)
     X_val = torch.tensor(val_df.values, dtype=torch.float32)
-    y_val = torch.tensor(processed_y_val.values, dtype=torch.float32).squeeze()
+    y_val = torch.tensor(processed_y_val['label'].values, dtype=torch.int64)
     X_test = torch.tensor(test_df.values, dtype=torch.float32)
-    y_test = torch.tensor(processed_y_test.values, dtype=torch.float32).squeeze()
+    y_test = torch.tensor(processed_y_test['label'].values, dtype=torch.int64)
 
     # Return the tensors for training, validation, and testing
     return X_train, y_train, X_val, y_val, X_test, y_test
@@ -455,194 +775,176 @@ def getModelConfig():
         # Raise an exception if an error occurs during the file reading process
         raise Exception(f'Failed to retrieve model configuration: {e}')
 
-class NeuralNetwork(nn.Module):
-    """
-    Defines the structure of the Neural Network using PyTorch.
-    """
-    def __init__(self, model_config):
-        """
-        Initializes the neural network model based on the provided model configuration.
-        
-        :param model_config: A dictionary containing the configuration of the model such as input size,
-                             layers, and their settings.
-        """
-        super(NeuralNetwork, self).__init__()
-        layers = []  # List to store layers of the network
-        input_size = model_config['input_size']  # Set initial input size
-
-        # Iterate through each layer in the model configuration
-        for layer in model_config['layers']:
-            # If the layer type is 'dense', add a Linear layer followed by an activation function if specified
-            if layer['type'] == 'dense':
-                layers.append(nn.Linear(input_size, layer['settings']['nodes']))  # Add a linear layer
-                if layer['settings']['activation'] == 'relu':
-                    layers.append(nn.ReLU())  # Add ReLU activation function
-                elif layer['settings']['activation'] == 'sigmoid' and layer == model_config['layers'][-1]:
-                    # Add sigmoid activation only if it's the final layer for binary classification
-                    layers.append(nn.Sigmoid())
-                input_size = layer['settings']['nodes']  # Update the input size for the next layer
-            
-            # If the layer type is 'dropout', add a Dropout layer
-            elif layer['type'] == 'dropout':
-                layers.append(nn.Dropout(layer['settings']['rate']))
-
-        self.model = nn.Sequential(*layers)  # Create the sequential model from the layers list
-        
-        # Set the loss function based on the output nodes
-        output_nodes = model_config['layers'][-1]['settings']['nodes']
-        self.loss_function = nn.BCELoss() if output_nodes == 1 else nn.CrossEntropyLoss()
-
-    def forward(self, x):
-        """
-        Defines the forward pass of the model.
-        
-        :param x: Input tensor to the network.
-        :return: Output tensor from the network.
-        """
-        return self.model(x)
-
-def compile_model(model_config):
+@socketio.on('startTraining')
+def handle_start_training(json_data):
     """
-    Compiles the neural network model with the specified optimizer.
+    Handles the start training event from the client.
+    
+    Every run gets its own room, joined by the requesting client and announced with a
+    'trainingStarted' event carrying the run id, so other clients can follow it with 'joinRun'.
     
-    :param model_config: A dictionary containing the configuration of the model.
-    :return: Compiled model and optimizer.
+    Parameters:
+    - json_data: Data received from the client, including epochs and, optionally, 'progressInterval'
+      (minimum seconds between progress messages), 'batchProgress' (whether to report progress
+      within epochs), 'threads' (intra-op threads for this run, per worker) and 'workers' (number
+      of local processes for distributed data-parallel training, at least 1 and at most
+      'TRAINING_MAX_WORKERS' or the usable cores).
+
+    Once training has finished, the run's metadata, including the threads it used and how busy it
+    kept them, is saved in the runs folder and sent with a 'trainingComplete' event.
     """
-    model = NeuralNetwork(model_config)  # Instantiate the model
-    optimizer = optim.RMSprop(model.parameters())  # Use RMSprop optimizer
-    return model, optimizer
+    epochs = json_data['epochs']
+    run_id = uuid.uuid4().hex
+    if not TrainingRuns.start(run_id):
+        emit('trainingError', {'error': 'The server is shutting down, please start the training again'})
+        return
+    try:
+        run_training(run_id, epochs, json_data)
+    finally:
+        TrainingRuns.finish(run_id)
 
-def evaluate_model(model, data_loader, loss_function, calculate_confusion_matrix=False):
+def run_training(run_id, epochs, json_data):
     """
-    Evaluates the model on a dataset.
-    
-    :param model: The neural network model.
-    :param data_loader: DataLoader for the dataset to evaluate.
-    :param loss_function: The loss function used for evaluation.
-    :param calculate_confusion_matrix: Boolean indicating whether to calculate the confusion matrix.
-    :return: Dictionary of evaluation metrics.
-    """
-    model.eval()  # Set the model to evaluation mode
-    total_loss = 0
-    all_predictions = []
-    all_targets = []
-
-    with torch.no_grad():  # Disable gradient computation
-        for X_batch, y_batch in data_loader:
-            predictions = model(X_batch).round()  # Get model predictions
-            y_batch_reshaped = y_batch.float().reshape(predictions.shape)
-            loss = loss_function(predictions, y_batch_reshaped)  # Calculate loss
-            total_loss += loss.item()
-            predicted_labels = predictions.round()  # Round predictions to get binary output
-            all_predictions.extend(predicted_labels.cpu().numpy())
-            all_targets.extend(y_batch.cpu().numpy())
-
-    # Calculate metrics
-    metrics = {
-        'loss': total_loss / len(data_loader),
-        'accuracy': accuracy_score(all_targets, all_predictions),
-        'precision': precision_score(all_targets, all_predictions, average='macro', zero_division=0),
-        'recall': recall_score(all_targets, all_predictions, average='macro', zero_division=0),
-    }
+    Trains a model for a registered run and reports its progress to the run's room.
 
-    if calculate_confusion_matrix:
-        # Calculate and add confusion matrix to metrics
-        try:
-            metrics['confusion_matrix'] = confusion_matrix(all_targets, all_predictions).tolist()
-        except Exception as e:
-            print('Error', {'error': str(e)})
-
-    return metrics
-
-def train_model(socketio, model, optimizer, epochs, X_train, y_train, X_val, y_val, X_test, y_test, loss_function):
-    """
-    Trains the neural network model.
+    The training itself runs in a native thread under eventlet or gevent, so the other clients
+    are still served while it runs.
     
     Parameters:
-    - socketio: SocketIO server instance to emit training progress to the client.
-    - model: The neural network model to be trained.
-    - optimizer: The optimizer used for training.
+    - run_id: Identifier of the run, also the name of its room.
     - epochs: The number of epochs to train for.
-    - X_train, y_train: Training dataset features and labels.
-    - X_val, y_val: Validation dataset features and labels.
-    - X_test, y_test: Test dataset features and labels.
-    - loss_function: The loss function to use during training.
-    """
-    # Create TensorDatasets for training, validation, and testing
-    train_dataset = TensorDataset(torch.tensor(X_train, dtype=torch.float), torch.tensor(y_train, dtype=torch.long))
-    val_dataset = TensorDataset(torch.tensor(X_val, dtype=torch.float), torch.tensor(y_val, dtype=torch.long))
-    test_dataset = TensorDataset(torch.tensor(X_test, dtype=torch.float), torch.tensor(y_test, dtype=torch.long))
-    
-    # Create DataLoader instances for each dataset
-    train_loader = DataLoader(train_dataset, batch_size=10, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=10)
-    
-    # Optional learning rate scheduler for optimizer
-    scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=30, gamma=0.1)
-
-    # Training loop
-    for epoch in range(1, epochs+1):
-        model.train()  # Set model to training mode
-        total_loss = 0
-        for X_batch, y_batch in train_loader:
-            optimizer.zero_grad()  # Clear gradients
-            predictions = model(X_batch)  # Forward pass
-            y_batch_reshaped = y_batch.float().reshape(predictions.shape)  # Reshape labels to match predictions shape
-            loss = loss_function(predictions, y_batch_reshaped)  # Compute loss
-            loss.backward()  # Backpropagate errors
-            optimizer.step()  # Update weights
-            total_loss += loss.item()
-        scheduler.step()  # Update learning rate
-
-        # Evaluate model on validation set
-        val_metrics = evaluate_model(model, val_loader, loss_function)
-
-        # Emit training progress through SocketIO
-        progress = (epoch + 1) / (epochs + 1) * 100  # Calculate training progress percentage
-        socketio.emit('trainingProgress', {
-            'epoch': epoch,
-            'progress': progress,
-            'metrics': {
-                'accuracy': val_metrics['accuracy'],
-                'precision': val_metrics['precision'],
-                'recall': val_metrics['recall']}  # Send validation metrics
-        })
-        print(f'Epoch {epoch}/{epochs} - Metrics: {val_metrics}')
-
-    # Final evaluation on test set
-    test_loader = DataLoader(test_dataset, batch_size=32, shuffle=False)
-    test_metrics = evaluate_model(model, test_loader, loss_function, calculate_confusion_matrix=True)
-    print("Test set validation:", test_metrics)
-    socketio.emit('testMetrics', test_metrics)  # Emit final evaluation metrics
+    - json_data: Data received from the client with the 'startTraining' event.
+    """
+    join_room(run_id)
+    emit('trainingStarted', {'run_id': run_id})
+    try:
+        run_metadata = NativeThreads.run_emitting(socketio, train_run, run_id, epochs, json_data)
+        socketio.emit('trainingComplete', run_metadata, to=run_id)
+    except Exception as e:
+        emit('trainingError', {'error': str(e)})  # Emit training error if any
 
-@socketio.on('startTraining')
-def handle_start_training(json_data):
+def train_run(emitter, run_id, epochs, json_data):
     """
-    Handles the start training event from the client.
-    
+    Trains and saves the model of a run.
+
     Parameters:
-    - json_data: Data received from the client, including epochs and model configuration.
+    - emitter: SocketIO server, or the stand-in relaying its events, used for the progress messages.
+    - run_id: Identifier of the run, also the name of its room.
+    - epochs: The number of epochs to train for.
+    - json_data: Data received from the client with the 'startTraining' event.
+
+    Returns:
+    - The run's metadata, also saved in the runs folder.
     """
-    epochs = json_data['epochs']
+    resource_manager.configure_process(app.config)  # Applied once, before torch starts any parallel work
+    workers = resource_manager.clamp_workers(app.config, json_data.get('workers', app.config['TRAINING_WORKERS']))
+    progress = ProgressChannel(emitter, run_id, epochs, interval=float(json_data.get('progressInterval', DEFAULT_INTERVAL)),
+                               batch_updates=bool(json_data.get('batchProgress', True)))
     model_config = getModelConfig()  # Retrieve model configuration
     X_train, y_train, X_val, y_val, X_test, y_test = load_data()  # Load dataset
+    # Read with the data, so the saved model keeps the preprocessing it was trained with if the data is processed again meanwhile
+    preprocessing = model_export.load_preprocessing(app.config['UPLOAD_FOLDER'])
 
     # Configure the model and loss function based on the final layer's activation function
-    loss_function = nn.CrossEntropyLoss() if model_config['layers'][-1]['settings']['activation'] != 'sigmoid' else nn.BCELoss()
+    model_config, loss_function = training.resolve_output_layer(model_config)
 
-    if model_config['layers'][-1]['settings']['activation'] == 'sigmoid':
-        y_train = torch.argmax(y_train, dim=1)
-        y_val = torch.argmax(y_val, dim=1)
-        y_test = torch.argmax(y_test, dim=1)
-        model_config['layers'][-1]['settings']['nodes'] = 1
-        loss_function = nn.BCELoss()
-
-    model, optimizer = compile_model(model_config)  # Compile model
+    model, optimizer = training.compile_model(model_config)  # Compile model
     print("Model:", model)
+    if workers > 1:
+        # Data-parallel replicas in local processes; rank 0 reports the progress
+        threads, worker_cores = resource_manager.plan_worker_resources(app.config, model, training.TRAIN_BATCH_SIZE, workers, json_data.get('threads'))
+        with resource_manager.exclusive():  # Nothing else is timed in this process while the workers train
+            usage = distributed_training.train_distributed(progress, model_config, loss_function, epochs, (X_train, y_train, X_val, y_val, X_test, y_test),
+                                      workers, threads, worker_cores, model)
+    else:
+        resources = resource_manager.plan_resources(app.config, model, training.TRAIN_BATCH_SIZE, json_data.get('threads'))
+        with resources:
+            training.train_model(progress, model, optimizer, epochs, X_train, y_train, X_val, y_val, X_test, y_test, loss_function)
+        usage = resources.usage
+    # Keep the trained weights, so the model can be exported and benchmarked after the run
+    model_export.save_trained_model(app.config['RUNS_FOLDER'], run_id, model, model_config, preprocessing)
+    run_metadata = {'run_id': run_id, 'epochs': epochs, 'workers': workers, 'finished': datetime.now().isoformat(), 'resources': usage,
+                    'export_formats': model_export.available_formats()}
+    with open(os.path.join(app.config['RUNS_FOLDER'], f'{run_id}.json'), 'w') as file:
+        json.dump(run_metadata, file)
+    return run_metadata
+
+@app.route('/api/runs/<run_id>', methods=['GET'])
+def get_run_metadata(run_id):
+    """
+    Endpoint returning the metadata of a finished training run, including its resource usage.
+    """
+    run_path = os.path.join(app.config['RUNS_FOLDER'], f'{secure_filename(run_id)}.json')
+    if not os.path.exists(run_path):
+        return jsonify({'error': 'Run not found'}), 404
+    with open(run_path, 'r') as file:
+        return jsonify(json.load(file))
+
+@app.route('/api/runs/<run_id>/export', methods=['GET'])
+def export_trained_model(run_id):
+    """
+    Endpoint to download the trained model of a run as TorchScript or ONNX.
+
+    Query parameters: format ('torchscript' or 'onnx'; defaults to 'torchscript'). The model reads
+    preprocessed feature rows; the fitted preprocessing is bundled in the file (as the extra file
+    'preprocessing.json' in TorchScript, as a metadata property of the same name in ONNX).
+    """
     try:
-        train_model(socketio, model, optimizer, epochs, X_train, y_train, X_val, y_val, X_test, y_test, loss_function)
+        export_format = request.args.get('format', 'torchscript')
+        run_id = secure_filename(run_id)
+        path = model_export.export_model(app.config['RUNS_FOLDER'], run_id, export_format)
+        suffix = model_export.EXPORT_FORMATS[export_format]
+        return send_download(path, f'model_{run_id}{suffix}', 'application/octet-stream', compress=False)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        # Unsupported format, or ONNX without the onnx package
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        emit('trainingError', {'error': str(e)})  # Emit training error if any
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/runs/<run_id>/benchmark', methods=['POST'])
+def benchmark_trained_model(run_id):
+    """
+    Endpoint starting a measurement of single-row and batched inference latency and throughput of
+    a run's model in eager PyTorch and in every available export format.
+
+    The benchmark runs in the background after training jobs; its report is read from
+    GET /api/runs/<run_id>/benchmark. Query parameters: batchSizes (comma separated, e.g. '1,256';
+    at most 4 sizes up to 4096 rows), runs (timed calls per measurement, at most 1000).
+    """
+    try:
+        batch_sizes = [int(size) for size in request.args.get('batchSizes', '').split(',') if size.strip()] or None
+        runs = int(request.args.get('runs', model_export.BENCHMARK_RUNS))
+        model_export.benchmark_in_background(app.config['RUNS_FOLDER'], secure_filename(run_id), batch_sizes, runs, app.config)
+        return jsonify({'state': 'running'}), 202
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/runs/<run_id>/benchmark', methods=['GET'])
+def get_benchmark_status(run_id):
+    """
+    Endpoint reporting the latest benchmark of a run's model. The 'state' is 'running', 'ready'
+    (with the 'report') or 'failed' (with the 'error').
+    """
+    status = model_export.get_benchmark_status(app.config['RUNS_FOLDER'], secure_filename(run_id))
+    if status is None:
+        return jsonify({'error': 'The model of this run has not been benchmarked'}), 404
+    return jsonify(status)
+
+@socketio.on('joinRun')
+def handle_join_run(json_data):
+    """
+    Subscribes the client to the progress of a running training run.
+    
+    Parameters:
+    - json_data: Data received from the client, including the 'run_id' announced by 'trainingStarted'.
+    """
+    join_room(json_data['run_id'])
 
 if __name__ == '__main__':
     # Ensure upload folder exists
@@ -1,5 +1,12 @@
+import json
+import os
 import pandas as pd
 import numpy as np
+from data_profile import refresh_statistics, summarize
+from duplicates import DuplicateIndex
+from pipeline_plan import execute_plan, get_step, load_plan, plan_key
+from processing_metrics import load_processed_metrics, save_processed_metrics
+from utils.artifact_cache import ArtifactCache
 
 def read_csv_files(upload_folder):
     """
@@ -25,12 +32,13 @@ def read_csv_files(upload_folder):
 
     return combined_df
 
-def calculate_metrics(df):
+def calculate_metrics(df, duplicate_index=None):
     """
     Calculates and returns basic metrics for a DataFrame, including missing values, missing percentage, and duplicates.
 
     Parameters:
     - df: Pandas DataFrame for which to calculate metrics.
+    - duplicate_index: Optional precomputed DuplicateIndex of the DataFrame's rows; built from the DataFrame if omitted.
 
     Returns:
     - Dictionary containing metrics: missing values, missing percentage, duplicate rows, and total number of rows.
@@ -38,7 +46,9 @@ def calculate_metrics(df):
     # Calculate missing values and percentages, and count duplicates
     missing_values = df.isnull().sum().to_dict()
     missing_percentage = {col: (missing_values[col] / len(df) * 100) for col in df.columns}
-    duplicate_rows = df.duplicated().sum()
+    if duplicate_index is None:
+        duplicate_index = DuplicateIndex.from_frame(df)
+    duplicate_rows = duplicate_index.duplicate_count
     
     # Return metrics
     return {
@@ -48,26 +58,35 @@ def calculate_metrics(df):
         'num_rows': len(df)
     }
 
-def data_comparison(upload_folder, original_file):
+def data_comparison(upload_folder, original_file, cache_folder=None, workers=1):
     """
     Compares the original dataset with the processed dataset to evaluate the effect of preprocessing.
 
     Parameters:
     - upload_folder: Folder containing processed datasets.
     - original_file: Path to the original dataset file.
+    - cache_folder: Optional folder of cached artifacts; when given, the original file's metrics
+      come from its cached profile and duplicate index instead of a full read.
+    - workers: Number of processes hashing the rows when the duplicate index is built.
 
     Returns:
     - Metrics comparing the original dataset to the processed dataset.
     """
-    # Read original and processed datasets
-    original_df = pd.read_csv(original_file)
-    processed_df = read_csv_files(upload_folder)
-
-    # Calculate metrics for both original and processed datasets
-    metrics = {
-        'before': calculate_metrics(original_df),
-        'after': calculate_metrics(processed_df)
-    }
+    # Metrics of the original dataset, from its profile once it has been built
+    if cache_folder:
+        refresh_statistics(original_file, cache_folder, workers)
+        before = summary_metrics(summarize(original_file, cache_folder))
+        before.pop('error_bounds')
+    else:
+        before = calculate_metrics(pd.read_csv(original_file))
+
+    # Metrics of the processed dataset, written as a side output of processing
+    after = load_processed_metrics(upload_folder)
+    if after is None:
+        after = calculate_metrics(read_csv_files(upload_folder))
+        save_processed_metrics(upload_folder, after)
+
+    metrics = {'before': before, 'after': after}
 
     # Ensure numerical values are in Python native types for JSON serialization
     for key, value in metrics.items():
@@ -79,3 +98,96 @@ def data_comparison(upload_folder, original_file):
             metrics[key] = value.item()
 
     return metrics
+
+def summary_metrics(summary):
+    """
+    Converts the output of `data_profile.summarize` into the metrics format of `calculate_metrics`.
+
+    Returns:
+    - Dictionary of metrics with an additional 'error_bounds' entry giving the 95% half-widths.
+    """
+    num_rows = summary['num_rows']
+    return {
+        'missing_values': summary['missing'],
+        'missing_percentage': {col: (count / num_rows * 100 if num_rows else 0.0) for col, count in summary['missing'].items()},
+        'duplicate_rows': summary['duplicate_count'],
+        'num_rows': num_rows,
+        'error_bounds': {
+            'missing_values': summary['error_bounds']['missing_values'],
+            'duplicate_rows': summary['error_bounds']['duplicate_count'],
+            'num_rows': summary['error_bounds']['row_count']
+        }
+    }
+
+def estimate_processed_metrics(before, plan):
+    """
+    Derives the metrics of the processed dataset from the original dataset's metrics and the plan.
+
+    Duplicate removal drops the duplicate rows and imputation fills every missing value; the
+    remaining counts are scaled to the rows that are kept. Rows that only become duplicates after
+    imputation or encoding are not predicted.
+
+    Parameters:
+    - before: Metrics of the original dataset, as returned by `summary_metrics`.
+    - plan: The recorded pipeline plan.
+
+    Returns:
+    - Dictionary of estimated metrics of the processed dataset, with 'error_bounds'.
+    """
+    columns = get_step(plan, 'project')['columns'] or list(before['missing_values'])
+    dedup = get_step(plan, 'dedup')['enabled']
+    impute = get_step(plan, 'impute')['enabled']
+    num_rows = before['num_rows'] - (before['duplicate_rows'] if dedup else 0)
+    kept_share = num_rows / before['num_rows'] if before['num_rows'] else 0.0
+    rows_bound = before['error_bounds']['num_rows'] + (before['error_bounds']['duplicate_rows'] if dedup else 0)
+
+    missing_values = {col: 0 if impute else int(round(before['missing_values'][col] * kept_share)) for col in columns}
+    return {
+        'missing_values': missing_values,
+        'missing_percentage': {col: (count / num_rows * 100 if num_rows else 0.0) for col, count in missing_values.items()},
+        'duplicate_rows': 0 if dedup else before['duplicate_rows'],
+        'num_rows': num_rows,
+        'error_bounds': {
+            'missing_values': {col: 0 if impute else before['error_bounds']['missing_values'][col] for col in columns},
+            'duplicate_rows': 0 if dedup else before['error_bounds']['duplicate_rows'],
+            'num_rows': rows_bound
+        }
+    }
+
+def approximate_comparison(upload_folder, original_file, cache_folder):
+    """
+    Estimates the comparison metrics in O(columns) without reading the processed data.
+
+    The 'before' metrics come from the original file's profile (or its head until the profile
+    exists) and the 'after' metrics are derived from them through the recorded plan.
+    """
+    before = summary_metrics(summarize(original_file, cache_folder))
+    return {'before': before, 'after': estimate_processed_metrics(before, load_plan(upload_folder))}
+
+def comparison_cache_path(upload_folder, original_file, cache_folder):
+    """Returns the path where the exact comparison for the current plan and original file is cached."""
+    key = ArtifactCache.fingerprint(original_file, plan_key(load_plan(upload_folder)))
+    return ArtifactCache.path_for(cache_folder, 'comparison', key, 'json')
+
+def load_cached_comparison(upload_folder, original_file, cache_folder):
+    """Returns the cached exact comparison, or None if it has not been computed for the current plan."""
+    cache_path = comparison_cache_path(upload_folder, original_file, cache_folder)
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, 'r') as file:
+        return json.load(file)
+
+def exact_comparison(upload_folder, original_file, cache_folder, workers=1):
+    """
+    Executes the plan if needed, computes the exact comparison and caches it for the current plan,
+    hashing rows in `workers` processes when a duplicate index has to be built.
+
+    Returns:
+    - The exact comparison metrics.
+    """
+    cache_path = comparison_cache_path(upload_folder, original_file, cache_folder)
+    execute_plan(upload_folder, cache_folder, workers)
+    metrics = data_comparison(upload_folder, original_file, cache_folder, workers)
+    ArtifactCache.write_atomically(cache_path, lambda file: json.dump(
+        metrics, file, default=lambda value: value.item() if isinstance(value, np.generic) else str(value)), mode='w')
+    return metrics
@@ -0,0 +1,73 @@
+"""
+Measures how quickly a fresh server process becomes ready.
+
+Every run starts a new interpreter, imports the application and times its first requests: the
+static catch-all route, a light API route and an upload of a small CSV file. It then times the
+optional warm-up, which loads the machine learning stack ahead of the first training run.
+
+Usage:
+    python benchmark_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Code run in each fresh interpreter; prints the timings of one run as JSON
+PROBE = '''
+import io, json, os, shutil, tempfile, time
+start = time.perf_counter()
+folder = tempfile.mkdtemp()
+server_folder = os.getcwd()
+os.chdir(folder)
+import sys
+sys.path.insert(0, server_folder)
+import app
+timings = {'import_app': time.perf_counter() - start}
+client = app.app.test_client()
+
+step = time.perf_counter()
+client.get('/')
+timings['first_static_request'] = time.perf_counter() - step
+
+step = time.perf_counter()
+client.get('/api/network-parameters')
+timings['first_light_api_request'] = time.perf_counter() - step
+
+step = time.perf_counter()
+data = io.BytesIO(b'a,b,label\\n' + b''.join(b'%d,%d,%d\\n' % (i, i * 2, i % 2) for i in range(1000)))
+client.post('/api/upload', data={'file': (data, 'benchmark.csv')})
+timings['first_upload'] = time.perf_counter() - step
+
+step = time.perf_counter()
+app.warm_up()
+timings['warm_up'] = time.perf_counter() - step
+print(json.dumps(timings))
+os.chdir(server_folder)
+shutil.rmtree(folder, ignore_errors=True)
+'''
+
+def run_once():
+    """Runs the probe in a new interpreter and returns its timings, plus the process start-up time."""
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['process_total'] = time.perf_counter() - start
+    return timings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measures the start-up time of the server.')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    runs = [run_once() for _ in range(args.runs)]
+    print(f'Median over {args.runs} fresh processes:')
+    for key in runs[0]:
+        print(f'  {key:<26} {statistics.median(run[key] for run in runs) * 1000:8.1f} ms')
+
+if __name__ == '__main__':
+    main()
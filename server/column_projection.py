@@ -0,0 +1,109 @@
+import json
+import os
+import pandas as pd
+from utils.artifact_cache import ArtifactCache
+from utils.background_jobs import BackgroundJobs
+
+# File recording the columns dropped from the uploaded dataset, stored in the upload folder
+PROJECTION_FILE = 'column_projection.json'
+
+# Rows copied at a time when a projection has to be written out
+CHUNK_SIZE = 100000
+
+# Sources up to this size are projected within the request; larger ones in the background
+INLINE_PROJECTION_BYTES = 16 * 1024 * 1024
+
+def read_header(file_path):
+    """Returns the column names of a CSV file without reading its rows."""
+    return pd.read_csv(file_path, nrows=0).columns.tolist()
+
+def save_projection(upload_folder, source, columns_to_drop):
+    """
+    Records which columns of the source dataset are dropped, without touching the data itself.
+
+    Every call replaces the previous projection, so re-adding a column is done by leaving it out of
+    `columns_to_drop`. Names that are not columns of the source are ignored.
+
+    Parameters:
+    - upload_folder: Directory where the projection is stored.
+    - source: Path of the source CSV file.
+    - columns_to_drop: List of column names to drop.
+
+    Returns:
+    - The list of columns that are kept, in source order.
+    """
+    all_columns = read_header(source)
+    dropped = [col for col in all_columns if col in set(columns_to_drop)]
+    projection = {
+        'source': source,
+        'source_fingerprint': ArtifactCache.fingerprint(source),
+        'dropped_columns': dropped,
+        'columns': [col for col in all_columns if col not in dropped]
+    }
+    with open(os.path.join(upload_folder, PROJECTION_FILE), 'w') as file:
+        json.dump(projection, file)
+    return projection['columns']
+
+def load_projection(upload_folder, source):
+    """
+    Returns the columns of the source dataset that are kept after dropping columns.
+
+    A projection recorded for another file (e.g. before a new upload) or an older version of the
+    file is ignored, in which case all columns are kept.
+
+    Parameters:
+    - upload_folder: Directory where the projection is stored.
+    - source: Path of the source CSV file.
+
+    Returns:
+    - The list of kept columns, in source order; pass it as `usecols` when reading the source.
+    """
+    projection_path = os.path.join(upload_folder, PROJECTION_FILE)
+    if os.path.exists(projection_path):
+        with open(projection_path, 'r') as file:
+            projection = json.load(file)
+        if projection['source'] == source and projection['source_fingerprint'] == ArtifactCache.fingerprint(source):
+            return projection['columns']
+    return read_header(source)
+
+def materialize_projection(source, columns, cache_folder):
+    """
+    Returns the path of a CSV file holding only the given columns of the source.
+
+    The source itself is returned when no column is dropped; otherwise the projected file is written
+    chunk by chunk into the cache once per source version and column set. Only consumers that need
+    an actual file, such as downloads, should call this.
+    """
+    if columns == read_header(source):
+        return source
+
+    cache_path = ArtifactCache.path_for(cache_folder, 'projection', ArtifactCache.fingerprint(source, columns), 'csv')
+    if not os.path.exists(cache_path):
+        def write(output):
+            for chunk in pd.read_csv(source, usecols=columns, chunksize=CHUNK_SIZE):
+                chunk[columns].to_csv(output, header=output.tell() == 0, index=False)
+        ArtifactCache.write_atomically(cache_path, write, mode='w')
+    return cache_path
+
+def prepared_projection(source, columns, cache_folder):
+    """
+    Returns the path of the projected file if it is cached or the source is small enough to project now.
+
+    Otherwise the projection is written in a background job and None is returned, so a request never
+    waits for a large source to be rewritten.
+
+    Parameters:
+    - source: Path of the source CSV file.
+    - columns: List of columns to keep, in source order.
+    - cache_folder: Directory holding cached artifacts.
+
+    Returns:
+    - The path of the projected file, or None while it is being written.
+    """
+    if columns == read_header(source):
+        return source
+    cache_path = ArtifactCache.path_for(cache_folder, 'projection', ArtifactCache.fingerprint(source, columns), 'csv')
+    if os.path.exists(cache_path) or os.path.getsize(source) <= INLINE_PROJECTION_BYTES:
+        return materialize_projection(source, columns, cache_folder)
+    BackgroundJobs.submit(f'projection_{os.path.basename(cache_path)}', materialize_projection, source, columns, cache_folder)
+    return None
@@ -1,51 +1,67 @@
 import pandas as pd
 import os
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from sklearn.impute import SimpleImputer
 import json
-import torch.nn.functional as F
-import torch
 import numpy as np
+from duplicates import DuplicateIndex
+from data_splitter import read_split_frames
+from processing_metrics import frame_metrics, save_processed_metrics
+from typed_loader import as_object_frame, as_objects, is_categorical, is_numeric
+from utils.artifact_cache import ArtifactCache
 
-# Global variable to store the imputer for handling missing values
-mode_imputer = None
+def get_scaling_mode(options):
+    """
+    Resolves the requested feature scaling method from the processing options.
+
+    Parameters:
+    - options: Dictionary of processing options, either with a 'featureScaling' value or with
+      'standardization'/'normalization' flags as sent by the preprocessing form.
+
+    Returns:
+    - 'standardization', 'normalization' or None when no scaling is requested.
+    """
+    if options.get('featureScaling') in ('standardization', 'normalization'):
+        return options['featureScaling']
+    if options.get('standardization'):
+        return 'standardization'
+    if options.get('normalization'):
+        return 'normalization'
+    return None
 
 def read_csv_files(upload_folder):
     """
-    Reads the training, validation, and testing data from CSV files.
+    Reads the training, validation, and testing data from the source file and the stored split assignment.
 
     Parameters:
-    - upload_folder: The directory where the CSV files are stored.
+    - upload_folder: The directory where the split assignment is stored.
 
     Returns:
     - train_df: DataFrame containing the training data.
     - val_df: DataFrame containing the validation data.
     - test_df: DataFrame containing the testing data.
     """
-    train_df = pd.read_csv(f'{upload_folder}/train.csv')
-    val_df = pd.read_csv(f'{upload_folder}/val.csv')
-    test_df = pd.read_csv(f'{upload_folder}/test.csv')
-    return train_df, val_df, test_df
+    return read_split_frames(upload_folder)
 
-def drop_duplicates(options, upload_folder):
+def drop_duplicates(options, upload_folder, frames=None):
     """
     Optionally removes duplicates from the combined dataset.
 
     Parameters:
     - options: Dictionary of options indicating whether duplicates should be removed.
     - upload_folder: Directory where the CSV files are located.
+    - frames: Optional (train_df, val_df, test_df) tuple to use instead of reading the splits, e.g. a sample.
 
     Returns:
     - DataFrames of train, validation, and test datasets with duplicates removed if specified.
     """
-    train_df, val_df, test_df = read_csv_files(upload_folder)
+    train_df, val_df, test_df = frames if frames is not None else read_csv_files(upload_folder)
     
-    if options['removeDuplicates']:
+    if options.get('removeDuplicates'):
         train_df['origin'] = 'train'
         val_df['origin'] = 'val'
         test_df['origin'] = 'test'
-        combined_df = pd.concat([train_df, val_df, test_df])
-        combined_df = combined_df.drop_duplicates(combined_df.columns.difference(['origin']))
+        combined_df = pd.concat([train_df, val_df, test_df], ignore_index=True)
+        duplicate_index = DuplicateIndex.from_frame(combined_df.drop(columns='origin'))
+        combined_df = combined_df[~duplicate_index.duplicated()]
 
         train_df_new = combined_df[combined_df['origin'] == 'train'].drop(columns='origin')
         val_df_new = combined_df[combined_df['origin'] == 'val'].drop(columns='origin')
@@ -54,31 +70,33 @@ def drop_duplicates(options, upload_folder):
     else:
         return train_df, val_df, test_df
 
-def clean_data(df, options, fit_imputer=False):
+def clean_data(df, options, imputer=None):
     """
     Cleans the given DataFrame based on the specified options, such as handling missing values.
 
+    The imputer is passed around rather than kept in a global, so concurrent runs and previews
+    never use or overwrite each other's fitted modes.
+
     Parameters:
     - df: DataFrame to be cleaned.
     - options: Dictionary of processing options.
-    - fit_imputer: Boolean indicating whether the imputer should be fitted.
+    - imputer: The imputer fitted on the training split, or None to fit one on `df`.
 
     Returns:
     - The cleaned DataFrame.
+    - The imputer used (None if missing values are not handled).
     """
-    global mode_imputer
-        
-    if options['handleMissingValues']:
-        if fit_imputer:
-            mode_imputer = SimpleImputer(strategy='most_frequent')
-            mode_imputer.fit(df)
+    if options.get('handleMissingValues'):
+        df = as_object_frame(df)  # The imputer cannot mix categories with numbers
+        if imputer is None:
+            from sklearn.impute import SimpleImputer  # Imported on first use to keep imports of this module fast
+            imputer = SimpleImputer(strategy='most_frequent')
+            imputer.fit(df)
+        df = pd.DataFrame(imputer.transform(df), columns=df.columns)
 
-        if mode_imputer:
-            df = pd.DataFrame(mode_imputer.transform(df), columns=df.columns)
+    return df, imputer
 
-    return df
-
-def process_features(train_df, val_df, test_df, options, datatypes, label_column):
+def process_features(train_df, val_df, test_df, options, datatypes, label_column, fitted=None):
     """
     Processes features of the dataframes such as encoding categorical variables and feature scaling.
 
@@ -87,6 +105,8 @@ def process_features(train_df, val_df, test_df, options, datatypes, label_column
     - options: Dictionary of processing options.
     - datatypes: Dictionary mapping column names to their data types.
     - label_column: The name of the label column which should not be encoded or scaled.
+    - fitted: Optional dictionary that receives the fitted category 'encodings' and 'scaling', so
+      new rows can be processed the same way.
 
     Returns:
     - Processed training, validation, and testing DataFrames.
@@ -95,30 +115,42 @@ def process_features(train_df, val_df, test_df, options, datatypes, label_column
     combined_df = pd.concat([train_df, val_df, test_df])
 
     # Process categorical and ordinal columns
-    if options['encodeCategorical']:        
-        for col in [column for column, data_type in datatypes.items() if data_type in ['object', 'category'] and column != label_column]:
-            unique_values = combined_df[col].unique()
+    if options.get('encodeCategorical'):        
+        for col in [column for column, data_type in datatypes.items() if is_categorical(data_type) and column != label_column]:
+            unique_values = as_objects(combined_df[col]).unique()
             mapping = {k: v for v, k in enumerate(unique_values)}
             
-            train_df[col] = train_df[col].map(mapping)
-            val_df[col] = val_df[col].map(mapping)
-            test_df[col] = test_df[col].map(mapping)
+            train_df[col] = as_objects(train_df[col]).map(mapping)
+            val_df[col] = as_objects(val_df[col]).map(mapping)
+            test_df[col] = as_objects(test_df[col]).map(mapping)
+            if fitted is not None:
+                fitted.setdefault('encodings', {})[col] = mapping
     
     scaler = None  # Initialize scaler to None
 
     # Identify numerical columns for scaling
-    num_cols = [column for column, data_type in datatypes.items() if data_type in ['int64', 'float64'] and column != label_column]
+    num_cols = [column for column, data_type in datatypes.items() if is_numeric(data_type) and column != label_column]
     
     # Choose scaler based on options
-    if options['featureScaling'] == 'standardization':
+    scaling_mode = get_scaling_mode(options)
+    from sklearn.preprocessing import StandardScaler, MinMaxScaler  # Imported on first use to keep imports of this module fast
+    if scaling_mode == 'standardization':
         scaler = StandardScaler()
-    elif options['featureScaling'] == 'normalization':
+    elif scaling_mode == 'normalization':
         scaler = MinMaxScaler()
     
     if scaler:
-        train_df = scaler.fit_transform(train_df)  # Fit and transform training data
-        val_df = scaler.transform(val_df)  # Transform validation data
-        test_df = scaler.transform(test_df)  # Transform test data
+        # Keep DataFrames so the scaled splits can still be concatenated and saved
+        train_df = pd.DataFrame(scaler.fit_transform(train_df), columns=train_df.columns)  # Fit and transform training data
+        val_df = pd.DataFrame(scaler.transform(val_df), columns=val_df.columns)  # Transform validation data
+        test_df = pd.DataFrame(scaler.transform(test_df), columns=test_df.columns)  # Transform test data
+
+    if fitted is not None:
+        fitted['feature_columns'] = train_df.columns.tolist()
+        if scaling_mode == 'standardization':
+            fitted['scaling'] = (scaler.mean_, scaler.scale_)
+        elif scaling_mode == 'normalization':
+            fitted['scaling'] = (scaler.data_min_, 1 / scaler.scale_)  # MinMaxScaler computes x * scale_ - data_min_ * scale_
 
     return train_df, val_df, test_df
 
@@ -139,56 +171,61 @@ def one_hot_encoding(tensor, num_classes):
 
 def process_label_column(y_train, y_val, y_test):
     """
-    Encodes the label columns of training, validation, and test datasets into one-hot format.
-    
+    Encodes the label columns of training, validation, and test datasets into compact integer class codes.
+
+    One-hot matrices are no longer materialised here; the training loop expands the codes lazily
+    only when a loss function actually requires per-class targets.
+
     Parameters:
     - y_train, y_val, y_test: Label columns for training, validation, and test datasets.
-    
+
     Returns:
-    - Encoded label columns for training, validation, and test datasets.
+    - Encoded label columns (single int32 'label' column) for training, validation, and test datasets.
+    - The list of original class values, where the position of each value is its class code.
     """
     # Combine the labels into a single series to ensure consistent encoding
     combined_labels = pd.concat([y_train, y_val, y_test], axis=0).reset_index(drop=True)
-    
-    # Determine the number of classes for label encoding
-    num_classes = len(combined_labels.unique())
-    unique_labels = set(combined_labels)
 
-    # Create a mapping for categorical values
-    mapping = {val: i for i, val in enumerate(unique_labels)}
-    
-    # Apply the mapping
-    mapped_values = combined_labels.map(mapping)
-    
-    # Convert to PyTorch tensor
-    tensor = torch.tensor(mapped_values.values, dtype=torch.int64)
-    
-    # Apply one-hot encoding
-    encoded_labels = F.one_hot(tensor, num_classes=num_classes).numpy()
-    
+    # Factorize the labels into integer codes and the ordered list of unique classes
+    codes, classes = pd.factorize(combined_labels, use_na_sentinel=False)
+    codes = codes.astype(np.int32)
+
     # Split the encoded labels back into the original splits
     train_size = len(y_train)
     val_size = len(y_val)
-    test_size = len(y_test)
-    encoded_y_train = pd.DataFrame(encoded_labels[:train_size])
-    encoded_y_val = pd.DataFrame(encoded_labels[train_size:train_size+val_size])
-    encoded_y_test = pd.DataFrame(encoded_labels[-test_size:])
-    
-    return encoded_y_train, encoded_y_val, encoded_y_test
+    encoded_y_train = pd.DataFrame({'label': codes[:train_size]})
+    encoded_y_val = pd.DataFrame({'label': codes[train_size:train_size+val_size]})
+    encoded_y_test = pd.DataFrame({'label': codes[train_size+val_size:]})
 
-def process_data(upload_folder, options):
+    return encoded_y_train, encoded_y_val, encoded_y_test, classes.tolist()
+
+def save_label_mapping(upload_folder, label_column, classes):
     """
-    Main function to process data according to the specified options.
-    
+    Persists the mapping between integer class codes and the original label values.
+
     Parameters:
-    - upload_folder: Directory where the data files are stored.
-    - options: Dictionary specifying processing options such as duplicate removal and missing value handling.
-    
-    The function performs operations like dropping duplicates, cleaning data (e.g., imputing missing values), and processing features. It also processes label columns and saves the processed data.
+    - upload_folder: Directory where the processed files are stored.
+    - label_column: The name of the label column.
+    - classes: List of original class values ordered by class code. A missing label is its own
+      class and is stored as null.
+    """
+    with open(os.path.join(upload_folder, 'label_mapping.json'), 'w') as json_file:
+        json.dump({'label_column': label_column, 'classes': [json_value(value) for value in classes]}, json_file, allow_nan=False)
+
+def load_processing_metadata(upload_folder):
+    """
+    Loads the selected label column and the column data types saved by the label selection step.
+
+    Parameters:
+    - upload_folder: Directory where the metadata JSON files are stored.
+
+    Returns:
+    - label_column: The name of the label column.
+    - datatypes: Dictionary mapping column names to their data types.
     """
-    train_df, val_df, test_df = drop_duplicates(options, upload_folder)
-    
     label_info_path = [f for f in os.listdir(upload_folder) if f.endswith('_selected_columns.json')]
+    if not label_info_path:
+        raise ValueError('No label column has been selected yet')
     latest_file = max(label_info_path, key=lambda x: os.path.getmtime(os.path.join(upload_folder, x)))
     json_file = os.path.join(upload_folder, latest_file)
     
@@ -199,41 +236,122 @@ def process_data(upload_folder, options):
     json_datatype_file = max(datatype_path, key=lambda x: os.path.getmtime(os.path.join(upload_folder, x)))
     datatype_file = os.path.join(upload_folder, json_datatype_file)
     with open(datatype_file, 'r') as file:
-        datatypes = json.load(file)      
-    
-    # Clean and process features
-    train_df = clean_data(train_df, options, fit_imputer=True)    
-    val_df = clean_data(val_df, options)    
-    test_df = clean_data(test_df, options)
+        datatypes = json.load(file)
 
-    # Separate label columns
-    y_train = train_df.pop(label_column)
-    y_val = val_df.pop(label_column)
-    y_test = test_df.pop(label_column)
+    return label_column, datatypes
 
-    train_df, val_df, test_df = process_features(train_df, val_df, test_df, options, datatypes, label_column)
+def save_network_parameters(upload_folder, num_columns, num_classes):
+    """
+    Stores the neural network's input size and the number of label classes for the model builder.
 
-    # store variables for neural network's input_size parameter and number of nodes for last layer
-    combined_df = pd.concat([train_df, val_df, test_df])
-    num_columns = len(combined_df.columns)
+    Parameters:
+    - upload_folder: Directory where the processed files are stored.
+    - num_columns: Number of feature columns fed into the network.
+    - num_classes: Number of distinct label classes.
+    """
+    with open(os.path.join(upload_folder, 'network_parameters.json'), 'w') as json_file:
+        json.dump({"num_cols": num_columns, "num_label_classes": num_classes}, json_file)
 
-    combined_labels = pd.concat([y_train, y_val, y_test], axis=0).reset_index(drop=True)
-    num_classes = len(combined_labels.unique())
+def json_value(value):
+    """Converts a value of a DataFrame into a JSON value, with None for missing values."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    return None if isinstance(value, float) and np.isnan(value) else value
 
-    with open(os.path.join(upload_folder, 'network_parameters.json'), 'w') as json_file:
-            json.dump({"num_cols": num_columns, "num_label_classes": num_classes}, json_file)
+def save_preprocessing(upload_folder, label_column, classes, feature_columns, modes, encodings, scaling):
+    """
+    Stores the fitted preprocessing, which turns a raw row into the network's input, so exported
+    models can be used without this application.
 
-    # Process label columns
-    processed_y_train, processed_y_val, processed_y_test = process_label_column(y_train, y_val, y_test)
+    Parameters:
+    - upload_folder: Directory where the processed files are stored.
+    - label_column: The name of the label column.
+    - classes: List of original class values ordered by class code.
+    - feature_columns: Feature columns in the order the network reads them.
+    - modes: Dictionary of the value imputed for missing values in each column (empty when not imputing).
+    - encodings: Dictionary mapping each encoded column to its {value: code} mapping.
+    - scaling: Tuple (offset, scale) of per-feature arrays so that scaled = (value - offset) / scale, or None.
+    """
+    preprocessing = {
+        'label_column': label_column,
+        'classes': [json_value(value) for value in classes],
+        'feature_columns': feature_columns,
+        'imputation': {col: json_value(value) for col, value in modes.items() if col in feature_columns},
+        # Pairs rather than objects, since the values are not always strings
+        'encodings': {col: [[json_value(value), int(code)] for value, code in mapping.items()] for col, mapping in encodings.items()},
+        'scaling': None if scaling is None else {'offset': [float(value) for value in scaling[0]],
+                                                 'scale': [float(value) for value in scaling[1]]}
+    }
+    with open(os.path.join(upload_folder, 'preprocessing.json'), 'w') as json_file:
+        json.dump(preprocessing, json_file)
+
+def transform_splits(train_df, val_df, test_df, options, label_column, datatypes, fitted=None):
+    """
+    Cleans the splits, separates the label column, processes the features and encodes the labels.
 
-    # Save processed data
-    train_df.to_csv(f'{upload_folder}/processed_train.csv', index=False)
-    val_df.to_csv(f'{upload_folder}/processed_val.csv', index=False)
-    test_df.to_csv(f'{upload_folder}/processed_test.csv', index=False)
-    processed_y_train.to_csv(f'{upload_folder}/processed_y_train.csv', index=False)
-    processed_y_val.to_csv(f'{upload_folder}/processed_y_val.csv', index=False)
-    processed_y_test.to_csv(f'{upload_folder}/processed_y_test.csv', index=False)
-    pd.concat([y_train, y_val, y_test]).to_csv(f'{upload_folder}/processed_combined_y.csv', index=False)
+    Parameters:
+    - train_df, val_df, test_df: DataFrames of the training, validation and test splits.
+    - options: Dictionary of processing options.
+    - label_column: The name of the label column.
+    - datatypes: Dictionary mapping column names to their data types.
+    - fitted: Optional dictionary that receives the imputation 'modes' and the values fitted by
+      process_features.
 
+    Returns:
+    - features: Tuple of processed feature DataFrames for the training, validation and test splits.
+    - labels: Tuple of DataFrames with the 'label' class codes of each split.
+    - raw_labels: Tuple of the original label Series of each split.
+    - classes: List of original class values ordered by class code.
+    """
+    # Clean and process features
+    train_df, imputer = clean_data(train_df, options)
+    val_df, _ = clean_data(val_df, options, imputer)
+    test_df, _ = clean_data(test_df, options, imputer)
+    if fitted is not None and imputer is not None:
+        fitted['modes'] = dict(zip(imputer.feature_names_in_, imputer.statistics_))
+
+    # Separate label columns
+    y_train = train_df.pop(label_column)
+    y_val = val_df.pop(label_column)
+    y_test = test_df.pop(label_column)
 
+    train_df, val_df, test_df = process_features(train_df, val_df, test_df, options, datatypes, label_column, fitted)
 
+    # Process label columns into integer codes
+    processed_y_train, processed_y_val, processed_y_test, classes = process_label_column(y_train, y_val, y_test)
+    return (train_df, val_df, test_df), (processed_y_train, processed_y_val, processed_y_test), (y_train, y_val, y_test), classes
+
+def process_data(upload_folder, options):
+    """
+    Main function to process data according to the specified options.
+    
+    Parameters:
+    - upload_folder: Directory where the data files are stored.
+    - options: Dictionary specifying processing options such as duplicate removal and missing value handling.
+    
+    The function performs operations like dropping duplicates, cleaning data (e.g., imputing missing values), and processing features. It also processes label columns and saves the processed data along with its comparison metrics.
+    """
+    train_df, val_df, test_df = drop_duplicates(options, upload_folder)
+    label_column, datatypes = load_processing_metadata(upload_folder)
+
+    fitted = {}
+    features, labels, raw_labels, classes = transform_splits(train_df, val_df, test_df, options, label_column, datatypes, fitted)
+    train_df, val_df, test_df = features
+    processed_y_train, processed_y_val, processed_y_test = labels
+
+    # Persist the class-index mapping, the network's input size and number of nodes for the last layer
+    save_label_mapping(upload_folder, label_column, classes)
+    save_network_parameters(upload_folder, len(train_df.columns), len(classes))
+    save_preprocessing(upload_folder, label_column, classes, fitted['feature_columns'], fitted.get('modes', {}),
+                       fitted.get('encodings', {}), fitted.get('scaling'))
+
+    # Save processed data; each file is replaced only once complete, so readers never see it half written
+    combined_y = pd.concat(raw_labels)
+    outputs = {'processed_train': train_df, 'processed_val': val_df, 'processed_test': test_df, 'processed_y_train': processed_y_train,
+               'processed_y_val': processed_y_val, 'processed_y_test': processed_y_test, 'processed_combined_y': combined_y}
+    for name, frame in outputs.items():
+        ArtifactCache.write_atomically(f'{upload_folder}/{name}.csv', lambda file: frame.to_csv(file, index=False), mode='w')
+
+    # Record the metrics of the processed data for the before/after comparison while it is in memory
+    combined_df = pd.concat([pd.concat([train_df, val_df, test_df], ignore_index=True), combined_y.reset_index(drop=True)], axis=1)
+    save_processed_metrics(upload_folder, frame_metrics(combined_df))
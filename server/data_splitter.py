@@ -0,0 +1,235 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from typed_loader import load_dtypes
+from utils.artifact_cache import ArtifactCache
+
+# Names of the splits and the code each one is stored as in the split assignment
+SPLITS = ['train', 'val', 'test']
+SPLIT_CODES = {'train': 0, 'val': 1, 'test': 2}
+
+# Folds are stored as int8, so at most this many can be generated
+MAX_FOLDS = int(np.iinfo(np.int8).max)
+
+# Files describing the current split, stored in the upload folder
+SPLIT_ASSIGNMENT_FILE = 'split_assignment.npy'
+SPLIT_INFO_FILE = 'split_info.json'
+
+def get_row_count(file_path, cache_folder):
+    """
+    Counts the data rows of a CSV file, caching the result by the file's fingerprint.
+
+    Parameters:
+    - file_path: Path of the CSV file.
+    - cache_folder: Directory holding cached artifacts.
+
+    Returns:
+    - The number of rows, excluding the header.
+    """
+    cache_path = ArtifactCache.path_for(cache_folder, 'rowcount', ArtifactCache.fingerprint(file_path), 'json')
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r') as file:
+            return json.load(file)['num_rows']
+
+    # Parse only the first column to keep the count cheap
+    num_rows = sum(len(chunk) for chunk in pd.read_csv(file_path, usecols=[0], chunksize=1000000))
+    ArtifactCache.write_atomically(cache_path, lambda file: json.dump({'num_rows': num_rows}, file), mode='w')
+    return num_rows
+
+def get_column_codes(file_path, column, cache_folder):
+    """
+    Reads a single column and returns it as integer codes, caching them by the file's fingerprint.
+
+    The codes are used to stratify or group rows, so re-splitting never has to parse the file again.
+
+    Parameters:
+    - file_path: Path of the CSV file.
+    - column: The column to encode.
+    - cache_folder: Directory holding cached artifacts.
+
+    Returns:
+    - An int64 array with one code per row; missing values share a code.
+    """
+    cache_path = ArtifactCache.path_for(cache_folder, 'codes', ArtifactCache.fingerprint(file_path, column), 'npy')
+    if os.path.exists(cache_path):
+        return np.load(cache_path)
+
+    values = pd.read_csv(file_path, usecols=[column])[column]
+    codes, _ = pd.factorize(values, use_na_sentinel=False)
+    ArtifactCache.write_atomically(cache_path, lambda file: np.save(file, codes.astype(np.int64)))
+    return codes
+
+def select_rows(values, rows):
+    """Returns `values[rows]`, passing None through for optional per-row arrays."""
+    return None if values is None else values[rows]
+
+def split_off(indices, size, random_state, stratify=None, groups=None):
+    """
+    Splits a fraction of `indices` off, optionally stratified by label or keeping groups together.
+
+    Parameters:
+    - indices: Row positions to split.
+    - size: Fraction of the rows to split off.
+    - random_state: Seed controlling the shuffle.
+    - stratify: Optional array of label codes aligned with `indices`.
+    - groups: Optional array of group codes aligned with `indices`; rows of a group stay together.
+
+    Returns:
+    - (remaining_indices, split_off_indices)
+    """
+    if size <= 0:
+        return indices, indices[:0]
+    from sklearn.model_selection import GroupShuffleSplit, train_test_split  # Imported on first use to keep imports of this module fast
+    if groups is not None:
+        splitter = GroupShuffleSplit(n_splits=1, test_size=size, random_state=random_state)
+        remaining, held_out = next(splitter.split(indices, groups=groups))
+        return indices[remaining], indices[held_out]
+    return train_test_split(indices, test_size=size, random_state=random_state, stratify=stratify)
+
+def assign_splits(num_rows, train_size, validation_size, stratify=None, groups=None, k_folds=0, fold=0, random_state=42):
+    """
+    Assigns every row of a dataset to the training, validation or test split.
+
+    Without k-fold, the test split is taken off first and the validation split is taken from the
+    remaining rows, exactly like splitting the DataFrame twice with train_test_split. With k-fold,
+    the rows left after taking off the test split are divided into `k_folds` folds and fold `fold`
+    becomes the validation split.
+
+    Parameters:
+    - num_rows: Number of rows in the dataset.
+    - train_size, validation_size: Fractions of the dataset used for training and validation.
+    - stratify: Optional array of label codes; keeps the label distribution equal across splits.
+    - groups: Optional array of group codes; rows of the same group never end up in different splits.
+      Cannot be combined with `stratify`.
+    - k_folds: Number of folds to generate (2 to MAX_FOLDS), or 0 to disable k-fold.
+    - fold: Index of the fold used as the validation split.
+    - random_state: Seed controlling the shuffles.
+
+    Returns:
+    - assignment: int8 array with the split code of every row.
+    - folds: int8 array with the fold of every non-test row (-1 for test rows), or None without k-fold.
+    """
+    if stratify is not None and groups is not None:
+        # Group-aware splitters ignore the labels, so the split would silently not be stratified
+        raise ValueError('A split cannot be both stratified and grouped')
+    if k_folds and not 2 <= k_folds <= MAX_FOLDS:
+        raise ValueError(f'The number of folds must be between 2 and {MAX_FOLDS}')
+    if k_folds and not 0 <= fold < k_folds:
+        raise ValueError('Fold must be between 0 and the number of folds minus one')
+    indices = np.arange(num_rows)
+    test_size = float(max(0, 1 - train_size - validation_size))
+
+    train_idx, test_idx = split_off(indices, test_size, random_state, stratify, groups)
+    assignment = np.full(num_rows, SPLIT_CODES['train'], dtype=np.int8)
+    assignment[test_idx] = SPLIT_CODES['test']
+
+    if not k_folds:
+        # Adjust the validation size relative to the remaining data after splitting off the test set
+        val_size_adjusted = validation_size / (train_size + validation_size)
+        _, val_idx = split_off(train_idx, val_size_adjusted, random_state, select_rows(stratify, train_idx), select_rows(groups, train_idx))
+        assignment[val_idx] = SPLIT_CODES['val']
+        return assignment, None
+
+    from sklearn.model_selection import GroupKFold, KFold, StratifiedKFold
+    if groups is not None:
+        splitter = GroupKFold(n_splits=k_folds)
+    elif stratify is not None:
+        splitter = StratifiedKFold(n_splits=k_folds, shuffle=True, random_state=random_state)
+    else:
+        splitter = KFold(n_splits=k_folds, shuffle=True, random_state=random_state)
+
+    folds = np.full(num_rows, -1, dtype=np.int8)
+    fold_splits = splitter.split(train_idx, select_rows(stratify, train_idx), select_rows(groups, train_idx))
+    for fold_number, (_, fold_idx) in enumerate(fold_splits):
+        folds[train_idx[fold_idx]] = fold_number
+    assignment[folds == fold] = SPLIT_CODES['val']
+    return assignment, folds
+
+def split_dataset(upload_folder, file_path, train_size, validation_size, cache_folder, columns=None,
+                  stratify_column=None, group_column=None, k_folds=0, fold=0, random_state=42):
+    """
+    Splits a dataset by recording the split of every row instead of writing copies of the data.
+
+    The split is stored as a one-byte split code per source row (plus a fold number per row for
+    k-fold), so changing the ratios is an O(n) operation on small arrays that never rewrites the data.
+    The rows are assigned at random, but each split keeps the rows in source order when it is read,
+    unlike the shuffled copies written before; training shuffles its batches, so only the row order
+    of the processed files differs.
+
+    Parameters:
+    - upload_folder: Directory where the split assignment is stored.
+    - file_path: Path of the source CSV file the assignment refers to.
+    - train_size, validation_size: Fractions of the dataset used for training and validation.
+    - cache_folder: Directory holding cached row counts and column codes.
+    - columns: Optional list of source columns the splits are made of (all columns by default).
+    - stratify_column: Optional column whose class proportions are preserved in every split.
+    - group_column: Optional column whose groups are kept within a single split.
+    - k_folds: Number of folds to generate, or 0 to disable k-fold.
+    - fold: Index of the fold used as the validation split.
+    - random_state: Seed controlling the shuffles.
+
+    Returns:
+    - Dictionary with the number of rows in each split and in total.
+    """
+    stratify = get_column_codes(file_path, stratify_column, cache_folder) if stratify_column else None
+    groups = get_column_codes(file_path, group_column, cache_folder) if group_column else None
+    num_rows = len(stratify) if stratify is not None else len(groups) if groups is not None else get_row_count(file_path, cache_folder)
+
+    assignment, folds = assign_splits(num_rows, train_size, validation_size, stratify, groups, k_folds, fold, random_state)
+    ArtifactCache.write_atomically(os.path.join(upload_folder, SPLIT_ASSIGNMENT_FILE), lambda file: np.save(file, assignment))
+    if folds is not None:
+        ArtifactCache.write_atomically(os.path.join(upload_folder, 'split_folds.npy'), lambda file: np.save(file, folds))
+
+    sizes = {
+        'train_size': int((assignment == SPLIT_CODES['train']).sum()),
+        'validation_size': int((assignment == SPLIT_CODES['val']).sum()),
+        'test_size': int((assignment == SPLIT_CODES['test']).sum()),
+        'total_size': num_rows
+    }
+    split_info = {
+        'source': file_path,
+        'source_fingerprint': ArtifactCache.fingerprint(file_path),
+        'columns': columns,
+        'stratify_column': stratify_column,
+        'group_column': group_column,
+        'k_folds': k_folds,
+        'fold': fold,
+        'random_state': random_state,
+        **sizes
+    }
+    ArtifactCache.write_atomically(os.path.join(upload_folder, SPLIT_INFO_FILE), lambda file: json.dump(split_info, file), mode='w')
+    return sizes
+
+def load_split(upload_folder):
+    """
+    Loads the current split definition.
+
+    Parameters:
+    - upload_folder: Directory where the split assignment is stored.
+
+    Returns:
+    - split_info: Dictionary describing the split, including the 'source' file path and the
+      'columns' read from it (None for all columns).
+    - assignment: int8 array with the split code of every source row.
+    """
+    with open(os.path.join(upload_folder, SPLIT_INFO_FILE), 'r') as file:
+        split_info = json.load(file)
+    assignment = np.load(os.path.join(upload_folder, SPLIT_ASSIGNMENT_FILE))
+    return split_info, assignment
+
+def read_split_frames(upload_folder):
+    """
+    Materializes the training, validation and test DataFrames from the source and the split assignment.
+
+    Parameters:
+    - upload_folder: Directory where the split assignment is stored.
+
+    Returns:
+    - train_df, val_df, test_df: DataFrames of the rows assigned to each split, in source order,
+      read with the compact schema stored by the label selection step.
+    """
+    split_info, assignment = load_split(upload_folder)
+    columns = split_info.get('columns')
+    source_df = pd.read_csv(split_info['source'], usecols=columns, dtype=load_dtypes(upload_folder, columns))
+    return tuple(source_df[assignment == SPLIT_CODES[name]].reset_index(drop=True) for name in SPLITS)
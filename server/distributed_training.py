@@ -0,0 +1,169 @@
+import queue
+import socket
+import time
+import traceback
+from datetime import timedelta
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, Subset, TensorDataset
+from torch.utils.data.distributed import DistributedSampler
+from progress_channel import ProgressChannel
+from resource_manager import TrainingResources
+from training import TRAIN_BATCH_SIZE, collect_predictions, compile_model, evaluate_model, summarize_predictions, train_epoch, validation_summary
+
+# Seconds the parent waits for a worker message before checking that the workers are still alive
+POLL_INTERVAL = 0.1
+
+# Seconds a collective operation may wait for the other workers before the run fails
+COLLECTIVE_TIMEOUT = 300
+
+def free_port():
+    """Returns a TCP port on the loopback interface that is currently free."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class QueueEmitter:
+    """Stands in for the SocketIO server in a worker process, handing emitted events to the parent."""
+    def __init__(self, messages):
+        self.messages = messages
+
+    def emit(self, event, data, to=None):
+        self.messages.put(('emit', event, data))
+
+def gather_validation_metrics(model, val_loader, loss_function, world_size):
+    """
+    Evaluates every worker's validation shard and combines the predictions on rank 0.
+
+    Every rank must call this at the same point, since it is a collective operation.
+
+    :return: Validation metrics on rank 0, None on the other ranks.
+    """
+    shard = collect_predictions(model, val_loader, loss_function)
+    shards = [None] * world_size if dist.get_rank() == 0 else None
+    dist.gather_object(shard, shards, dst=0)
+    if shards is None:
+        return None
+    total_loss = sum(shard[0] for shard in shards)
+    num_batches = sum(shard[1] for shard in shards)
+    predictions = [prediction for shard in shards for prediction in shard[2]]
+    targets = [target for shard in shards for target in shard[3]]
+    return summarize_predictions(total_loss, max(num_batches, 1), predictions, targets)
+
+def run_worker(rank, world_size, init_method, model_config, loss_function, epochs, tensors, progress_settings, threads, cores, messages):
+    """
+    Trains one replica of the model; started once per rank in its own process.
+
+    Gradients are averaged over the ranks by DistributedDataParallel, so every replica keeps the
+    same weights. Rank 0 reports progress to the parent through the message queue, with the same
+    throttling as a local run, and sends the trained weights back when it is done.
+    """
+    try:
+        dist.init_process_group('gloo', init_method=init_method, rank=rank, world_size=world_size,
+                                timeout=timedelta(seconds=COLLECTIVE_TIMEOUT))
+        with TrainingResources(threads, cores, dedicated_process=True) as resources:
+            model, _ = compile_model(model_config)
+            ddp_model = DistributedDataParallel(model)  # Broadcasts rank 0's initial weights
+            optimizer = optim.RMSprop(ddp_model.parameters())
+            scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=30, gamma=0.1)
+
+            X_train, y_train, X_val, y_val, X_test, y_test = tensors
+            train_dataset = TensorDataset(X_train, y_train)
+            sampler = DistributedSampler(train_dataset, num_replicas=world_size, rank=rank, shuffle=True)
+            train_loader = DataLoader(train_dataset, batch_size=TRAIN_BATCH_SIZE, sampler=sampler)
+            # Disjoint strided shards, so no validation row is counted twice
+            val_loader = DataLoader(Subset(TensorDataset(X_val, y_val), range(rank, len(X_val), world_size)), batch_size=TRAIN_BATCH_SIZE)
+            progress = ProgressChannel(QueueEmitter(messages), **progress_settings) if rank == 0 else None
+
+            for epoch in range(1, epochs + 1):
+                sampler.set_epoch(epoch)  # Reshuffle the shards every epoch
+                train_loss = torch.tensor([train_epoch(ddp_model, optimizer, train_loader, loss_function, epoch, progress)])
+                scheduler.step()
+                dist.all_reduce(train_loss)
+                val_metrics = gather_validation_metrics(model, val_loader, loss_function, world_size)
+                if rank == 0:
+                    progress.report_epoch(epoch, validation_summary(val_metrics), train_loss.item() / world_size)
+                    print(f'Epoch {epoch}/{epochs} - Metrics: {val_metrics}')
+
+            if rank == 0:
+                progress.close()
+                test_loader = DataLoader(TensorDataset(X_test, y_test), batch_size=32, shuffle=False)
+                test_metrics = evaluate_model(model, test_loader, loss_function, calculate_confusion_matrix=True)
+                print("Test set validation:", test_metrics)
+                progress.report_test(test_metrics)
+        # Arrays are copied through the queue, whereas tensors would be shared with a process about to exit
+        weights = {name: value.detach().cpu().numpy() for name, value in model.state_dict().items()} if rank == 0 else None
+        messages.put(('done', rank, resources.usage, weights))
+    except Exception:
+        messages.put(('error', rank, traceback.format_exc()))
+    finally:
+        if dist.is_initialized():
+            dist.destroy_process_group()
+
+def train_distributed(progress, model_config, loss_function, epochs, tensors, num_workers, threads=1, worker_cores=None, model=None):
+    """
+    Trains the model with data-parallel replicas in local worker processes on the gloo backend.
+
+    Each worker trains on its DistributedSampler shard of the training data and gradients are
+    all-reduced after every batch. Validation metrics are computed on rank 0 from the predictions of
+    all shards, and rank 0's progress messages are forwarded to the run's room.
+
+    Parameters:
+    - progress: ProgressChannel of the run; its room, interval and batch settings apply to rank 0.
+    - model_config: The model configuration every worker builds its replica from.
+    - loss_function: The loss function to use during training.
+    - epochs: The number of epochs to train for.
+    - tensors: Tuple (X_train, y_train, X_val, y_val, X_test, y_test) of tensors, shared with the
+      workers through shared memory rather than copied.
+    - num_workers: Number of worker processes.
+    - threads: Intra-op threads per worker.
+    - worker_cores: Optional list of core sets, one per worker, to pin the workers to.
+    - model: Optional local model built from the same configuration, which receives the trained weights.
+
+    Returns:
+    - Dictionary with the number of workers, the run's wall time and each worker's resource usage.
+    """
+    context = mp.get_context('spawn')
+    messages = context.Queue()
+    init_method = f'tcp://127.0.0.1:{free_port()}'
+    progress_settings = {'room': progress.room, 'total_epochs': progress.total_epochs,
+                         'interval': progress.interval, 'batch_updates': progress.batch_updates}
+    tensors = tuple(tensor.share_memory_() for tensor in tensors)
+    processes = [context.Process(target=run_worker, daemon=True,
+                                 args=(rank, num_workers, init_method, model_config, loss_function, epochs, tensors,
+                                       progress_settings, threads, worker_cores[rank] if worker_cores else None, messages))
+                 for rank in range(num_workers)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+
+    usage = {}
+    error = None
+    try:
+        while len(usage) < num_workers and error is None:
+            try:
+                message = messages.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if any(process.exitcode not in (None, 0) for process in processes):
+                    error = 'A training worker exited unexpectedly'
+                continue
+            if message[0] == 'emit':
+                progress.socketio.emit(message[1], message[2], to=progress.room)
+            elif message[0] == 'done':
+                usage[message[1]] = message[2]
+                if message[3] is not None and model is not None:
+                    model.load_state_dict({name: torch.from_numpy(value) for name, value in message[3].items()})
+            else:
+                error = f'Training worker {message[1]} failed:\n{message[2]}'
+    finally:
+        for process in processes:
+            if error is not None:
+                process.terminate()  # The other workers would wait for the failed one until the timeout
+            process.join()
+
+    if error is not None:
+        raise RuntimeError(error)
+    return {'world_size': num_workers, 'wall_seconds': time.perf_counter() - start, 'workers': [usage[rank] for rank in range(num_workers)]}
@@ -0,0 +1,239 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import zipfile
+import pandas as pd
+from data_splitter import SPLITS
+from utils.artifact_cache import ArtifactCache
+from utils.background_jobs import BackgroundJobs
+
+try:
+    import zstandard
+except ImportError:  # zstd downloads are offered only when the zstandard package is installed
+    zstandard = None
+
+# Bytes read at a time while hashing or compressing a file
+COPY_BLOCK_SIZE = 1024 * 1024
+
+# Files up to this size are hashed and compressed within the request; larger ones in the background
+INLINE_PREPARE_BYTES = 16 * 1024 * 1024
+
+# Rows converted at a time when exporting the processed splits
+EXPORT_CHUNK_SIZE = 100000
+
+# Formats the processed splits can be exported to
+EXPORT_FORMATS = ['csv', 'jsonl', 'parquet']
+
+def content_hash(file_path, cache_folder):
+    """
+    Computes the SHA-256 of a file's content, caching it by the file's fingerprint so the file is
+    read only once per version.
+
+    Parameters:
+    - file_path: Path of the file to hash.
+    - cache_folder: Directory holding cached artifacts.
+
+    Returns:
+    - The hexadecimal digest of the file's content.
+    """
+    cache_path = ArtifactCache.path_for(cache_folder, 'contenthash', ArtifactCache.fingerprint(file_path), 'json')
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r') as file:
+            return json.load(file)['sha256']
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(COPY_BLOCK_SIZE), b''):
+            digest.update(block)
+    ArtifactCache.write_atomically(cache_path, lambda file: json.dump({'sha256': digest.hexdigest()}, file), mode='w')
+    return digest.hexdigest()
+
+def prepared_content_hash(file_path, cache_folder):
+    """
+    Returns the content hash of a file if it is cached or the file is small enough to hash now.
+
+    Otherwise the hash is computed in a background job and None is returned, so a large download
+    never waits for its file to be read twice.
+
+    Parameters:
+    - file_path: Path of the file to hash.
+    - cache_folder: Directory holding cached artifacts.
+
+    Returns:
+    - The hexadecimal digest of the file's content, or None while it is being computed.
+    """
+    fingerprint = ArtifactCache.fingerprint(file_path)
+    cache_path = ArtifactCache.path_for(cache_folder, 'contenthash', fingerprint, 'json')
+    if os.path.exists(cache_path) or os.path.getsize(file_path) <= INLINE_PREPARE_BYTES:
+        return content_hash(file_path, cache_folder)
+    BackgroundJobs.submit(f'contenthash_{fingerprint}', content_hash, file_path, cache_folder)
+    return None
+
+def available_encodings():
+    """Returns the content encodings downloads can be compressed with, in order of preference."""
+    return (['zstd'] if zstandard is not None else []) + ['gzip']
+
+def choose_encoding(accept_encoding, requested=None):
+    """
+    Picks the content encoding of a download.
+
+    Parameters:
+    - accept_encoding: The request's parsed Accept-Encoding header (a werkzeug Accept object).
+    - requested: Optional encoding requested explicitly, e.g. through a query parameter; 'identity'
+      disables compression.
+
+    Returns:
+    - 'zstd', 'gzip' or None for an uncompressed download.
+    """
+    if requested:
+        if requested == 'identity':
+            return None
+        if requested not in available_encodings():
+            raise ValueError(f'Unsupported encoding: {requested}')
+        return requested
+    for encoding in available_encodings():
+        if accept_encoding[encoding] > 0:
+            return encoding
+    return None
+
+def compress_file(source, destination, encoding):
+    """Streams `source` into `destination` compressed with gzip or zstd."""
+    with open(source, 'rb') as input_file:
+        if encoding == 'zstd':
+            zstandard.ZstdCompressor(level=3, threads=-1).copy_stream(input_file, destination)
+        else:
+            # mtime=0 keeps the compressed bytes identical for identical content
+            with gzip.GzipFile(fileobj=destination, mode='wb', compresslevel=6, mtime=0) as output_file:
+                shutil.copyfileobj(input_file, output_file, COPY_BLOCK_SIZE)
+
+def get_compressed_variant(file_path, encoding, cache_folder):
+    """
+    Returns the path of a compressed copy of a file, compressing it on first use.
+
+    The copy is cached by the source's fingerprint, so repeated and resumed downloads are served
+    straight from disk, and the byte ranges of the compressed representation stay stable.
+
+    Parameters:
+    - file_path: Path of the file to compress.
+    - encoding: 'gzip' or 'zstd'.
+    - cache_folder: Directory holding cached artifacts.
+
+    Returns:
+    - The path of the compressed file.
+    """
+    cache_path = compressed_variant_path(file_path, encoding, cache_folder)
+    if not os.path.exists(cache_path):
+        ArtifactCache.write_atomically(cache_path, lambda file: compress_file(file_path, file, encoding))
+    return cache_path
+
+def compressed_variant_path(file_path, encoding, cache_folder):
+    """Returns the cache path of the compressed copy of a file."""
+    extension = {'gzip': 'gz', 'zstd': 'zst'}[encoding]
+    return ArtifactCache.path_for(cache_folder, 'download', ArtifactCache.fingerprint(file_path), extension)
+
+def prepared_compressed_variant(file_path, encoding, cache_folder):
+    """
+    Returns the compressed copy of a file if it is cached or the file is small enough to compress now.
+
+    Otherwise the copy is built in a background job and None is returned, so the file can be sent
+    uncompressed instead of keeping the client waiting.
+
+    Parameters:
+    - file_path: Path of the file to compress.
+    - encoding: 'gzip' or 'zstd'.
+    - cache_folder: Directory holding cached artifacts.
+
+    Returns:
+    - The path of the compressed file, or None while it is being built.
+    """
+    cache_path = compressed_variant_path(file_path, encoding, cache_folder)
+    if os.path.exists(cache_path) or os.path.getsize(file_path) <= INLINE_PREPARE_BYTES:
+        return get_compressed_variant(file_path, encoding, cache_folder)
+    BackgroundJobs.submit(f'download_{os.path.basename(cache_path)}', get_compressed_variant, file_path, encoding, cache_folder)
+    return None
+
+def iter_processed_split(upload_folder, split):
+    """
+    Yields the processed features of a split joined with their label codes, chunk by chunk.
+
+    The features are read as float64 and the labels as int64, so every chunk has the same types
+    even when a column holds only whole numbers in one chunk and decimals or gaps in the next.
+    """
+    features = pd.read_csv(os.path.join(upload_folder, f'processed_{split}.csv'), chunksize=EXPORT_CHUNK_SIZE, dtype='float64')
+    labels = pd.read_csv(os.path.join(upload_folder, f'processed_y_{split}.csv'), chunksize=EXPORT_CHUNK_SIZE, dtype='int64')
+    for features_chunk, labels_chunk in zip(features, labels):
+        yield pd.concat([features_chunk, labels_chunk], axis=1)
+
+def write_split(chunks, file, export_format):
+    """
+    Writes the chunks of one split to an open binary file in the given format.
+
+    A Parquet file has one schema, taken from the first chunk; the later chunks are converted to it.
+    """
+    if export_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, schema=writer.schema if writer is not None else None, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(file, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+        return
+
+    for position, chunk in enumerate(chunks):
+        if export_format == 'jsonl':
+            text = chunk.to_json(orient='records', lines=True)
+            file.write(text.encode('utf-8') if text.endswith('\n') else f'{text}\n'.encode('utf-8'))
+        else:
+            file.write(chunk.to_csv(header=position == 0, index=False).encode('utf-8'))
+
+def export_processed_splits(upload_folder, export_format, cache_folder):
+    """
+    Packs the processed training, validation and test splits into a zip archive.
+
+    Each split is written as one file with its feature columns and the 'label' column. The archive
+    is cached by the fingerprints of the processed files, so it is only rebuilt after the data is
+    processed again.
+
+    Parameters:
+    - upload_folder: Directory where the processed splits are stored.
+    - export_format: One of EXPORT_FORMATS.
+    - cache_folder: Directory holding cached artifacts.
+
+    Returns:
+    - The path of the zip archive.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export format: {export_format}')
+    if export_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError('Parquet export requires the pyarrow package')
+
+    sources = [os.path.join(upload_folder, f'{prefix}{split}.csv') for split in SPLITS for prefix in ['processed_', 'processed_y_']]
+    missing = [source for source in sources if not os.path.exists(source)]
+    if missing:
+        raise FileNotFoundError('The data has not been processed yet')
+
+    key = hashlib.sha1(''.join(ArtifactCache.fingerprint(source, export_format) for source in sources).encode('utf-8')).hexdigest()[:16]
+    cache_path = ArtifactCache.path_for(cache_folder, 'export', key, 'zip')
+    if os.path.exists(cache_path):
+        return cache_path
+
+    def write_archive(file):
+        with zipfile.ZipFile(file, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for split in SPLITS:
+                # Parquet is already compressed, so its members are stored as they are
+                info = zipfile.ZipInfo(f'{split}.{export_format}')
+                info.compress_type = zipfile.ZIP_STORED if export_format == 'parquet' else zipfile.ZIP_DEFLATED
+                with archive.open(info, 'w', force_zip64=True) as member:
+                    write_split(iter_processed_split(upload_folder, split), member, export_format)
+
+    ArtifactCache.write_atomically(cache_path, write_archive)
+    return cache_path
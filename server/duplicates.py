@@ -0,0 +1,198 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+from utils.artifact_cache import ArtifactCache
+
+# Number of rows hashed at a time when building an index from a file
+CHUNK_SIZE = 100000
+
+def normalize_rows(chunk):
+    """
+    Brings the columns of a chunk into a canonical form before hashing or comparing rows.
+
+    Numeric columns are converted to float64 so that a column read as int in one chunk and as float
+    in another (because of missing values) still produces identical hashes for identical rows.
+    """
+    return pd.DataFrame({
+        col: chunk[col].astype('float64') if is_numeric_dtype(chunk[col]) and not is_bool_dtype(chunk[col]) else chunk[col]
+        for col in chunk.columns
+    }).reset_index(drop=True)
+
+def row_hashes(chunk):
+    """Computes a vectorized 64-bit hash of every row of a chunk."""
+    return pd.util.hash_pandas_object(normalize_rows(chunk), index=False).to_numpy(dtype=np.uint64)
+
+class DuplicateIndex:
+    """
+    Verified content keys for every row of a dataset.
+
+    Rows with identical values share a key. A key is the row's 64-bit hash, except for rows whose
+    hash collides with a row holding different values; those are given a fresh key during
+    verification. Duplicate queries are therefore exact and cost a sort over 8 bytes per row.
+    """
+    def __init__(self, keys):
+        self.keys = np.asarray(keys, dtype=np.uint64)
+
+    def duplicated(self, order=None):
+        """
+        Flags every row that repeats an earlier row, like DataFrame.duplicated(keep='first').
+
+        :param order: Optional array of row positions giving the order in which rows are visited,
+                      e.g. the concatenation of the train, validation and test indices.
+        :return: Boolean array aligned with `order` (or with the rows, if no order is given).
+        """
+        keys = self.keys if order is None else self.keys[order]
+        _, first_occurrences = np.unique(keys, return_index=True)
+        mask = np.ones(len(keys), dtype=bool)
+        mask[first_occurrences] = False
+        return mask
+
+    @property
+    def duplicate_count(self):
+        """Number of rows that repeat an earlier row."""
+        return int(len(self.keys) - len(np.unique(self.keys)))
+
+    def save(self, path):
+        """Writes the keys to a .npy file, replacing any previous file atomically."""
+        ArtifactCache.write_atomically(path, lambda file: np.save(file, self.keys))
+
+    @classmethod
+    def load(cls, path):
+        """Reads keys previously written with `save`."""
+        return cls(np.load(path))
+
+    @classmethod
+    def from_frame(cls, df):
+        """Builds the index of an in-memory DataFrame."""
+        return build_duplicate_index(lambda: iter([df]))
+
+def iter_hashes(chunks, workers=1):
+    """
+    Yields the row hashes of each chunk, in order.
+
+    With more than one worker, chunks are hashed in a process pool. At most two chunks per worker
+    are in flight, so memory stays bounded while the reader keeps the workers busy.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield row_hashes(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(row_hashes, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def fresh_key(hashes, taken):
+    """Draws a random key that is neither a row hash nor a key assigned earlier."""
+    rng = np.random.default_rng()
+    while True:
+        key = rng.integers(0, np.iinfo(np.uint64).max, dtype=np.uint64, endpoint=True)
+        if key not in taken and not np.isin(key, hashes):
+            taken.add(key)
+            return key
+
+def verify_collisions(chunks, hashes, candidates, keys):
+    """
+    Compares the actual values of rows sharing a hash and re-keys rows whose hash collides.
+
+    Only rows whose hash occurs more than once are materialized, so the extra memory is bounded by
+    the number of duplicated rows rather than by the size of the dataset.
+
+    Parameters:
+    - chunks: Iterator over the dataset's chunks, in the same order used to compute `hashes`.
+    - hashes: Array of row hashes for the whole dataset.
+    - candidates: Hash values that occur more than once.
+    - keys: Array of keys, updated in place for rows that need a fresh key.
+    """
+    rows = []
+    positions = []
+    offset = 0
+    for chunk in chunks:
+        selected = np.isin(hashes[offset:offset + len(chunk)], candidates)
+        if selected.any():
+            rows.append(normalize_rows(chunk[selected]))
+            positions.append(offset + np.flatnonzero(selected))
+        offset += len(chunk)
+
+    candidate_rows = pd.concat(rows, ignore_index=True)
+    positions = np.concatenate(positions)
+
+    # Group candidate rows by their exact values and check each hash maps to a single group
+    groups = candidate_rows.groupby(list(candidate_rows.columns), dropna=False, sort=False, observed=True).ngroup().to_numpy()
+    frame = pd.DataFrame({'hash': hashes[positions], 'group': groups})
+    groups_per_hash = frame.groupby('hash')['group'].nunique()
+
+    taken = set()
+    for collided_hash in groups_per_hash[groups_per_hash > 1].index:
+        colliding = frame[frame['hash'] == collided_hash]
+        # The first group keeps the hash as its key, every other group gets its own key
+        for group in colliding['group'].unique()[1:]:
+            keys[positions[colliding.index[colliding['group'] == group]]] = fresh_key(hashes, taken)
+
+def build_duplicate_index(make_chunks, workers=1):
+    """
+    Builds a DuplicateIndex from a dataset read chunk by chunk.
+
+    Parameters:
+    - make_chunks: Callable returning a fresh iterator over the dataset's chunks. It is called a
+      second time only when some hashes repeat and the repeated rows need to be verified.
+    - workers: Number of processes used to hash chunks.
+
+    Returns:
+    - The DuplicateIndex of the dataset.
+    """
+    hashes = list(iter_hashes(make_chunks(), workers))
+    hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+
+    unique_hashes, counts = np.unique(hashes, return_counts=True)
+    candidates = unique_hashes[counts > 1]
+    keys = hashes.copy()
+    if len(candidates):
+        verify_collisions(make_chunks(), hashes, candidates, keys)
+    return DuplicateIndex(keys)
+
+def get_duplicate_index(file_path, cache_folder=None, columns=None, chunk_size=CHUNK_SIZE, workers=1):
+    """
+    Returns the DuplicateIndex of a CSV file, building and caching it on first use.
+
+    The index is cached by the file's fingerprint, so the data summary, the before/after
+    comparison and the deduplication step all share one computation per file.
+
+    Parameters:
+    - file_path: Path of the CSV file.
+    - cache_folder: Directory holding cached artifacts; the index is not cached if omitted.
+    - columns: Optional list of columns the rows are compared on (all columns by default).
+    - chunk_size: Number of rows read at a time.
+    - workers: Number of processes used to hash chunks.
+
+    Returns:
+    - The DuplicateIndex of the file's rows, in file order.
+    """
+    def make_chunks():
+        return pd.read_csv(file_path, usecols=columns, chunksize=chunk_size)
+
+    if cache_folder is None:
+        return build_duplicate_index(make_chunks, workers)
+
+    index = load_cached_duplicate_index(file_path, cache_folder, columns)
+    if index is None:
+        index = build_duplicate_index(make_chunks, workers)
+        index.save(ArtifactCache.path_for(cache_folder, 'duplicates', ArtifactCache.fingerprint(file_path, columns), 'npy'))
+    return index
+
+def load_cached_duplicate_index(file_path, cache_folder, columns=None):
+    """
+    Returns the cached DuplicateIndex of a CSV file, or None if it has not been built yet.
+
+    Unlike `get_duplicate_index`, this never reads the file, so it is safe to call on latency-sensitive paths.
+    """
+    cache_path = ArtifactCache.path_for(cache_folder, 'duplicates', ArtifactCache.fingerprint(file_path, columns), 'npy')
+    return DuplicateIndex.load(cache_path) if os.path.exists(cache_path) else None
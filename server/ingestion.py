@@ -0,0 +1,196 @@
+import csv
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from utils.background_jobs import BackgroundJobs
+
+# Number of rows converted at a time for formats that can be streamed
+CHUNK_SIZE = 100000
+
+# Delimiters recognised in plain text uploads
+TEXT_DELIMITERS = ',\t;| '
+
+def get_canonical_path(file_path):
+    """Returns the path of the canonical CSV written next to an uploaded file."""
+    return os.path.splitext(file_path)[0] + '.csv'
+
+def get_status_path(file_path):
+    """Returns the path of the conversion status written next to an uploaded file."""
+    return os.path.splitext(file_path)[0] + '_ingestion.json'
+
+def read_sheet(file_path, sheet_name):
+    """Reads a single worksheet; runs in a worker process when a workbook has several sheets."""
+    return pd.read_excel(file_path, sheet_name=sheet_name)
+
+def convert_workbook(file_path, canonical_path, max_workers=None):
+    """
+    Converts an Excel workbook (xlsx or xls) to CSV.
+
+    Sheets are parsed in parallel worker processes and stacked in workbook order; sheets with
+    different columns are aligned on the union of their columns.
+
+    Parameters:
+    - file_path: Path of the uploaded workbook.
+    - canonical_path: Path of the CSV file to write.
+    - max_workers: Maximum number of worker processes (defaults to one per sheet, capped by the CPU count).
+    """
+    sheet_names = pd.ExcelFile(file_path).sheet_names
+    if len(sheet_names) == 1:
+        frames = [read_sheet(file_path, sheet_names[0])]
+    else:
+        workers = max_workers or min(len(sheet_names), os.cpu_count() or 1)
+        # Spawned rather than forked: the server forking itself copies the locks held by its other threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            frames = list(executor.map(read_sheet, [file_path] * len(sheet_names), sheet_names))
+
+    pd.concat(frames, ignore_index=True).to_csv(canonical_path, index=False)
+
+def is_json_lines(file_path):
+    """Checks whether a JSON file holds one record per line rather than a single JSON document."""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        first_line = ''
+        for line in file:
+            if line.strip():
+                first_line = line
+                break
+        has_more_lines = any(line.strip() for line in file)
+
+    try:
+        return has_more_lines and isinstance(json.loads(first_line), dict)
+    except ValueError:
+        return False
+
+def convert_json(file_path, canonical_path):
+    """
+    Converts a JSON upload to CSV.
+
+    JSON-lines files are streamed in chunks twice: a first pass collects the union of the keys of
+    all records, in order of first appearance, and the second writes every chunk aligned on it.
+    Any other JSON document (e.g. an array of records) is parsed with pandas in one go.
+
+    Parameters:
+    - file_path: Path of the uploaded JSON file.
+    - canonical_path: Path of the CSV file to write.
+    """
+    if not is_json_lines(file_path):
+        pd.read_json(file_path).to_csv(canonical_path, index=False)
+        return
+
+    columns = {}
+    for chunk in pd.read_json(file_path, lines=True, chunksize=CHUNK_SIZE):
+        columns.update(dict.fromkeys(chunk.columns))
+    with open(canonical_path, 'w', newline='') as output:
+        for chunk in pd.read_json(file_path, lines=True, chunksize=CHUNK_SIZE):
+            chunk.reindex(columns=list(columns)).to_csv(output, header=output.tell() == 0, index=False)
+
+def detect_delimiter(file_path):
+    """Guesses the delimiter of a plain text table from its first lines, defaulting to a comma."""
+    with open(file_path, 'r', encoding='utf-8', newline='') as file:
+        sample = file.read(64 * 1024)
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=TEXT_DELIMITERS).delimiter
+    except csv.Error:
+        return ','
+
+def convert_text(file_path, canonical_path):
+    """
+    Converts a delimited plain text upload to CSV, streaming it in chunks.
+
+    Parameters:
+    - file_path: Path of the uploaded text file.
+    - canonical_path: Path of the CSV file to write.
+    """
+    delimiter = detect_delimiter(file_path)
+    with open(canonical_path, 'w', newline='') as output:
+        for chunk in pd.read_csv(file_path, sep=delimiter, chunksize=CHUNK_SIZE):
+            chunk.to_csv(output, header=output.tell() == 0, index=False)
+
+# Converter for each supported upload extension; CSV files are already canonical
+CONVERTERS = {
+    'xlsx': convert_workbook,
+    'xls': convert_workbook,
+    'json': convert_json,
+    'txt': convert_text,
+}
+
+def ingest_upload(file_path):
+    """
+    Converts an uploaded file once into the canonical CSV representation read by every endpoint.
+
+    Parameters:
+    - file_path: Path of the uploaded file; its extension selects the converter.
+
+    Returns:
+    - The path of the canonical CSV file (the upload itself for CSV files).
+    """
+    extension = file_path.rsplit('.', 1)[-1].lower()
+    canonical_path = get_canonical_path(file_path)
+    if extension == 'csv':
+        # Normalise the extension's case so the file is found by the '.csv' lookups
+        if file_path != canonical_path:
+            os.replace(file_path, canonical_path)
+        return canonical_path
+
+    # Convert under a name the endpoints do not pick up, so they never read a partial file
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(canonical_path)), suffix='.part')
+    os.close(descriptor)
+    try:
+        CONVERTERS[extension](file_path, temporary_path)
+        os.replace(temporary_path, canonical_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return canonical_path
+
+def write_status(file_path, status):
+    """Records the conversion status of an upload."""
+    with open(get_status_path(file_path), 'w') as file:
+        json.dump(status, file)
+
+def run_ingestion(file_path, on_ready=None):
+    """
+    Converts an upload and records the outcome, for uploads converted in the background.
+
+    Parameters:
+    - file_path: Path of the uploaded file.
+    - on_ready: Optional function called with the canonical CSV path once the conversion succeeded.
+    """
+    try:
+        canonical_path = ingest_upload(file_path)
+    except Exception as e:
+        write_status(file_path, {'state': 'failed', 'error': f'Could not read uploaded file: {e}'})
+        return
+    write_status(file_path, {'state': 'ready'})
+    if on_ready is not None:
+        on_ready(canonical_path)
+
+def ingest_in_background(file_path, on_ready=None):
+    """
+    Starts converting an upload in a background job, so the request returns while large files convert.
+
+    Parameters:
+    - file_path: Path of the uploaded file.
+    - on_ready: Optional function called with the canonical CSV path once the conversion succeeded.
+    """
+    write_status(file_path, {'state': 'converting'})
+    BackgroundJobs.submit(f'ingestion_{os.path.basename(file_path)}', run_ingestion, file_path, on_ready)
+
+def get_status(file_path):
+    """
+    Reads the conversion status of an upload.
+
+    Parameters:
+    - file_path: Path of the uploaded file.
+
+    Returns:
+    - Dictionary with the 'state' ('converting', 'ready' or 'failed') and, on failure, the 'error';
+      None if the upload is unknown.
+    """
+    status_path = get_status_path(file_path)
+    if not os.path.exists(status_path):
+        return None
+    with open(status_path, 'r') as file:
+        return json.load(file)
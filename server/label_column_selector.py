@@ -1,32 +1,39 @@
 import json
-import pandas as pd
 import os
+from typed_loader import get_schema, save_schema, select_columns
 
-def select_label_column(upload_folder, file_path, label_column):
+def select_label_column(upload_folder, file_path, label_column, columns=None, cache_folder=None):
     """
     Selects the specified label column from the dataset.
     
+    :param upload_folder: Directory where the selection and the column data types are saved.
     :param file_path: Path to the uploaded dataset file.
     :param label_column: Name of the column to be used as the label.
+    :param columns: Optional list of columns kept after dropping columns; only these are read.
+    :param cache_folder: Optional directory where the file's inferred schema is cached.
     :return: A JSON response indicating success or failure.
     """
     if not os.path.exists(file_path):
         return {'error': 'File not found'}, 404
 
     try:
-        df = pd.read_csv(file_path)
+        # Only the schema is needed: the columns' compact dtypes are inferred in one chunked pass
+        schema = get_schema(file_path, cache_folder)
+        kept_columns = columns if columns is not None else list(schema['dtypes'])
 
-        if label_column not in df.columns:
+        if label_column not in kept_columns:
             return {'error': 'Label column not found'}, 404
 
         # Saving the label column selection for future use
         selected_columns = {'label_column': label_column}
-        selected_columns_path = file_path.replace('.csv', '_selected_columns.json')
+        selected_columns_path = os.path.join(upload_folder, os.path.basename(file_path).replace('.csv', '_selected_columns.json'))
         with open(selected_columns_path, 'w') as file:
             json.dump(selected_columns, file)
 
-        # Create a dictionary with column names and their data types
-        data_types = {col: str(df[col].dtype) for col in df.columns}
+        # Save the schema every pipeline stage reads the data with, and the names of its data types
+        schema = select_columns(schema, kept_columns)
+        save_schema(upload_folder, schema)
+        data_types = dict(schema['dtypes'])
 
         # Convert the dictionary to JSON and save it to a file
         with open(os.path.join(upload_folder, 'column_data_types.json'), 'w') as json_file:
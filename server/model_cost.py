@@ -0,0 +1,283 @@
+import copy
+import hashlib
+import json
+import math
+import os
+import time
+import torch
+import resource_manager
+import training
+from data_splitter import SPLIT_INFO_FILE
+from utils.background_jobs import BackgroundJobs
+from utils.native_threads import NativeThreads
+
+# Bytes per value of the float32 weights, gradients, optimizer state and activations
+FLOAT_BYTES = 4
+
+# Values RMSprop keeps per parameter (the running average of squared gradients)
+OPTIMIZER_STATE_VALUES = 1
+
+# Models with more parameters, or whose input batch takes more bytes, are calibrated on a narrower
+# copy, so the estimate never allocates a huge model or batch
+MAX_CALIBRATION_PARAMETERS = 2_000_000
+MAX_CALIBRATION_BATCH_BYTES = 4 * 1024 * 1024
+
+# Batches timed before the measurement, and the time spent measuring per calibrated model
+CALIBRATION_WARMUP_BATCHES = 5
+CALIBRATION_SECONDS = 0.3
+MAX_CALIBRATION_BATCHES = 500
+
+# Calibrations already measured in this process, by model configuration; the oldest are dropped first
+MAX_CALIBRATIONS = 64
+_calibrations = {}
+
+def complete_config(model_config, network_parameters):
+    """
+    Completes a configuration being edited in the model builder into the one training will build.
+
+    Parameters:
+    - model_config: The model configuration; the input size and output layer are added when missing.
+    - network_parameters: Dictionary with the 'num_cols' and 'num_label_classes' of the processed data.
+
+    Returns:
+    - A copy of the configuration with its 'input_size' and output layer, sized as in training.
+    """
+    model_config = copy.deepcopy(model_config)
+    model_config.setdefault('input_size', network_parameters['num_cols'])
+    if not model_config['layers'] or model_config['layers'][-1].get('id') != 'outputLayer':
+        # Added the same way when the model is built
+        num_classes = network_parameters['num_label_classes']
+        model_config['layers'].append({'id': 'outputLayer', 'type': 'dense',
+                                       'settings': {'nodes': num_classes, 'activation': 'softmax' if num_classes > 2 else 'sigmoid'}})
+    return training.resolve_output_layer(model_config)[0]
+
+def layer_costs(model_config):
+    """
+    Lists the modules NeuralNetwork builds from a configuration with their size and arithmetic.
+
+    Element-wise modules count one operation per value; a dense layer counts a multiply-add per
+    weight plus the bias.
+
+    Parameters:
+    - model_config: A complete model configuration.
+
+    Returns:
+    - List of dictionaries with the module 'type', its 'outputs' per row, 'parameters' and 'forward_flops' per row.
+    """
+    layers = []
+    width = model_config['input_size']
+    for layer in model_config['layers']:
+        if layer['type'] == 'dense':
+            nodes = layer['settings']['nodes']
+            layers.append({'type': 'dense', 'outputs': nodes, 'parameters': (width + 1) * nodes, 'forward_flops': (2 * width + 1) * nodes})
+            activation = layer['settings']['activation']
+            if activation == 'relu' or (activation == 'sigmoid' and layer == model_config['layers'][-1]):
+                layers.append({'type': activation, 'outputs': nodes, 'parameters': 0, 'forward_flops': nodes})
+            width = nodes
+        elif layer['type'] == 'dropout':
+            layers.append({'type': 'dropout', 'outputs': width, 'parameters': 0, 'forward_flops': width})
+    return layers
+
+def scaled_config(model_config, factor):
+    """Returns a copy of a configuration with the input and the hidden dense layers `factor` times as wide (at least one node)."""
+    model_config = copy.deepcopy(model_config)
+    model_config['input_size'] = max(1, round(model_config['input_size'] * factor))
+    for layer in model_config['layers'][:-1]:  # The output layer keeps one node per class
+        if layer['type'] == 'dense':
+            layer['settings']['nodes'] = max(1, round(layer['settings']['nodes'] * factor))
+    return model_config
+
+def training_flops(model_config):
+    """Returns the operations of one forward pass and of one training step (forward and backward, about three times as many) per row."""
+    forward = sum(layer['forward_flops'] for layer in layer_costs(model_config))
+    return forward, 3 * forward
+
+def batch_bytes(model_config):
+    """Returns the bytes of the input of a training batch of a model."""
+    return training.TRAIN_BATCH_SIZE * model_config['input_size'] * FLOAT_BYTES
+
+def time_batches(model_config, config):
+    """
+    Times training and evaluation batches of a model built from the configuration, with the code
+    and the thread count training uses.
+
+    Every timed batch is the same random batch, so the data allocated is a single batch whatever the
+    number of batches timed. The timing holds the training resources, so it waits for training runs
+    in the server process to finish rather than competing with them.
+
+    Parameters:
+    - model_config: A complete model configuration, small enough to build.
+    - config: Flask application config, for the training threads and cores.
+
+    Returns:
+    - Seconds per training batch, seconds per evaluation batch and the number of threads used.
+    """
+    model, optimizer = training.compile_model(copy.deepcopy(model_config))
+    loss_function = training.resolve_output_layer(copy.deepcopy(model_config))[1]
+    outputs = model_config['layers'][-1]['settings']['nodes']
+    batch = (torch.randn(training.TRAIN_BATCH_SIZE, model_config['input_size']),
+             torch.randint(0, max(outputs, 2), (training.TRAIN_BATCH_SIZE,)))
+
+    def seconds_per_batch(run, num_batches):
+        start = time.perf_counter()
+        run([batch] * num_batches)
+        return (time.perf_counter() - start) / num_batches
+
+    train = lambda batches: training.train_epoch(model, optimizer, batches, loss_function, 1)
+    evaluate = lambda batches: training.collect_predictions(model, batches, loss_function)
+    resources = resource_manager.plan_resources(config, model, training.TRAIN_BATCH_SIZE)
+    with resources:
+        timings = []
+        for run in [train, evaluate]:
+            # The warm-up batches also tell how many batches fit in the measuring time
+            estimate = seconds_per_batch(run, CALIBRATION_WARMUP_BATCHES)
+            num_batches = min(max(int(CALIBRATION_SECONDS / max(estimate, 1e-9)), CALIBRATION_WARMUP_BATCHES), MAX_CALIBRATION_BATCHES)
+            timings.append(seconds_per_batch(run, num_batches))
+    return timings[0], timings[1], resources.threads
+
+def extrapolate(small_seconds, large_seconds, small_flops, large_flops, flops):
+    """
+    Projects the time of a batch from the times of a minimal and a larger copy of the model.
+
+    Parameters:
+    - small_seconds, large_seconds: Measured times of a batch of the two copies.
+    - small_flops, large_flops: Operations per row of the two copies.
+    - flops: Operations per row of the model.
+
+    Returns:
+    - The projected time of a batch in seconds.
+    """
+    seconds_per_flop = max(large_seconds - small_seconds, 0) / max(large_flops - small_flops, 1)
+    if seconds_per_flop == 0:
+        # The overhead hid the computation; count the larger copy's whole time as computation
+        seconds_per_flop = large_seconds / large_flops
+    return small_seconds + seconds_per_flop * (flops - small_flops)
+
+def calibration_key(model_config):
+    """Returns the key of a model configuration's calibration."""
+    return json.dumps(model_config, sort_keys=True)
+
+def calibrate(model_config, num_parameters, config):
+    """
+    Measures the time of a training and an evaluation batch of the model on this machine.
+
+    Models up to MAX_CALIBRATION_PARAMETERS, with batches up to MAX_CALIBRATION_BATCH_BYTES, are
+    timed as they are. Larger models are timed through two narrower copies of the same layers: one a
+    single node wide, whose time is the per-batch overhead, and one as large as allowed, which gives
+    the time per operation on top of it.
+
+    Parameters:
+    - model_config: A complete model configuration.
+    - num_parameters: Number of parameters of the model.
+    - config: Flask application config, for the training threads and cores.
+
+    Returns:
+    - Dictionary with the 'method' ('full' or 'scaled'), the 'train_seconds_per_batch',
+      'eval_seconds_per_batch' and the 'threads' used.
+    """
+    key = calibration_key(model_config)
+    if key not in _calibrations:
+        if num_parameters <= MAX_CALIBRATION_PARAMETERS and batch_bytes(model_config) <= MAX_CALIBRATION_BATCH_BYTES:
+            train_seconds, eval_seconds, threads = time_batches(model_config, config)
+            method = 'full'
+        else:
+            # The parameters grow with the square of the width, the batch linearly
+            max_inputs = MAX_CALIBRATION_BATCH_BYTES // (training.TRAIN_BATCH_SIZE * FLOAT_BYTES)
+            factor = min(math.sqrt(MAX_CALIBRATION_PARAMETERS / num_parameters), max_inputs / model_config['input_size'])
+            small = scaled_config(model_config, 0)
+            large = scaled_config(model_config, factor)
+            (small_train, small_eval, _), (large_train, large_eval, threads) = time_batches(small, config), time_batches(large, config)
+            (small_forward, small_step), (large_forward, large_step), (forward, step) = [
+                training_flops(model) for model in [small, large, model_config]]
+            train_seconds = extrapolate(small_train, large_train, small_step, large_step, step)
+            eval_seconds = extrapolate(small_eval, large_eval, small_forward, large_forward, forward)
+            method = 'scaled'
+        if len(_calibrations) >= MAX_CALIBRATIONS:
+            _calibrations.pop(next(iter(_calibrations)))
+        _calibrations[key] = {'method': method, 'train_seconds_per_batch': train_seconds,
+                              'eval_seconds_per_batch': eval_seconds, 'threads': threads}
+    return _calibrations[key]
+
+def calibrate_in_background(model_config, num_parameters, config):
+    """
+    Starts calibrating a model in a background job running in a native thread, unless it is already being calibrated.
+
+    Returns:
+    - The key of the job.
+    """
+    job_key = 'calibration_' + hashlib.sha1(calibration_key(model_config).encode('utf-8')).hexdigest()[:16]
+    BackgroundJobs.submit(job_key, NativeThreads.run, calibrate, model_config, num_parameters, config)
+    return job_key
+
+def split_rows(upload_folder):
+    """
+    Reads the number of training, validation and test rows of the current split.
+
+    Parameters:
+    - upload_folder: Directory where the split definition is stored.
+
+    Returns:
+    - Tuple of the training, validation and test row counts.
+    """
+    split_info_path = os.path.join(upload_folder, SPLIT_INFO_FILE)
+    if not os.path.exists(split_info_path):
+        raise FileNotFoundError('The dataset has not been split yet')
+    with open(split_info_path, 'r') as file:
+        split_info = json.load(file)
+    return split_info['train_size'], split_info['validation_size'], split_info['test_size']
+
+def estimate_cost(model_config, network_parameters, rows, config, background=False):
+    """
+    Estimates what training a model will cost before it is built.
+
+    The sizes and memory are computed from the configuration alone. The epoch time is calibrated
+    by timing batches of the model's layers with the training code on this machine, once per
+    configuration.
+
+    Parameters:
+    - model_config: The model configuration, as edited in the model builder or as saved.
+    - network_parameters: Dictionary with the 'num_cols' and 'num_label_classes' of the processed data.
+    - rows: Tuple of the training, validation and test row counts.
+    - config: Flask application config, for the training threads and cores.
+    - background: Whether a configuration not calibrated yet is calibrated in a background job
+      instead of before returning, as for requests.
+
+    Returns:
+    - Dictionary with the 'layers' (see layer_costs), the 'parameters', the 'forward_flops' and
+      'training_flops' per row, the 'memory' in bytes (weights, gradients, optimizer state,
+      activations of a training batch, the data tensors and their total), the 'calibration' and
+      the projected 'epoch_seconds', including the validation pass. While a background calibration
+      runs, 'calibrating' is True and the calibration and epoch time are None.
+    """
+    model_config = complete_config(model_config, network_parameters)
+    if model_config['input_size'] < 1 or any(layer['type'] == 'dense' and layer['settings']['nodes'] < 1 for layer in model_config['layers']):
+        raise ValueError('Every dense layer needs at least one node')
+    layers = layer_costs(model_config)
+    num_parameters = sum(layer['parameters'] for layer in layers)
+    forward_flops, step_flops = training_flops(model_config)
+    train_rows, val_rows, test_rows = rows
+
+    batch_values = training.TRAIN_BATCH_SIZE * (model_config['input_size'] + sum(layer['outputs'] for layer in layers))
+    memory = {
+        'parameters': num_parameters * FLOAT_BYTES,
+        'gradients': num_parameters * FLOAT_BYTES,
+        'optimizer': num_parameters * OPTIMIZER_STATE_VALUES * FLOAT_BYTES,
+        'activations': batch_values * FLOAT_BYTES,
+        'data': (train_rows + val_rows + test_rows) * model_config['input_size'] * FLOAT_BYTES,
+    }
+    memory['total'] = sum(memory.values())
+
+    train_batches = math.ceil(train_rows / training.TRAIN_BATCH_SIZE)
+    val_batches = math.ceil(val_rows / training.TRAIN_BATCH_SIZE)
+    calibration = _calibrations.get(calibration_key(model_config))
+    if calibration is None and background:
+        calibrate_in_background(model_config, num_parameters, config)
+        epoch_seconds = None
+    else:
+        calibration = calibration or calibrate(model_config, num_parameters, config)
+        epoch_seconds = train_batches * calibration['train_seconds_per_batch'] + val_batches * calibration['eval_seconds_per_batch']
+    return {'input_size': model_config['input_size'], 'layers': layers, 'parameters': num_parameters,
+            'forward_flops': forward_flops, 'training_flops': step_flops, 'memory': memory,
+            'batch_size': training.TRAIN_BATCH_SIZE, 'train_rows': train_rows, 'validation_rows': val_rows,
+            'batches_per_epoch': train_batches, 'calibration': calibration, 'epoch_seconds': epoch_seconds,
+            'calibrating': calibration is None}
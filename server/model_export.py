@@ -0,0 +1,335 @@
+"""
+Saving, exporting and benchmarking the trained models of training runs.
+
+Optional dependencies: ONNX export needs the onnx package, and benchmarking the ONNX exports needs
+onnxruntime (`pip install onnx onnxruntime`). Without them, models are exported to TorchScript only.
+"""
+import io
+import json
+import os
+import statistics
+import time
+import numpy as np
+import torch
+import resource_manager
+from training import NeuralNetwork
+from typed_loader import as_objects
+from utils.artifact_cache import ArtifactCache
+from utils.background_jobs import BackgroundJobs
+from utils.native_threads import NativeThreads
+
+try:
+    import onnx
+except ImportError:  # ONNX export is offered only when the onnx package is installed
+    onnx = None
+
+try:
+    import onnxruntime
+except ImportError:  # Exported ONNX models are then not benchmarked
+    onnxruntime = None
+
+# Formats a trained model can be exported to, with the file name suffix of each
+EXPORT_FORMATS = {'torchscript': '_torchscript.pt', 'onnx': '.onnx'}
+
+# Name of the preprocessing metadata inside the exported artifacts
+METADATA_KEY = 'preprocessing.json'
+
+# Batch sizes timed by the benchmark: single-row scoring and batch scoring
+BENCHMARK_BATCH_SIZES = [1, 256]
+
+# Untimed calls before measuring, then timed calls per format and batch size
+WARMUP_RUNS = 10
+BENCHMARK_RUNS = 100
+
+# Limits of the benchmark options accepted from clients
+MAX_BENCHMARK_RUNS = 1000
+MAX_BENCHMARK_BATCH_SIZE = 4096
+MAX_BENCHMARK_BATCH_SIZES = 4
+
+def checkpoint_path(runs_folder, run_id):
+    """Returns the path of the trained weights of a run."""
+    return os.path.join(runs_folder, f'{run_id}_model.pt')
+
+def export_path(runs_folder, run_id, export_format):
+    """Returns the path of a run's model exported to the given format."""
+    return os.path.join(runs_folder, f'{run_id}{EXPORT_FORMATS[export_format]}')
+
+def available_formats():
+    """
+    Lists the formats models can be exported to in this installation.
+
+    Returns:
+    - List of format names; 'onnx' is included only when the onnx package is installed.
+    """
+    return [export_format for export_format in EXPORT_FORMATS if export_format != 'onnx' or onnx is not None]
+
+def load_preprocessing(upload_folder):
+    """
+    Reads the preprocessing fitted when the data was last processed.
+
+    Parameters:
+    - upload_folder: Directory holding the preprocessing metadata of the processed data.
+
+    Returns:
+    - The preprocessing metadata, or None for data processed before it was recorded.
+    """
+    preprocessing_path = os.path.join(upload_folder, 'preprocessing.json')
+    if not os.path.exists(preprocessing_path):
+        return None
+    with open(preprocessing_path, 'r') as file:
+        return json.load(file)
+
+def save_trained_model(runs_folder, run_id, model, model_config, preprocessing):
+    """
+    Saves the trained weights of a run with everything needed to rebuild and feed the model.
+
+    Parameters:
+    - runs_folder: Directory where the runs are stored.
+    - run_id: Identifier of the run.
+    - model: The trained NeuralNetwork.
+    - model_config: The configuration the model was built from.
+    - preprocessing: The preprocessing metadata read with the training data when the run started
+      (see load_preprocessing), so the exports stay consistent with the model even if the data is
+      processed again during or after the run.
+    """
+    checkpoint = {'model_config': model_config, 'state_dict': model.state_dict(), 'preprocessing': preprocessing}
+    ArtifactCache.write_atomically(checkpoint_path(runs_folder, run_id), lambda file: torch.save(checkpoint, file))
+
+def load_trained_model(runs_folder, run_id):
+    """
+    Rebuilds the trained model of a run in evaluation mode.
+
+    Parameters:
+    - runs_folder: Directory where the runs are stored.
+    - run_id: Identifier of the run.
+
+    Returns:
+    - model: The NeuralNetwork with the trained weights.
+    - metadata: Dictionary with the 'input_size', the 'output' activation and the 'preprocessing'
+      turning a raw row into the network's input (None for data processed before it was recorded).
+    """
+    path = checkpoint_path(runs_folder, run_id)
+    if not os.path.exists(path):
+        raise FileNotFoundError('No trained model found for this run')
+    checkpoint = torch.load(path, weights_only=True)
+    model = NeuralNetwork(checkpoint['model_config'])
+    model.load_state_dict(checkpoint['state_dict'])
+    model.eval()
+    metadata = {
+        'input_size': checkpoint['model_config']['input_size'],
+        # 'sigmoid': the output is the probability of class code 1; otherwise the largest output is the class code
+        'output': checkpoint['model_config']['layers'][-1]['settings']['activation'],
+        'preprocessing': checkpoint['preprocessing']
+    }
+    return model, metadata
+
+def preprocess_rows(df, preprocessing):
+    """
+    Turns raw rows into the network's input with the bundled preprocessing metadata.
+
+    This is the reference for scoring services: impute, encode, order the feature columns and scale.
+
+    Parameters:
+    - df: DataFrame of raw rows with (at least) the feature columns.
+    - preprocessing: The 'preprocessing' metadata of an exported model.
+
+    Returns:
+    - float32 array with one row per input row.
+    """
+    features = df[preprocessing['feature_columns']].copy()
+    if preprocessing['imputation']:
+        features = features.fillna({col: value for col, value in preprocessing['imputation'].items() if value is not None})
+    for col, pairs in preprocessing['encodings'].items():
+        mapping = {np.nan if value is None else value: code for value, code in pairs}
+        features[col] = as_objects(features[col]).map(mapping)
+    values = features.to_numpy(dtype='float64')
+    if preprocessing['scaling'] is not None:
+        values = (values - np.asarray(preprocessing['scaling']['offset'])) / np.asarray(preprocessing['scaling']['scale'])
+    return values.astype(np.float32)
+
+def export_torchscript(model, metadata, path):
+    """Traces and freezes the model and saves it with the metadata as an extra file."""
+    example = torch.zeros(1, metadata['input_size'])
+    with torch.no_grad():
+        traced = torch.jit.freeze(torch.jit.trace(model, example))
+    ArtifactCache.write_atomically(path, lambda file: torch.jit.save(traced, file, _extra_files={METADATA_KEY: json.dumps(metadata)}))
+
+def export_onnx(model, metadata, path):
+    """Exports the model with a dynamic batch dimension and stores the metadata as a model property."""
+    example = torch.zeros(1, metadata['input_size'])
+    exported = io.BytesIO()
+    torch.onnx.export(model, example, exported, dynamo=False, input_names=['features'], output_names=['output'],
+                      dynamic_axes={'features': {0: 'batch'}, 'output': {0: 'batch'}})
+    proto = onnx.load_from_string(exported.getvalue())
+    proto.metadata_props.add(key=METADATA_KEY, value=json.dumps(metadata))
+    ArtifactCache.write_atomically(path, lambda file: file.write(proto.SerializeToString()))
+
+def export_model(runs_folder, run_id, export_format):
+    """
+    Exports the trained model of a run, reusing a previous export of the same weights.
+
+    Parameters:
+    - runs_folder: Directory where the runs are stored.
+    - run_id: Identifier of the run.
+    - export_format: One of EXPORT_FORMATS.
+
+    Returns:
+    - The path of the exported model. Its input is the preprocessed feature row, and the
+      preprocessing metadata is stored inside it. The file is written to a temporary name and
+      renamed, so concurrent requests never read a partial export.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export format: {export_format}')
+    if export_format == 'onnx' and onnx is None:
+        raise ValueError('ONNX export requires the onnx package')
+    path = export_path(runs_folder, run_id, export_format)
+    source = checkpoint_path(runs_folder, run_id)
+    if os.path.exists(path) and os.path.exists(source) and os.path.getmtime(path) >= os.path.getmtime(source):
+        return path
+
+    model, metadata = load_trained_model(runs_folder, run_id)
+    if export_format == 'torchscript':
+        export_torchscript(model, metadata, path)
+    else:
+        export_onnx(model, metadata, path)
+    return path
+
+def time_calls(predict, inputs, runs):
+    """Calls `predict` on the inputs and returns the wall time of each timed call in seconds."""
+    for _ in range(WARMUP_RUNS):
+        predict(inputs)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predict(inputs)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def benchmark_options(batch_sizes, runs):
+    """
+    Limits benchmark options received from a client.
+
+    Parameters:
+    - batch_sizes: Requested numbers of rows per call, or None for BENCHMARK_BATCH_SIZES.
+    - runs: Requested number of timed calls per format and batch size.
+
+    Returns:
+    - The distinct batch sizes, each between 1 and MAX_BENCHMARK_BATCH_SIZE and at most
+      MAX_BENCHMARK_BATCH_SIZES of them, and the runs between 1 and MAX_BENCHMARK_RUNS.
+    """
+    batch_sizes = sorted({min(max(int(size), 1), MAX_BENCHMARK_BATCH_SIZE) for size in batch_sizes or BENCHMARK_BATCH_SIZES})
+    return batch_sizes[:MAX_BENCHMARK_BATCH_SIZES], min(max(int(runs), 1), MAX_BENCHMARK_RUNS)
+
+def benchmark_model(runs_folder, run_id, batch_sizes=None, runs=BENCHMARK_RUNS, config=None):
+    """
+    Measures the inference latency and throughput of a run's model in every available format.
+
+    Eager PyTorch is the baseline. Each exported format is checked to give the same outputs before
+    it is timed. ONNX models are timed with onnxruntime when it is installed. The measurement holds
+    the training resources, so it neither runs alongside training nor changes its thread counts, and
+    every format gets the same number of threads.
+
+    Parameters:
+    - runs_folder: Directory where the runs are stored.
+    - run_id: Identifier of the run.
+    - batch_sizes: Numbers of rows per call (BENCHMARK_BATCH_SIZES by default).
+    - runs: Number of timed calls per format and batch size.
+    - config: Flask application config, for the training threads and cores.
+
+    Returns:
+    - Dictionary with the 'threads' used, one 'results' entry per format and batch size (median and
+      95th percentile latency in milliseconds, rows per second and the largest difference to the
+      eager outputs), the 'fastest' format per batch size and the formats 'skipped' with the reason.
+    """
+    model, metadata = load_trained_model(runs_folder, run_id)
+    batch_sizes = batch_sizes or BENCHMARK_BATCH_SIZES
+    resources = resource_manager.plan_resources(config or {}, model, max(batch_sizes))
+    predictors = {'eager': lambda inputs: model(torch.from_numpy(inputs))}
+    skipped = {}
+
+    traced = torch.jit.load(export_model(runs_folder, run_id, 'torchscript'))
+    predictors['torchscript'] = lambda inputs: traced(torch.from_numpy(inputs))
+    if onnx is None:
+        skipped['onnx'] = 'The onnx package is not installed'
+    elif onnxruntime is None:
+        skipped['onnx'] = 'The onnxruntime package is not installed'
+    else:
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = resources.threads
+        session = onnxruntime.InferenceSession(export_model(runs_folder, run_id, 'onnx'), options, providers=['CPUExecutionProvider'])
+        predictors['onnx'] = lambda inputs: session.run(None, {'features': inputs})[0]
+
+    results = []
+    rng = np.random.default_rng(0)
+    with resources, torch.inference_mode():
+        for batch_size in batch_sizes:
+            inputs = rng.standard_normal((batch_size, metadata['input_size'])).astype(np.float32)
+            expected = model(torch.from_numpy(inputs)).numpy()
+            for name, predict in predictors.items():
+                outputs = predict(inputs)
+                outputs = outputs.numpy() if isinstance(outputs, torch.Tensor) else np.asarray(outputs)
+                timings = time_calls(predict, inputs, runs)
+                median = statistics.median(timings)
+                results.append({'format': name, 'batch_size': batch_size,
+                                'median_ms': median * 1000,
+                                'p95_ms': float(np.percentile(timings, 95)) * 1000,
+                                'rows_per_second': batch_size / median,
+                                'max_abs_difference': float(np.max(np.abs(outputs - expected)))})
+
+    fastest = {str(batch_size): min((result for result in results if result['batch_size'] == batch_size),
+                                    key=lambda result: result['median_ms'])['format'] for batch_size in batch_sizes}
+    return {'run_id': run_id, 'threads': resources.threads, 'results': results, 'fastest': fastest, 'skipped': skipped}
+
+def benchmark_status_path(runs_folder, run_id):
+    """Returns the path of the status of a run's latest benchmark."""
+    return os.path.join(runs_folder, f'{run_id}_benchmark.json')
+
+def write_benchmark_status(runs_folder, run_id, status):
+    """Records the status of a run's benchmark."""
+    ArtifactCache.write_atomically(benchmark_status_path(runs_folder, run_id), lambda file: json.dump(status, file), mode='w')
+
+def run_benchmark(runs_folder, run_id, batch_sizes, runs, config):
+    """Benchmarks a run's model in a native thread and records the report, for benchmarks run in the background."""
+    try:
+        report = NativeThreads.run(benchmark_model, runs_folder, run_id, batch_sizes, runs, config)
+    except Exception as e:
+        write_benchmark_status(runs_folder, run_id, {'state': 'failed', 'error': str(e)})
+        return
+    write_benchmark_status(runs_folder, run_id, {'state': 'ready', 'report': report})
+
+def benchmark_in_background(runs_folder, run_id, batch_sizes=None, runs=BENCHMARK_RUNS, config=None):
+    """
+    Starts benchmarking a run's model in a background job, unless a benchmark of the run is running.
+
+    Parameters:
+    - runs_folder: Directory where the runs are stored.
+    - run_id: Identifier of the run.
+    - batch_sizes: Requested numbers of rows per call, limited by benchmark_options.
+    - runs: Requested number of timed calls per format and batch size, limited by benchmark_options.
+    - config: Flask application config, for the training threads and cores.
+
+    Returns:
+    - True if a new benchmark was started, False if one was already running.
+    """
+    if not os.path.exists(checkpoint_path(runs_folder, run_id)):
+        raise FileNotFoundError('No trained model found for this run')
+    batch_sizes, runs = benchmark_options(batch_sizes, runs)
+    key = f'benchmark_{run_id}'
+    if BackgroundJobs.is_running(key):
+        return False
+    write_benchmark_status(runs_folder, run_id, {'state': 'running'})
+    return BackgroundJobs.submit(key, run_benchmark, runs_folder, run_id, batch_sizes, runs, config)
+
+def get_benchmark_status(runs_folder, run_id):
+    """
+    Reads the status of a run's latest benchmark.
+
+    Returns:
+    - Dictionary with the 'state' ('running', 'ready' or 'failed'), the 'report' of a finished
+      benchmark (see benchmark_model) or the 'error' of a failed one; None if the run was never benchmarked.
+    """
+    status_path = benchmark_status_path(runs_folder, run_id)
+    if not os.path.exists(status_path):
+        return None
+    with open(status_path, 'r') as file:
+        return json.load(file)
@@ -0,0 +1,247 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from column_projection import read_header
+from data_processing import drop_duplicates, get_scaling_mode, load_processing_metadata, process_data, save_network_parameters, transform_splits
+from data_splitter import SPLIT_ASSIGNMENT_FILE, SPLIT_CODES, SPLITS, load_split
+from streaming_processing import process_data_streaming, use_streaming
+from typed_loader import load_dtypes
+from utils.artifact_cache import ArtifactCache
+
+try:
+    import fcntl
+except ImportError:  # Without fcntl (Windows), plan executions are only serialized within one process
+    fcntl = None
+
+# File holding the recorded processing plan, stored in the upload folder
+PLAN_FILE = 'pipeline_plan.json'
+
+# File identifying the plan the processed files in the upload folder were produced from
+MATERIALIZED_PLAN_FILE = 'materialized_plan.json'
+
+# Serializes plan executions, which may be requested concurrently by training and background refreshes
+EXECUTION_LOCK = threading.Lock()
+
+# File in the upload folder locked during a plan execution, so the server's worker processes take turns too
+EXECUTION_LOCK_FILE = 'execution.lock'
+
+# Seconds between two attempts to take the execution lock while another process holds it
+LOCK_POLL_INTERVAL = 0.1
+
+# Number of source rows a plan preview is evaluated on
+PREVIEW_ROWS = 200
+
+def build_plan(upload_folder, options):
+    """
+    Describes how the current dataset is turned into training data as a list of declarative steps.
+
+    The steps reference the wizard's recorded state (the column projection, the label selection and
+    the split assignment) by value or fingerprint, so two plans are equal exactly when executing them
+    produces the same processed data.
+
+    Parameters:
+    - upload_folder: Directory where the split assignment and the label selection are stored.
+    - options: Dictionary of processing options as sent by the preprocessing form.
+
+    Returns:
+    - Dictionary with the source file, the ordered steps and the processing options.
+    """
+    label_column, _ = load_processing_metadata(upload_folder)
+    split_info, _ = load_split(upload_folder)
+    scaling_mode = get_scaling_mode(options)
+    return {
+        'source': split_info['source'],
+        'source_fingerprint': split_info['source_fingerprint'],
+        'steps': [
+            {'op': 'project', 'columns': split_info.get('columns')},
+            {'op': 'label', 'column': label_column},
+            {'op': 'split', 'assignment': ArtifactCache.fingerprint(os.path.join(upload_folder, SPLIT_ASSIGNMENT_FILE))},
+            {'op': 'dedup', 'enabled': bool(options.get('removeDuplicates'))},
+            {'op': 'impute', 'enabled': bool(options.get('handleMissingValues')), 'strategy': 'most_frequent'},
+            {'op': 'encode', 'enabled': bool(options.get('encodeCategorical'))},
+            {'op': 'scale', 'enabled': scaling_mode is not None, 'mode': scaling_mode},
+        ],
+        'options': options
+    }
+
+def plan_key(plan):
+    """Computes a short hash identifying a plan."""
+    return hashlib.sha1(json.dumps(plan, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+def get_step(plan, op):
+    """Returns the step of a plan with the given operation name."""
+    return next(step for step in plan['steps'] if step['op'] == op)
+
+def count_label_classes(plan, cache_folder):
+    """
+    Counts the classes the label column will be encoded into, reading only that column.
+
+    Duplicate removal never removes a class, and imputation replaces missing labels by an existing
+    class, so the count is exact without executing the plan. The column's summary is cached by the
+    source's fingerprint.
+    """
+    label_column = get_step(plan, 'label')['column']
+    cache_path = ArtifactCache.path_for(cache_folder, 'labelclasses', ArtifactCache.fingerprint(plan['source'], label_column), 'json')
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r') as file:
+            summary = json.load(file)
+    else:
+        labels = pd.read_csv(plan['source'], usecols=[label_column])[label_column]
+        summary = {'num_values': int(labels.nunique()), 'has_missing': bool(labels.isna().any())}
+        ArtifactCache.write_atomically(cache_path, lambda file: json.dump(summary, file), mode='w')
+
+    missing_is_class = summary['has_missing'] and not get_step(plan, 'impute')['enabled']
+    return summary['num_values'] + int(missing_is_class)
+
+def save_plan(upload_folder, options, cache_folder):
+    """
+    Records the processing options as a plan instead of processing the data right away.
+
+    The network parameters needed by the model builder are derived from the plan without touching
+    the data: every feature column is kept by encoding and scaling, and the number of classes comes
+    from the label column alone.
+
+    Parameters:
+    - upload_folder: Directory where the plan is stored.
+    - options: Dictionary of processing options.
+    - cache_folder: Directory holding cached artifacts.
+
+    Returns:
+    - The recorded plan.
+    """
+    plan = build_plan(upload_folder, options)
+    ArtifactCache.write_atomically(os.path.join(upload_folder, PLAN_FILE), lambda file: json.dump(plan, file), mode='w')
+
+    columns = get_step(plan, 'project')['columns'] or read_header(plan['source'])
+    save_network_parameters(upload_folder, len(columns) - 1, count_label_classes(plan, cache_folder))
+    return plan
+
+def load_plan(upload_folder):
+    """
+    Loads the recorded plan and rebuilds it against the current wizard state.
+
+    Re-splitting or re-selecting the label after processing therefore changes the plan, and the
+    processed data is produced again on the next execution.
+    """
+    plan_path = os.path.join(upload_folder, PLAN_FILE)
+    if not os.path.exists(plan_path):
+        raise FileNotFoundError('The data has not been processed yet')
+    with open(plan_path, 'r') as file:
+        options = json.load(file)['options']
+    return build_plan(upload_folder, options)
+
+def optimize_plan(upload_folder, plan):
+    """
+    Turns a plan into an execution strategy.
+
+    Disabled steps are pruned and the projection is pushed down into the CSV reader. The remaining
+    steps are fused into a single executor that reads only the projected columns of the source: the
+    in-memory executor, or the two-pass streaming executor for datasets above the streaming threshold.
+
+    Returns:
+    - Dictionary with the 'executor' name, the projected 'columns' and the fused 'steps'.
+    """
+    return {
+        'executor': 'streaming' if use_streaming(upload_folder, plan['options']) else 'in_memory',
+        'columns': get_step(plan, 'project')['columns'],
+        'steps': [step['op'] for step in plan['steps'] if step.get('enabled', True)]
+    }
+
+@contextlib.contextmanager
+def execution_lock(upload_folder):
+    """
+    Holds EXECUTION_LOCK and an exclusive lock on the upload folder's lock file while the block runs.
+
+    The file lock is polled rather than waited for, so a green thread waiting under eventlet or
+    gevent still lets the hub serve the other clients.
+    """
+    with EXECUTION_LOCK:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(upload_folder, EXECUTION_LOCK_FILE), 'a') as lock_file:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    time.sleep(LOCK_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def execute_plan(upload_folder, cache_folder=None, workers=1):
+    """
+    Produces the processed training, validation and test files, unless they already match the plan.
+
+    Called by the consumers that need the processed data (training, export and the comparison
+    summary), so the data is processed at most once per plan, however many consumers ask for it.
+    Executions are serialized across threads and, through a lock file, across the server's worker
+    processes; the processed files are replaced only once complete, so readers never see them half written.
+
+    Parameters:
+    - upload_folder: Directory where the plan and the processed files are stored.
+    - cache_folder: Directory holding cached artifacts, used by the streaming executor.
+    - workers: Number of processes the streaming executor hashes rows with to find duplicates.
+
+    Returns:
+    - True if the plan was executed, False if the processed files were already up to date.
+    """
+    with execution_lock(upload_folder):
+        plan = load_plan(upload_folder)
+        key = plan_key(plan)
+        marker_path = os.path.join(upload_folder, MATERIALIZED_PLAN_FILE)
+        outputs_exist = all(os.path.exists(os.path.join(upload_folder, f'{prefix}{name}.csv')) for name in SPLITS for prefix in ['processed_', 'processed_y_'])
+        if outputs_exist and os.path.exists(marker_path):
+            with open(marker_path, 'r') as file:
+                if json.load(file)['key'] == key:
+                    return False
+
+        strategy = optimize_plan(upload_folder, plan)
+        if strategy['executor'] == 'streaming':
+            process_data_streaming(upload_folder, plan['options'], cache_folder, workers=workers)
+        else:
+            process_data(upload_folder, plan['options'])
+
+        ArtifactCache.write_atomically(marker_path, lambda file: json.dump({'key': key, **strategy}, file), mode='w')
+        return True
+
+def preview_plan(upload_folder, num_rows=PREVIEW_ROWS):
+    """
+    Evaluates the recorded plan on a small sample of the source only.
+
+    The sample holds the first `num_rows // 3` rows of each split, so only the head of the source
+    is parsed.
+
+    Parameters:
+    - upload_folder: Directory where the plan is stored.
+    - num_rows: Approximate number of rows in the sample.
+
+    Returns:
+    - DataFrame of the processed sample rows with their 'label' code and 'split' name. Statistics
+      such as imputation modes and scaling parameters are fitted on the sample, so the values are
+      indicative only.
+    """
+    plan = load_plan(upload_folder)
+    label_column, datatypes = load_processing_metadata(upload_folder)
+    _, assignment = load_split(upload_folder)
+
+    # Read just far enough into the source to collect the sample rows of every split
+    rows_per_split = max(num_rows // len(SPLITS), 1)
+    positions = {name: np.flatnonzero(assignment == SPLIT_CODES[name])[:rows_per_split] for name in SPLITS}
+    nrows = max((int(rows[-1]) + 1 for rows in positions.values() if len(rows)), default=0)
+    columns = get_step(plan, 'project')['columns']
+    sample = pd.read_csv(plan['source'], usecols=columns, nrows=nrows, dtype=load_dtypes(upload_folder, columns))
+
+    frames = tuple(sample.iloc[positions[name]].reset_index(drop=True) for name in SPLITS)
+    frames = drop_duplicates(plan['options'], upload_folder, frames)
+    features, labels, _, _ = transform_splits(*frames, plan['options'], label_column, datatypes)
+    parts = [pd.concat([feature_df.reset_index(drop=True), label_df], axis=1).assign(split=name)
+             for name, feature_df, label_df in zip(SPLITS, features, labels)]
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,111 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from duplicates import DuplicateIndex, row_hashes, verify_collisions
+from utils.artifact_cache import ArtifactCache
+
+# File holding the metrics of the processed data, written next to the processed files
+PROCESSED_METRICS_FILE = 'processed_metrics.json'
+
+# Rows read at a time when the processed files have to be read back
+CHUNK_SIZE = 100000
+
+class MetricsAccumulator:
+    """
+    Collects the comparison metrics of a dataset (missing values, duplicate rows and row count) from
+    its chunks, so they can be produced as a side output while the data is written.
+
+    Only 8 bytes per row are kept for duplicate detection. Rows sharing a hash are compared by value
+    in a second pass only when some hash repeats.
+    """
+    def __init__(self):
+        self.missing_values = None
+        self.hashes = []
+        self.num_rows = 0
+
+    def update(self, chunk):
+        """Adds a chunk of rows; every chunk must have the same columns."""
+        missing = chunk.isnull().sum()
+        self.missing_values = missing if self.missing_values is None else self.missing_values + missing
+        self.hashes.append(row_hashes(chunk))
+        self.num_rows += len(chunk)
+
+    def extend(self, other):
+        """Appends the rows collected by another accumulator after this one's rows."""
+        if other.missing_values is not None:
+            self.missing_values = other.missing_values if self.missing_values is None else self.missing_values + other.missing_values
+        self.hashes.extend(other.hashes)
+        self.num_rows += other.num_rows
+
+    def result(self, make_chunks):
+        """
+        Computes the metrics.
+
+        Parameters:
+        - make_chunks: Callable returning the same chunks again, in the same order; it is only
+          called when rows sharing a hash have to be verified.
+
+        Returns:
+        - Dictionary with 'missing_values', 'missing_percentage', 'duplicate_rows' and 'num_rows'.
+        """
+        hashes = np.concatenate(self.hashes) if self.hashes else np.empty(0, dtype=np.uint64)
+        unique_hashes, counts = np.unique(hashes, return_counts=True)
+        candidates = unique_hashes[counts > 1]
+        keys = hashes.copy()
+        if len(candidates):
+            verify_collisions(make_chunks(), hashes, candidates, keys)
+
+        missing_values = {col: int(count) for col, count in (self.missing_values if self.missing_values is not None else {}).items()}
+        return {
+            'missing_values': missing_values,
+            'missing_percentage': {col: (count / self.num_rows * 100 if self.num_rows else 0.0) for col, count in missing_values.items()},
+            'duplicate_rows': DuplicateIndex(keys).duplicate_count,
+            'num_rows': self.num_rows
+        }
+
+def frame_metrics(df):
+    """Computes the comparison metrics of an in-memory DataFrame."""
+    accumulator = MetricsAccumulator()
+    accumulator.update(df)
+    return accumulator.result(lambda: iter([df]))
+
+def processed_fingerprint(upload_folder):
+    """Fingerprints the processed files the metrics describe."""
+    return ArtifactCache.fingerprint(os.path.join(upload_folder, 'processed_train.csv'),
+                                     ArtifactCache.fingerprint(os.path.join(upload_folder, 'processed_combined_y.csv')))
+
+def save_processed_metrics(upload_folder, metrics):
+    """Stores the metrics of the processed data, tied to the processed files they were computed for."""
+    with open(os.path.join(upload_folder, PROCESSED_METRICS_FILE), 'w') as file:
+        json.dump({'fingerprint': processed_fingerprint(upload_folder), 'metrics': metrics}, file,
+                  default=lambda value: value.item() if isinstance(value, np.generic) else str(value))
+
+def load_processed_metrics(upload_folder):
+    """
+    Loads the metrics of the processed data.
+
+    Returns:
+    - The metrics dictionary, or None if they are missing or the processed files have changed since.
+    """
+    metrics_path = os.path.join(upload_folder, PROCESSED_METRICS_FILE)
+    if not os.path.exists(metrics_path):
+        return None
+    with open(metrics_path, 'r') as file:
+        saved = json.load(file)
+    return saved['metrics'] if saved['fingerprint'] == processed_fingerprint(upload_folder) else None
+
+def iter_processed_rows(upload_folder, splits, chunk_size=CHUNK_SIZE):
+    """
+    Reads the processed features of each split back, in split order, joined with their original labels.
+
+    Yields:
+    - DataFrames of feature columns followed by the label column.
+    """
+    labels = pd.read_csv(os.path.join(upload_folder, 'processed_combined_y.csv'))
+    offset = 0
+    for name in splits:
+        for chunk in pd.read_csv(os.path.join(upload_folder, f'processed_{name}.csv'), chunksize=chunk_size):
+            chunk_labels = labels.iloc[offset:offset + len(chunk)].reset_index(drop=True)
+            offset += len(chunk)
+            yield pd.concat([chunk.reset_index(drop=True), chunk_labels], axis=1)
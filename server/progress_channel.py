@@ -0,0 +1,99 @@
+import time
+
+# Default minimum number of seconds between two progress messages of a run
+DEFAULT_INTERVAL = 0.5
+
+class ProgressChannel:
+    """
+    Sends the training progress of one run to the clients in the run's room, at a bounded rate.
+
+    Updates are buffered and coalesced: the latest batch position replaces the previous one, while
+    every finished epoch's metrics are kept and sent together in the next message. A message is
+    emitted at most once per `interval` seconds, plus a final one on `close`, so the number of events
+    depends on the training time only, however short or long the epochs are.
+    """
+    def __init__(self, socketio, room, total_epochs, interval=DEFAULT_INTERVAL, batch_updates=True, clock=time.monotonic):
+        """
+        :param socketio: SocketIO server instance used to emit the messages.
+        :param room: Room of the run; only the clients that joined it receive its progress.
+        :param total_epochs: Number of epochs of the run, used to compute the progress percentage.
+        :param interval: Minimum number of seconds between two messages; 0 emits every update.
+        :param batch_updates: Whether intra-epoch batch positions are reported.
+        :param clock: Function returning the current time in seconds.
+        """
+        self.socketio = socketio
+        self.room = room
+        self.total_epochs = total_epochs
+        self.interval = interval
+        self.batch_updates = batch_updates
+        self.clock = clock
+        self.last_emit = None
+        self.position = None  # (epoch, batch, num_batches, loss) of the latest update; batch is None at the end of an epoch
+        self.pending_epochs = []
+        self.latest_metrics = None
+
+    def progress(self):
+        """Returns the percentage of training completed at the latest update."""
+        if self.position is None or not self.total_epochs:
+            return 0.0
+        epoch, batch, num_batches, _ = self.position
+        return ((epoch - 1) + (batch / num_batches if batch is not None and num_batches else 1.0)) / self.total_epochs * 100
+
+    def report_batch(self, epoch, batch, num_batches, loss):
+        """
+        Records that a training batch has finished.
+
+        :param epoch: Current epoch, starting at 1.
+        :param batch: Number of batches finished in the epoch.
+        :param num_batches: Number of batches per epoch.
+        :param loss: Mean training loss over the epoch's finished batches.
+        """
+        if not self.batch_updates:
+            return
+        self.position = (epoch, batch, num_batches, loss)
+        self._emit_if_due()
+
+    def report_epoch(self, epoch, metrics, loss=None):
+        """
+        Records the validation metrics of a finished epoch; they are never dropped by throttling.
+
+        :param epoch: The finished epoch, starting at 1.
+        :param metrics: Dictionary of validation metrics.
+        :param loss: Mean training loss over the epoch.
+        """
+        self.position = (epoch, None, None, loss)
+        self.pending_epochs.append({'epoch': epoch, 'metrics': metrics})
+        self.latest_metrics = metrics
+        self._emit_if_due()
+
+    def _emit_if_due(self):
+        """Emits the buffered updates if the interval has elapsed since the last message."""
+        if self.last_emit is None or self.clock() - self.last_emit >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Emits the buffered updates as one 'trainingProgress' message, if there are any."""
+        if self.position is None:
+            return
+        epoch, batch, num_batches, loss = self.position
+        self.socketio.emit('trainingProgress', {
+            'run_id': self.room,
+            'epoch': epoch,
+            'batch': batch,
+            'num_batches': num_batches,
+            'loss': loss,
+            'progress': self.progress(),
+            'metrics': self.latest_metrics,  # Validation metrics of the latest finished epoch
+            'epochs': self.pending_epochs  # Every epoch finished since the previous message
+        }, to=self.room)
+        self.pending_epochs = []
+        self.position = None
+        self.last_emit = self.clock()
+
+    def report_test(self, metrics):
+        """Sends the test set metrics of the run as a 'testMetrics' event."""
+        self.socketio.emit('testMetrics', metrics, to=self.room)
+
+    def close(self):
+        """Emits whatever is still buffered; call once training has finished."""
+        self.flush()
@@ -0,0 +1,233 @@
+import glob
+import os
+import time
+import torch
+from utils.native_threads import NativeThreads
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # BLAS thread pools are then left as they are
+    threadpool_limits = None
+
+# Cores left to the Flask/Socket.IO threads when the thread count of a job is chosen automatically
+RESERVED_CORES = 1
+
+# Multiply-adds per batch below which an additional intra-op thread costs more than it saves
+WORK_PER_THREAD = 1 << 20
+
+# Held while a job runs with its thread settings, since torch and BLAS thread counts are process-wide;
+# the jobs run in native threads, also under eventlet or gevent
+_settings_lock = NativeThreads.rlock()
+
+def parse_cpulist(text):
+    """Parses a Linux CPU list such as '0-3,8,10-11' into a sorted list of core ids."""
+    cores = set()
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-')
+            cores.update(range(int(start), int(end) + 1))
+        else:
+            cores.add(int(part))
+    return sorted(cores)
+
+def available_cores():
+    """Returns the ids of the cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def numa_nodes():
+    """
+    Returns the available cores grouped by NUMA node, read from sysfs.
+
+    Machines without NUMA information are treated as a single node holding every available core.
+    """
+    available = set(available_cores())
+    nodes = []
+    for path in sorted(glob.glob('/sys/devices/system/node/node[0-9]*/cpulist')):
+        with open(path, 'r') as file:
+            cores = [core for core in parse_cpulist(file.read()) if core in available]
+        if cores:
+            nodes.append(cores)
+    return nodes or [sorted(available)]
+
+def core_sets(num_workers, cores=None):
+    """
+    Splits the available cores into one disjoint core set per worker, keeping each set on one NUMA node.
+
+    Workers are spread over the nodes round robin and each node's cores are divided among its workers.
+    When there are more workers than cores, workers share single cores.
+
+    :param num_workers: Number of workers to pin.
+    :param cores: Optional list of core ids to split instead of all available cores.
+    :return: List of `num_workers` lists of core ids.
+    """
+    nodes = numa_nodes()
+    if cores is not None:
+        nodes = [[core for core in node if core in set(cores)] for node in nodes]
+        nodes = [node for node in nodes if node] or [sorted(cores)]
+    workers_per_node = [len(range(index, num_workers, len(nodes))) for index in range(len(nodes))]
+    sets_per_node = []
+    for cores, count in zip(nodes, workers_per_node):
+        if count > len(cores):
+            sets_per_node.append([[cores[i % len(cores)]] for i in range(count)])
+        else:
+            sets_per_node.append([cores[i * len(cores) // count:(i + 1) * len(cores) // count] for i in range(count)])
+    return [sets_per_node[worker % len(nodes)][worker // len(nodes)] for worker in range(num_workers)]
+
+def recommended_threads(model, batch_size, cores):
+    """
+    Chooses the intra-op thread count of a job from the work done per batch.
+
+    Small fully connected networks spend more time synchronizing threads than computing, so they get
+    one thread per WORK_PER_THREAD multiply-adds per batch, capped by the cores the job may use.
+
+    :param model: The PyTorch model to train.
+    :param batch_size: Number of rows per training batch.
+    :param cores: Number of cores available to the job.
+    :return: Number of threads.
+    """
+    work = sum(parameter.numel() for parameter in model.parameters()) * batch_size
+    return max(1, min(cores, work // WORK_PER_THREAD))
+
+def configure_process(config):
+    """
+    Applies the process-wide settings that PyTorch only accepts before any parallel work has run.
+
+    :param config: Flask application config holding 'TRAINING_INTEROP_THREADS'.
+    """
+    interop_threads = config.get('TRAINING_INTEROP_THREADS')
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Inter-op parallelism has already started; PyTorch keeps its current pool
+            pass
+
+class TrainingResources:
+    """
+    Context manager running a job with a fixed number of torch and BLAS threads and measuring how
+    busy it kept its cores.
+
+    Thread counts are process-wide, so jobs using TrainingResources in the same process (training
+    runs, cost calibrations, benchmarks) run one at a time and the previous counts are restored when
+    a job ends. The job's CPU time is the process CPU time spent while it holds the settings lock, so
+    the time of its intra-op helper threads is counted. Core affinity is only applied in a process
+    dedicated to the job, such as a distributed training worker; in the server process the CPU time
+    also includes the requests served meanwhile, so the utilization is an estimate there.
+    """
+    def __init__(self, threads, cores=None, dedicated_process=False):
+        """
+        :param threads: Number of intra-op threads for torch and for BLAS libraries.
+        :param cores: Optional list of core ids to pin the process to, applied only in a dedicated process.
+        :param dedicated_process: Whether the calling process runs nothing but this job.
+        """
+        self.threads = threads
+        self.cores = cores if dedicated_process else None
+        self.dedicated_process = dedicated_process
+        self.usage = None
+
+    def __enter__(self):
+        _settings_lock.acquire()
+        self.previous_threads = torch.get_num_threads()
+        torch.set_num_threads(self.threads)
+        self.blas_limits = threadpool_limits(limits=self.threads) if threadpool_limits is not None else None
+        self.previous_cores = None
+        if self.cores and hasattr(os, 'sched_setaffinity'):
+            self.previous_cores = os.sched_getaffinity(0)
+            os.sched_setaffinity(0, self.cores)
+        # Taken with the lock held, so no other job's threads are counted
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall_seconds = time.perf_counter() - self.start_wall
+        cpu_seconds = time.process_time() - self.start_cpu
+        try:
+            if self.previous_cores is not None:
+                os.sched_setaffinity(0, self.previous_cores)
+            if self.blas_limits is not None:
+                self.blas_limits.restore_original_limits()
+            torch.set_num_threads(self.previous_threads)
+        finally:
+            _settings_lock.release()
+        self.usage = {
+            'threads': self.threads,
+            'interop_threads': torch.get_num_interop_threads(),
+            'cores': self.cores,
+            'wall_seconds': wall_seconds,
+            'cpu_seconds': cpu_seconds,
+            'cpu_scope': 'process' if self.dedicated_process else 'server',
+            # Share of the job's thread capacity spent computing; requests served alongside may add to it in the server
+            'utilization': min(cpu_seconds / (wall_seconds * self.threads), 1.0) if wall_seconds > 0 else 0.0
+        }
+        return False
+
+def exclusive():
+    """
+    Returns the lock held by jobs using TrainingResources, for jobs whose work runs in other processes
+    (distributed training) and must not run alongside them either.
+    """
+    return _settings_lock
+
+def configured_cores(config):
+    """Returns the cores listed in 'TRAINING_CPU_AFFINITY' that are available, or None if training is not pinned."""
+    affinity = config.get('TRAINING_CPU_AFFINITY')
+    return [core for core in parse_cpulist(affinity) if core in set(available_cores())] or None if affinity else None
+
+def usable_cores(config):
+    """Returns the number of cores training jobs may use: the pinned cores, or the available cores less the reserved ones."""
+    cores = configured_cores(config)
+    return len(cores) if cores else max(len(available_cores()) - RESERVED_CORES, 1)
+
+def clamp_workers(config, workers):
+    """
+    Converts a requested number of distributed training workers to an int the machine can run.
+
+    :param config: Flask application config holding 'TRAINING_MAX_WORKERS' (0 allows one worker per usable core).
+    :param workers: Requested number of worker processes.
+    :return: The number of workers, at most the configured maximum or the number of usable cores.
+    :raises ValueError: If fewer than one worker is requested.
+    """
+    workers = int(workers)
+    if workers < 1:
+        raise ValueError('The number of workers must be at least 1')
+    return min(workers, config.get('TRAINING_MAX_WORKERS') or usable_cores(config))
+
+def clamp_threads(threads, num_cores):
+    """Converts a requested thread count to an int between 1 and the number of cores."""
+    return min(max(int(threads), 1), num_cores)
+
+def plan_resources(config, model, batch_size, requested_threads=None):
+    """
+    Decides the threads and cores of a training job from the application config and the job itself.
+
+    :param config: Flask application config holding 'TRAINING_THREADS' (0 chooses automatically)
+                   and 'TRAINING_CPU_AFFINITY' (a CPU list such as '0-7', or empty for no pinning).
+    :param model: The PyTorch model to train.
+    :param batch_size: Number of rows per training batch.
+    :param requested_threads: Optional thread count requested for this job, overriding the config;
+                              limited to the cores the job may use.
+    :return: TrainingResources for the job, which runs in the server process and is therefore not pinned.
+    """
+    num_cores = usable_cores(config)
+    threads = requested_threads or config.get('TRAINING_THREADS') or recommended_threads(model, batch_size, num_cores)
+    return TrainingResources(clamp_threads(threads, num_cores))
+
+def plan_worker_resources(config, model, batch_size, num_workers, requested_threads=None):
+    """
+    Decides the threads and core sets of the workers of a distributed training job.
+
+    The cores are shared among the workers. When 'TRAINING_CPU_AFFINITY' is set, each worker is
+    pinned to its own part of those cores, on a single NUMA node where possible.
+
+    :return: Tuple of the intra-op threads per worker, limited to each worker's share of the cores,
+             and the list of core sets (or None).
+    """
+    cores = configured_cores(config)
+    cores_per_worker = max(usable_cores(config) // num_workers, 1)
+    threads = requested_threads or config.get('TRAINING_THREADS') or recommended_threads(model, batch_size, cores_per_worker)
+    return clamp_threads(threads, cores_per_worker), core_sets(num_workers, cores) if cores else None
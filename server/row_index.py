@@ -0,0 +1,254 @@
+import io
+import os
+import numpy as np
+import pandas as pd
+from utils.artifact_cache import ArtifactCache
+
+# Every ROW_INDEX_STRIDE-th row's byte offset is stored, so the index takes 8 bytes per 1024 rows
+ROW_INDEX_STRIDE = 1024
+
+# Bytes scanned at a time while building the index
+SCAN_BLOCK_SIZE = 16 * 1024 * 1024
+
+# Rows parsed at a time while scanning for filter matches
+FILTER_CHUNK_SIZE = 100000
+
+# Comparison operators accepted by row filters
+FILTER_OPERATORS = {
+    'eq': lambda column, value: column == value,
+    'ne': lambda column, value: column != value,
+    'gt': lambda column, value: column > value,
+    'ge': lambda column, value: column >= value,
+    'lt': lambda column, value: column < value,
+    'le': lambda column, value: column <= value,
+    'contains': lambda column, value: column.astype(str).str.contains(str(value), regex=False, na=False),
+}
+
+class RowIndex:
+    """
+    Sparse byte-offset index of the records of a CSV file.
+
+    `offsets[i]` is the byte offset where data row `i * stride` starts; the last entry is the end
+    of the file. Record boundaries are found with quote tracking, so quoted fields containing
+    newlines do not break the index.
+    """
+    def __init__(self, offsets, num_rows, stride):
+        self.offsets = offsets
+        self.num_rows = int(num_rows)
+        self.stride = int(stride)
+
+    def byte_range(self, start_row, end_row):
+        """
+        Returns the byte range that contains data rows [start_row, end_row).
+
+        :return: Tuple (start_byte, end_byte, rows_to_skip) where rows_to_skip is the number of
+                 rows between start_byte and start_row.
+        """
+        first_checkpoint = start_row // self.stride
+        last_checkpoint = min(-(-end_row // self.stride), len(self.offsets) - 1)
+        return int(self.offsets[first_checkpoint]), int(self.offsets[last_checkpoint]), start_row - first_checkpoint * self.stride
+
+    def save(self, path):
+        """Writes the index to a .npz file, replacing any previous file atomically."""
+        ArtifactCache.write_atomically(path, lambda file: np.savez(file, offsets=self.offsets, num_rows=self.num_rows, stride=self.stride))
+
+    @classmethod
+    def load(cls, path):
+        """Reads an index written with `save`."""
+        with np.load(path) as data:
+            return cls(data['offsets'], data['num_rows'], data['stride'])
+
+# Lookup of the bytes that make a line non-blank; pandas skips lines made only of newlines, spaces and tabs
+NON_BLANK_BYTES = np.ones(256, dtype=bool)
+NON_BLANK_BYTES[[ord(char) for char in '\n\r \t']] = False
+
+def iter_records(file):
+    """
+    Yields the records of a CSV file block by block, as arrays of their start and end byte offsets
+    and whether they are blank.
+
+    Blocks are scanned with NumPy: a newline ends a record only when the number of quote
+    characters before it is even, i.e. it is not inside a quoted field. A record is blank when it
+    holds nothing but whitespace, which pandas skips like an empty line. A final record without a
+    trailing newline ends at the end of the file.
+    """
+    position = 0
+    in_quotes = 0
+    previous_end = 0
+    pending_content = False  # Whether the record continuing from earlier blocks has non-blank bytes
+    while True:
+        block = file.read(SCAN_BLOCK_SIZE)
+        if not block:
+            break
+        data = np.frombuffer(block, dtype=np.uint8)
+        quote_parity = (np.cumsum(data == ord('"')) + in_quotes) % 2
+        ends = np.flatnonzero((data == ord('\n')) & (quote_parity == 0))
+        in_quotes = int(quote_parity[-1])
+        non_blank = NON_BLANK_BYTES[data]
+
+        if len(ends):
+            # Whether each record, from its start to its newline, has a non-blank byte
+            local_starts = np.concatenate([[0], ends[:-1] + 1])
+            has_content = np.logical_or.reduceat(non_blank[:ends[-1] + 1], local_starts)
+            has_content[0] |= pending_content
+            ends = position + ends + 1
+            yield np.concatenate([[previous_end], ends])[:-1].astype(np.int64), ends, ~has_content
+            previous_end = int(ends[-1])
+            pending_content = bool(non_blank[ends[-1] - position:].any())
+        else:
+            pending_content |= bool(non_blank.any())
+        position += len(block)
+
+    if pending_content:
+        yield np.array([previous_end], dtype=np.int64), np.array([position], dtype=np.int64), np.array([False])
+
+def build_row_index(file_path, stride=ROW_INDEX_STRIDE):
+    """
+    Scans a CSV file once and records the byte offset of every `stride`-th data row.
+
+    Rows are counted as pandas counts them: blank lines are skipped and the header is the first
+    non-blank line.
+
+    Parameters:
+    - file_path: Path of the CSV file.
+    - stride: Distance in rows between two stored offsets.
+
+    Returns:
+    - The RowIndex of the file.
+    """
+    file_size = os.path.getsize(file_path)
+    checkpoints = []
+    num_records = 0  # Non-blank records seen so far, including the header
+    with open(file_path, 'rb') as file:
+        for starts, _, blank in iter_records(file):
+            starts = starts[~blank]
+            # Data row r is non-blank record r + 1, the header being record 0
+            record_numbers = num_records + np.arange(len(starts))
+            checkpoints.append(starts[(record_numbers >= 1) & ((record_numbers - 1) % stride == 0)])
+            num_records += len(starts)
+
+    num_rows = max(num_records - 1, 0)
+    offsets = np.concatenate(checkpoints + [np.array([file_size])]).astype(np.int64)
+    return RowIndex(offsets, num_rows, stride)
+
+def get_row_index(file_path, cache_folder):
+    """
+    Returns the RowIndex of a CSV file, building it on first use and caching it by the file's fingerprint.
+    """
+    cache_path = ArtifactCache.path_for(cache_folder, 'rowindex', ArtifactCache.fingerprint(file_path), 'npz')
+    if os.path.exists(cache_path):
+        return RowIndex.load(cache_path)
+
+    index = build_row_index(file_path)
+    index.save(cache_path)
+    return index
+
+def read_header(file_path, index):
+    """Returns the raw bytes of the header line, which end where the first data row starts."""
+    with open(file_path, 'rb') as file:
+        if index.num_rows:
+            return file.read(int(index.offsets[0]))
+        return file.readline()
+
+def read_rows(file_path, index, offset, limit, columns=None):
+    """
+    Reads data rows [offset, offset + limit) using the index, parsing at most `limit + stride` rows.
+
+    Parameters:
+    - file_path: Path of the CSV file.
+    - index: The file's RowIndex.
+    - offset: Position of the first row to return.
+    - limit: Maximum number of rows to return.
+    - columns: Optional list of columns to return.
+
+    Returns:
+    - A DataFrame with the requested rows.
+    """
+    header = read_header(file_path, index)
+    end_row = min(offset + limit, index.num_rows)
+    if offset >= end_row:
+        return pd.read_csv(io.BytesIO(header), usecols=columns)
+
+    start_byte, end_byte, rows_to_skip = index.byte_range(offset, end_row)
+    with open(file_path, 'rb') as file:
+        file.seek(start_byte)
+        body = file.read(end_byte - start_byte)
+    if not header.endswith(b'\n'):
+        header += b'\n'
+    # Rows are skipped after parsing: skiprows would count the blank lines pandas leaves out
+    page = pd.read_csv(io.BytesIO(header + body), usecols=columns, nrows=rows_to_skip + end_row - offset)
+    return page.iloc[rows_to_skip:].reset_index(drop=True)
+
+def parse_filter(expression):
+    """
+    Parses a filter of the form 'column:operator:value', e.g. 'age:gt:30'.
+
+    The operator is the first part that names one of FILTER_OPERATORS, so values (and column names
+    before it) may contain ':', as in 'time:eq:12:30'.
+
+    Returns:
+    - Tuple (column, operator, value); numeric-looking values are converted to numbers.
+    """
+    parts = expression.split(':')
+    position = next((i for i in range(1, len(parts) - 1) if parts[i] in FILTER_OPERATORS), None)
+    if position is None:
+        raise ValueError(f'Invalid filter {expression!r}: expected column:operator:value with an operator among {", ".join(FILTER_OPERATORS)}')
+    column, operator, value = ':'.join(parts[:position]), parts[position], ':'.join(parts[position + 1:])
+    try:
+        value = float(value) if any(char in value for char in '.eE') else int(value)
+    except ValueError:
+        pass
+    return column, operator, value
+
+def apply_filter(chunk, column, operator, value):
+    """Evaluates one filter on a chunk, rejecting comparisons the column's values do not support."""
+    try:
+        return FILTER_OPERATORS[operator](chunk[column], value).to_numpy(dtype=bool)
+    except KeyError:
+        raise ValueError(f'Unknown filter column: {column}')
+    except TypeError:
+        raise ValueError(f'Column {column} cannot be compared with {value!r}')
+
+def filter_rows(file_path, filters, offset, limit, columns=None):
+    """
+    Returns the matching rows [offset, offset + limit) of a CSV file filtered by simple conditions.
+
+    The file is parsed chunk by chunk, reading only the projected and filtered columns, and the scan
+    stops at the first chunk past the one holding the requested page's last match (or at the end of
+    the file). Only the matches from `offset` on are kept, so deep pages do not hold earlier matches.
+
+    Parameters:
+    - file_path: Path of the CSV file.
+    - filters: List of (column, operator, value) tuples combined with AND.
+    - offset: Number of matching rows to skip.
+    - limit: Maximum number of matching rows to return.
+    - columns: Optional list of columns to return.
+
+    Returns:
+    - A DataFrame with the requested matching rows.
+    - The number of matching rows found, a lower bound unless the whole file was scanned.
+    - Whether more matches follow the requested page.
+    - Whether the whole file was scanned, so the count is exact.
+    """
+    filter_columns = [column for column, _, _ in filters]
+    usecols = None if columns is None else list(dict.fromkeys(columns + filter_columns))
+    page = []
+    num_matches = 0
+    complete = True
+    end = offset + limit
+    for chunk in pd.read_csv(file_path, usecols=usecols, chunksize=FILTER_CHUNK_SIZE):
+        mask = np.ones(len(chunk), dtype=bool)
+        for column, operator, value in filters:
+            mask &= apply_filter(chunk, column, operator, value)
+        chunk_matches = int(mask.sum())
+        if num_matches + chunk_matches > offset and num_matches < end:
+            # Keep only the matches of this chunk that fall inside the page
+            page.append(chunk[mask].iloc[max(offset - num_matches, 0):end - num_matches])
+        num_matches += chunk_matches
+        if num_matches > end:
+            # A chunk shorter than the chunk size is the file's last one
+            complete = len(chunk) < FILTER_CHUNK_SIZE
+            break
+
+    result = pd.concat(page, ignore_index=True) if page else pd.DataFrame(columns=usecols)
+    return (result if columns is None else result[columns]), num_matches, num_matches > end, complete
@@ -0,0 +1,173 @@
+"""
+Production entry point of the server.
+
+The master process only supervises: it starts the worker processes, restarts those that crash and
+forwards shutdown signals. Each worker imports the application, which loads pandas and torch on
+first use, and serves it with Flask-SocketIO on the chosen async model.
+
+Threads are the default async model, since data processing requests run pandas code that never
+yields to an eventlet or gevent hub. With eventlet or gevent, which suit many idle Socket.IO
+connections, training runs in a native thread so the hub keeps serving the other clients.
+
+Deployment with several workers: worker `index` listens on its own port, `port + index`; the
+workers do not share a socket. They need
+- a load balancer with sticky sessions in front of the ports (e.g. nginx `ip_hash` over an
+  upstream of ports 5000-5003), since Socket.IO's long-polling requests of a client must all reach
+  the worker holding its session;
+- a message queue (`--message-queue`, e.g. Redis), so an event emitted by one worker reaches the
+  clients connected to another. The server refuses to start several workers without one, or
+  when the package reaching it (redis, or kombu for other URLs) is not installed.
+The workers share the upload folder, but little else: training runs and background jobs belong to
+the worker that started them. Data processing is serialized across the workers with a lock file in
+the upload folder and its outputs are replaced only once complete; this needs fcntl, so run a
+single worker on platforms without it (Windows).
+
+With --warm-up, workers load the machine learning stack in the background once they are serving,
+instead of on the first request that needs it.
+
+On SIGTERM or SIGINT, workers stop accepting training runs at once and exit once the runs in
+progress have finished, or when the drain timeout expires; they keep serving requests meanwhile.
+A second signal stops a worker immediately.
+
+Usage:
+    python serve.py --workers 4 --async-mode eventlet --message-queue redis://localhost:6379/0
+"""
+import argparse
+import importlib.util
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# Seconds a worker waits for its training runs to finish after being asked to shut down
+DRAIN_TIMEOUT = 600
+
+# Seconds between two checks of the workers by the master
+SUPERVISE_INTERVAL = 0.5
+
+def message_queue_client(url):
+    """Returns the package Flask-SocketIO needs to reach a message queue URL."""
+    return 'redis' if url.startswith(('redis://', 'rediss://')) else 'kombu'
+
+def parse_args(argv=None):
+    """Parses the command line, with defaults taken from the environment."""
+    parser = argparse.ArgumentParser(description='Runs the server with several workers for production use.')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)), help='Port of the first worker')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', 1)))
+    parser.add_argument('--async-mode', choices=['threading', 'eventlet', 'gevent'],
+                        default=os.environ.get('SOCKETIO_ASYNC_MODE') or 'threading')
+    parser.add_argument('--message-queue', default=os.environ.get('SOCKETIO_MESSAGE_QUEUE', ''),
+                        help='Message queue URL shared by the workers, e.g. redis://localhost:6379/0')
+    parser.add_argument('--drain-timeout', type=float, default=float(os.environ.get('DRAIN_TIMEOUT', DRAIN_TIMEOUT)))
+    parser.add_argument('--warm-up', action='store_true', default=os.environ.get('WARM_UP', '') == '1',
+                        help='Load pandas, torch and sklearn in the background once a worker is serving')
+    parser.add_argument('--worker-index', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.workers > 1 and not args.message_queue:
+        parser.error('--message-queue is required with more than one worker')
+    if args.message_queue and importlib.util.find_spec(message_queue_client(args.message_queue)) is None:
+        parser.error(f'The {message_queue_client(args.message_queue)} package is required to use the message queue {args.message_queue}')
+    return args
+
+def worker_command(args, index):
+    """Builds the command line starting one worker."""
+    return [sys.executable, os.path.abspath(__file__), '--host', args.host, '--port', str(args.port),
+            '--async-mode', args.async_mode, '--message-queue', args.message_queue,
+            '--drain-timeout', str(args.drain_timeout), '--worker-index', str(index)] + (['--warm-up'] if args.warm_up else [])
+
+def run_master(args):
+    """Starts the workers and supervises them until they have all shut down."""
+    workers = [subprocess.Popen(worker_command(args, index)) for index in range(args.workers)]
+    stopping = []
+
+    def stop(signum, frame):
+        if not stopping:
+            print(f'Shutting down {len(workers)} worker(s), waiting for training runs to finish')
+            stopping.append(time.monotonic())
+            for worker in workers:
+                if worker.poll() is None:
+                    worker.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while True:
+        if stopping:
+            if all(worker.poll() is not None for worker in workers):
+                break
+            if time.monotonic() - stopping[0] > args.drain_timeout + 10:
+                for worker in workers:
+                    worker.kill()
+        else:
+            for index, worker in enumerate(workers):
+                if worker.poll() is not None:
+                    print(f'Worker {index} exited with code {worker.returncode}, restarting it')
+                    workers[index] = subprocess.Popen(worker_command(args, index))
+        time.sleep(SUPERVISE_INTERVAL)
+    return max(worker.returncode for worker in workers)
+
+def start_warm_up(async_mode, warm_up):
+    """
+    Runs the warm-up in a native thread, so the imports do not stall an eventlet or gevent hub.
+    """
+    if async_mode == 'eventlet':
+        import eventlet
+        import eventlet.tpool
+        eventlet.spawn(eventlet.tpool.execute, warm_up)
+    elif async_mode == 'gevent':
+        import gevent
+        gevent.get_hub().threadpool.spawn(warm_up)
+    else:
+        threading.Thread(target=warm_up, daemon=True).start()
+
+def run_worker(args):
+    """Serves the application in this process until a shutdown signal has been handled."""
+    if args.async_mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif args.async_mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+    os.environ['SOCKETIO_ASYNC_MODE'] = args.async_mode
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = args.message_queue
+
+    # The application's folders are relative to the server directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, socketio, warm_up
+    from utils.training_runs import TrainingRuns
+
+    exit_code = []
+
+    def stop(signum, frame):
+        raise SystemExit(exit_code[0] if exit_code else 1)
+
+    def drain():
+        exit_code.append(0 if TrainingRuns.drain(args.drain_timeout) else 1)
+        os.kill(os.getpid(), signal.SIGTERM)  # Handled by `stop` in the main thread, which stops the server
+
+    def shutdown(signum, frame):
+        # The handler only stops new runs; waiting for the running ones here would stop serving them
+        signal.signal(signal.SIGTERM, stop)  # A second signal stops the worker at once
+        signal.signal(signal.SIGINT, stop)
+        TrainingRuns.stop_accepting()
+        print(f'Worker {args.worker_index} draining {len(TrainingRuns.active())} training run(s)')
+        socketio.start_background_task(drain)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    if args.warm_up:
+        start_warm_up(args.async_mode, warm_up)
+    options = {'allow_unsafe_werkzeug': True} if args.async_mode == 'threading' else {}
+    socketio.run(app, host=args.host, port=args.port + args.worker_index, debug=False, use_reloader=False,
+                 log_output=False, **options)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.worker_index is None:
+        sys.exit(run_master(args))
+    run_worker(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+import math
+import numpy as np
+import pandas as pd
+
+# z-score of the two-sided 95% confidence intervals reported as error bounds
+Z_95 = 1.96
+
+def leading_zeros(values):
+    """Counts the leading zero bits of 64-bit unsigned integers, working on exact 32-bit halves."""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    with np.errstate(divide='ignore'):
+        high_bits = np.where(high > 0, np.floor(np.log2(high)) + 1, 0)
+        low_bits = np.where(low > 0, np.floor(np.log2(low)) + 1, 0)
+    return np.where(high > 0, 32 - high_bits, 64 - low_bits).astype(np.uint8)
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch estimating the number of distinct 64-bit hashes in a stream.
+
+    With `precision` p the sketch uses 2**p one-byte registers and has a relative standard error of
+    1.04 / sqrt(2**p), i.e. about 1.6% for the default p = 12.
+    """
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, hashes):
+        """Adds an array of uint64 hashes to the sketch."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        buckets = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        # A guard bit below the remaining bits caps the rank for hashes whose remaining bits are all zero
+        remaining = (hashes << np.uint64(self.precision)) | np.uint64(1 << (self.precision - 1))
+        np.maximum.at(self.registers, buckets, leading_zeros(remaining) + 1)
+
+    def merge(self, other):
+        """Combines another sketch of the same precision into this one."""
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @property
+    def relative_error(self):
+        """Relative standard error of the estimate."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def estimate(self):
+        """Estimates the number of distinct hashes added so far."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and empty:
+            # Linear counting is more accurate while many registers are still empty
+            return m * math.log(m / empty)
+        return float(raw)
+
+    def error_bound(self):
+        """Half-width of the 95% confidence interval of the estimate."""
+        return Z_95 * self.relative_error * self.estimate()
+
+class CountMinSketch:
+    """
+    Count-min sketch estimating how often each 64-bit hash occurs in a stream.
+
+    Estimates never undercount; with probability 1 - exp(-depth) they overcount by at most
+    e / width times the total number of added items.
+    """
+    # Odd multipliers of the multiply-shift hash functions deriving one column per row
+    MULTIPLIERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+                            0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0x94D049BB133111EB, 0xBF58476D1CE4E5B9], dtype=np.uint64)
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    def columns(self, hashes, row):
+        """Maps hashes to the columns of one row of the table."""
+        with np.errstate(over='ignore'):
+            return ((hashes * self.MULTIPLIERS[row]) >> np.uint64(32)) % np.uint64(self.width)
+
+    def update(self, hashes):
+        """Adds an array of uint64 hashes to the sketch."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        for row in range(self.depth):
+            self.table[row] += np.bincount(self.columns(hashes, row).astype(np.intp), minlength=self.width)
+        self.total += len(hashes)
+
+    def estimate(self, hashes):
+        """Estimates the number of occurrences of each of the given hashes."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        counts = [self.table[row][self.columns(hashes, row).astype(np.intp)] for row in range(self.depth)]
+        return np.min(counts, axis=0)
+
+    def error_bound(self):
+        """Largest overcount of any estimate, holding with probability 1 - exp(-depth)."""
+        return math.e / self.width * self.total
+
+class ReservoirSample:
+    """
+    Uniform random sample of fixed size over the rows of a stream of DataFrame chunks (algorithm R).
+
+    Replacement decisions are drawn for a whole chunk at once. Candidate rows are buffered with the
+    slot they replace and compacted once the buffer grows past a few times the sample size, so
+    memory stays proportional to the sample size.
+    """
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+        self.candidates = []  # (slots, positions, rows) tuples in stream order
+        self.num_candidates = 0
+
+    def update(self, chunk):
+        """Offers every row of a chunk to the sample."""
+        positions = self.seen + np.arange(len(chunk))
+        # Row number t (0-based) fills slot t while the sample is not full, then replaces slot j ~ U[0, t] if j < size
+        slots = np.where(positions < self.size, positions, (self.rng.random(len(chunk)) * (positions + 1)).astype(np.int64))
+        selected = slots < self.size
+        if selected.any():
+            self.candidates.append((slots[selected], positions[selected], chunk[selected].reset_index(drop=True)))
+            self.num_candidates += int(selected.sum())
+        self.seen += len(chunk)
+        if self.num_candidates > 4 * self.size:
+            self.compact()
+
+    def compact(self):
+        """Keeps only the latest candidate of every slot."""
+        if not self.candidates:
+            return
+        slots = np.concatenate([candidate[0] for candidate in self.candidates])
+        positions = np.concatenate([candidate[1] for candidate in self.candidates])
+        rows = pd.concat([candidate[2] for candidate in self.candidates], ignore_index=True)
+        # The last candidate written to a slot is the one that survives
+        _, last_from_end = np.unique(slots[::-1], return_index=True)
+        keep = len(slots) - 1 - last_from_end
+        self.candidates = [(slots[keep], positions[keep], rows.iloc[keep].reset_index(drop=True))]
+        self.num_candidates = len(keep)
+
+    def result(self):
+        """
+        Returns the sampled rows in stream order, with the stream position of each row.
+
+        Returns:
+        - (rows, positions): DataFrame of sampled rows and the int64 array of their positions.
+        """
+        self.compact()
+        if not self.candidates:
+            return pd.DataFrame(), np.empty(0, dtype=np.int64)
+        _, positions, rows = self.candidates[0]
+        order = np.argsort(positions)
+        return rows.iloc[order].reset_index(drop=True), positions[order]
@@ -0,0 +1,387 @@
+import os
+import numpy as np
+import pandas as pd
+from data_processing import get_scaling_mode, load_processing_metadata, save_label_mapping, save_network_parameters, save_preprocessing
+from duplicates import get_duplicate_index
+from data_splitter import SPLIT_CODES, SPLITS, load_split
+from processing_metrics import MetricsAccumulator, iter_processed_rows, save_processed_metrics
+from typed_loader import as_objects, is_categorical, load_dtypes
+from utils.artifact_cache import ArtifactCache
+
+# Number of rows read from disk at a time in streaming mode
+CHUNK_SIZE = 100000
+
+# Source files larger than this are processed out of core even when streaming was not requested
+STREAMING_THRESHOLD_BYTES = 512 * 1024 * 1024
+
+class RunningStats:
+    """
+    Incrementally tracks per-column count, mean, variance, minimum and maximum.
+
+    Chunks are merged with the pairwise update of Chan et al., so the result equals a single pass
+    over the full column without ever holding it in memory. NaN values are ignored, as the
+    scikit-learn scalers do.
+    """
+    def __init__(self, num_columns):
+        self.count = np.zeros(num_columns)
+        self.mean = np.zeros(num_columns)
+        self.m2 = np.zeros(num_columns)
+        self.min = np.full(num_columns, np.inf)
+        self.max = np.full(num_columns, -np.inf)
+
+    def update(self, values):
+        """
+        Adds a 2-D float array of rows to the statistics.
+
+        :param values: Array of shape (rows, columns) with NaN marking missing values.
+        """
+        present = ~np.isnan(values)
+        count = present.sum(axis=0)
+        mean = np.where(present, values, 0).sum(axis=0) / np.maximum(count, 1)
+        m2 = np.where(present, (values - mean) ** 2, 0).sum(axis=0)
+        minimum = np.where(present, values, np.inf).min(axis=0, initial=np.inf)
+        maximum = np.where(present, values, -np.inf).max(axis=0, initial=-np.inf)
+        self.merge(count, mean, m2, minimum, maximum)
+
+    def add_constant(self, values, counts):
+        """
+        Adds `counts[i]` copies of `values[i]` to each column, e.g. the imputed mode of a column.
+
+        :param values: Value added to each column.
+        :param counts: Number of times the value is added to each column.
+        """
+        counts = np.asarray(counts, dtype=float)
+        values = np.where(counts > 0, np.asarray(values, dtype=float), 0)
+        self.merge(counts, values, np.zeros_like(counts),
+                   np.where(counts > 0, values, np.inf), np.where(counts > 0, values, -np.inf))
+
+    def merge(self, count, mean, m2, minimum, maximum):
+        """Merges the statistics of another block of rows into the running totals."""
+        total = self.count + count
+        delta = mean - self.mean
+        safe_total = np.maximum(total, 1)
+        self.mean = self.mean + delta * count / safe_total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / safe_total
+        self.count = total
+        self.min = np.minimum(self.min, minimum)
+        self.max = np.maximum(self.max, maximum)
+
+    @property
+    def variance(self):
+        """Population variance of each column, as used by StandardScaler."""
+        return self.m2 / np.maximum(self.count, 1)
+
+class ValueCounter:
+    """
+    Accumulates value frequencies per column so the most frequent value can be imputed.
+    """
+    def __init__(self):
+        self.counts = {}
+
+    def update(self, chunk):
+        """Adds the non-missing values of every column in the chunk to the frequency tables."""
+        for col in chunk.columns:
+            counts = chunk[col].value_counts(dropna=True)
+            counts = counts[counts > 0]  # Categories list every category, including those not in the chunk
+            self.counts[col] = counts if col not in self.counts else self.counts[col].add(counts, fill_value=0)
+
+    def most_frequent(self):
+        """
+        Returns the most frequent value of each column, breaking ties by the smallest value like
+        SimpleImputer(strategy='most_frequent'). Columns without any values are left out.
+        """
+        modes = {}
+        for col, counts in self.counts.items():
+            if counts.empty:
+                continue
+            candidates = counts[counts == counts.max()].index.tolist()
+            try:
+                modes[col] = min(candidates)
+            except TypeError:
+                modes[col] = candidates[0]  # Mixed types cannot be ordered
+        return modes
+
+def use_streaming(upload_folder, options):
+    """
+    Decides whether the dataset should be processed out of core.
+
+    Parameters:
+    - upload_folder: Directory where the split assignment is stored.
+    - options: Dictionary of processing options; 'streaming' forces streaming mode.
+
+    Returns:
+    - True if streaming mode was requested or the split source exceeds STREAMING_THRESHOLD_BYTES.
+    """
+    if options.get('streaming'):
+        return True
+    split_info, _ = load_split(upload_folder)
+    return os.path.getsize(split_info['source']) > STREAMING_THRESHOLD_BYTES
+
+def iter_split_chunks(source, assignment, keep, chunk_size, dtype, columns=None):
+    """
+    Reads the source once and yields, for every chunk, the rows of each split.
+
+    Parameters:
+    - source: Path of the source CSV file.
+    - assignment: Split code of every source row.
+    - keep: Optional boolean array marking the source rows that survive deduplication.
+    - chunk_size: Number of rows read at a time.
+    - dtype: Column dtypes passed to the CSV reader.
+    - columns: Optional list of source columns to read (all columns by default).
+
+    Yields:
+    - Dictionary of split name to the DataFrame of that split's rows in the chunk.
+    """
+    offset = 0
+    for chunk in pd.read_csv(source, usecols=columns, chunksize=chunk_size, dtype=dtype):
+        codes = assignment[offset:offset + len(chunk)]
+        selected = np.ones(len(chunk), dtype=bool) if keep is None else keep[offset:offset + len(chunk)]
+        offset += len(chunk)
+        yield {name: chunk[selected & (codes == SPLIT_CODES[name])].reset_index(drop=True) for name in SPLITS}
+
+def find_duplicate_rows(source, assignment, cache_folder, chunk_size, columns=None, workers=1):
+    """
+    Marks the rows to keep when duplicates are removed, visiting rows in train, validation, test order.
+
+    The cached duplicate index of the source is reused, so this costs no extra read once the index
+    exists. As in the in-memory pipeline, the copy that survives is the first one in split order.
+    Rows are compared on `columns` only, so rows differing only in dropped columns are duplicates.
+    The index is built with `workers` hashing processes when it is not cached yet.
+
+    Returns:
+    - Boolean array over the source rows that is True for rows to keep.
+    """
+    duplicate_index = get_duplicate_index(source, cache_folder, columns=columns, chunk_size=chunk_size, workers=workers)
+    order = np.concatenate([np.flatnonzero(assignment == SPLIT_CODES[name]) for name in SPLITS])
+    keep = np.zeros(len(assignment), dtype=bool)
+    keep[order] = ~duplicate_index.duplicated(order)
+    return keep
+
+def update_vocabulary(vocabulary, values, skip_missing):
+    """Assigns the next free code to every value not seen before, in order of first appearance."""
+    if skip_missing:
+        values = values.dropna()
+    for value in as_objects(values).unique():
+        if pd.isna(value):
+            value = np.nan  # Use the NaN singleton so missing values share a single code
+        if value not in vocabulary:
+            vocabulary[value] = len(vocabulary)
+
+def merge_vocabularies(split_vocabularies, columns):
+    """Concatenates per-split vocabularies in split order, so codes match the in-memory pipeline."""
+    merged = {col: {} for col in columns}
+    for name in SPLITS:
+        for col in columns:
+            for value in split_vocabularies[name][col]:
+                if value not in merged[col]:
+                    merged[col][value] = len(merged[col])
+    return merged
+
+def fit_statistics(chunks, options, label_column, categorical_cols):
+    """
+    Pass one: computes imputation modes, category vocabularies and scaler statistics chunk by chunk.
+
+    Vocabularies are collected per split and merged in split order afterwards. Scaler statistics
+    are fitted on the training split only, after categorical encoding, exactly like the in-memory
+    pipeline; training codes are final as soon as they are assigned because training values come
+    first in the merged vocabulary. Values that will later be imputed are accounted for by adding
+    the mode of each column once per missing value.
+
+    Returns:
+    - Dictionary with 'modes', 'vocabularies', 'feature_columns' and, when scaling, 'stats'.
+    """
+    impute = options.get('handleMissingValues')
+    encode = options.get('encodeCategorical')
+    scale = get_scaling_mode(options) is not None
+    counter = ValueCounter()
+    vocab_cols = ([col for col in categorical_cols if col != label_column] if encode else []) + [label_column]
+    split_vocabularies = {name: {col: {} for col in vocab_cols} for name in SPLITS}
+    train_vocabularies = split_vocabularies['train']
+    feature_columns = None
+    stats = None
+    missing = None
+
+    for parts in chunks:
+        for name, chunk in parts.items():
+            if feature_columns is None:
+                feature_columns = [col for col in chunk.columns if col != label_column]
+                stats = RunningStats(len(feature_columns))
+                missing = np.zeros(len(feature_columns))
+            for col in vocab_cols:
+                update_vocabulary(split_vocabularies[name][col], chunk[col], skip_missing=impute)
+            if name != 'train':
+                continue
+            if impute:
+                counter.update(chunk)
+            if scale:
+                features = chunk[feature_columns].copy()
+                for col in vocab_cols:
+                    if col in features:
+                        features[col] = as_objects(features[col]).map(train_vocabularies[col])
+                values = features.to_numpy(dtype='float64')
+                stats.update(values)
+                missing += np.isnan(values).sum(axis=0)
+
+    vocabularies = merge_vocabularies(split_vocabularies, vocab_cols)
+    modes = counter.most_frequent() if impute else {}
+    if scale and impute:
+        # Imputed cells count towards the training statistics with the value they will be given
+        fill_values = [vocabularies[col].get(modes.get(col), np.nan) if col in vocabularies else modes.get(col, np.nan)
+                       for col in feature_columns]
+        fill_values = np.asarray(fill_values, dtype=float)
+        stats.add_constant(np.nan_to_num(fill_values), np.where(np.isnan(fill_values), 0, missing))
+
+    return {'modes': modes, 'vocabularies': vocabularies, 'feature_columns': feature_columns or [], 'stats': stats if scale else None}
+
+def get_scaling_parameters(options, stats):
+    """
+    Converts running statistics into the offset and scale applied to each feature column.
+
+    Returns:
+    - Tuple (offset, scale) so that scaled = (value - offset) / scale, or None when not scaling.
+    """
+    scaling_mode = get_scaling_mode(options)
+    if scaling_mode == 'standardization':
+        scale = np.sqrt(stats.variance)
+        scale[scale < 10 * np.finfo(float).eps] = 1.0  # Constant columns are only centered
+        return stats.mean, scale
+    if scaling_mode == 'normalization':
+        data_range = stats.max - stats.min
+        data_range[data_range < 10 * np.finfo(float).eps] = 1.0  # Constant columns map to zero
+        return stats.min, data_range
+    return None
+
+def transform_chunk(chunk, options, label_column, fitted, scaling):
+    """
+    Imputes, encodes and scales one chunk of a split.
+
+    Returns:
+    - features: DataFrame of processed feature columns.
+    - labels: Series of (imputed) original label values.
+    - codes: Series of int32 label class codes.
+    """
+    if options.get('handleMissingValues'):
+        chunk = chunk.fillna(fitted['modes'])
+    labels = chunk.pop(label_column)
+    for col, vocabulary in fitted['vocabularies'].items():
+        if col in chunk:
+            chunk[col] = as_objects(chunk[col]).map(vocabulary)
+    if scaling is not None:
+        offset, scale = scaling
+        feature_columns = fitted['feature_columns']
+        chunk = pd.DataFrame((chunk[feature_columns].to_numpy(dtype='float64') - offset) / scale, columns=feature_columns)
+    codes = as_objects(labels).map(fitted['vocabularies'][label_column]).astype(np.int32)
+    return chunk, labels, codes
+
+def temporary_output(path):
+    """Returns the name a processed file is written under until it is complete."""
+    return os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.tmp')
+
+def transform_and_write(upload_folder, chunks, options, label_column, fitted):
+    """
+    Pass two: transforms every chunk and appends each split's rows to its processed output files.
+
+    The raw labels are buffered per split in temporary files, because processed_combined_y.csv
+    lists them in split order while the source is read only once. The processed files are written
+    under temporary names and replace the previous ones only once complete. The comparison metrics
+    of the processed data are collected from the same chunks.
+
+    Returns:
+    - Number of feature columns written.
+    """
+    feature_columns = fitted['feature_columns']
+    scaling = get_scaling_parameters(options, fitted['stats']) if fitted['stats'] is not None else None
+    files = {}
+    header = {name: True for name in SPLITS}
+    metrics = {name: MetricsAccumulator() for name in SPLITS}
+    outputs = [os.path.join(upload_folder, f'{prefix}{name}.csv') for name in SPLITS for prefix in ['processed_', 'processed_y_']]
+    try:
+        for name in SPLITS:
+            paths = [temporary_output(os.path.join(upload_folder, f'{prefix}{name}.csv')) for prefix in ['processed_', 'processed_y_']]
+            files[name] = [open(path, 'w', newline='') for path in paths + [os.path.join(upload_folder, f'combined_y_part_{name}.csv')]]
+        for parts in chunks:
+            for name, chunk in parts.items():
+                if chunk.empty:
+                    continue
+                features, labels, codes = transform_chunk(chunk, options, label_column, fitted, scaling)
+                features_file, labels_file, raw_labels_file = files[name]
+                features.to_csv(features_file, header=header[name], index=False)
+                pd.DataFrame({'label': codes}).to_csv(labels_file, header=header[name], index=False)
+                labels.to_csv(raw_labels_file, header=False, index=False)
+                header[name] = False
+                metrics[name].update(pd.concat([features.reset_index(drop=True), labels.reset_index(drop=True)], axis=1))
+
+        for name in SPLITS:
+            if header[name]:
+                # Empty split: still write the headers so the files can be read back
+                pd.DataFrame(columns=feature_columns).to_csv(files[name][0], index=False)
+                pd.DataFrame(columns=['label']).to_csv(files[name][1], index=False)
+        for split_files in files.values():
+            for file in split_files:
+                file.close()
+        for output in outputs:
+            os.replace(temporary_output(output), output)
+    finally:
+        for split_files in files.values():
+            for file in split_files:
+                file.close()
+        for output in outputs:
+            if os.path.exists(temporary_output(output)):
+                os.remove(temporary_output(output))
+
+    # Concatenate the buffered raw labels in split order
+    def write_combined_y(combined_y_file):
+        combined_y_file.write(f'{label_column}\n')
+        for name in SPLITS:
+            with open(os.path.join(upload_folder, f'combined_y_part_{name}.csv'), 'r', newline='') as part_file:
+                for line in part_file:
+                    combined_y_file.write(line)
+    ArtifactCache.write_atomically(os.path.join(upload_folder, 'processed_combined_y.csv'), write_combined_y, mode='w')
+    for name in SPLITS:
+        os.remove(os.path.join(upload_folder, f'combined_y_part_{name}.csv'))
+
+    # The per-split rows are combined in the order the processed files are read back in
+    combined_metrics = MetricsAccumulator()
+    for name in SPLITS:
+        combined_metrics.extend(metrics[name])
+    save_processed_metrics(upload_folder, combined_metrics.result(lambda: iter_processed_rows(upload_folder, SPLITS)))
+    return len(feature_columns)
+
+def process_data_streaming(upload_folder, options, cache_folder=None, chunk_size=CHUNK_SIZE, workers=1):
+    """
+    Out-of-core counterpart of data_processing.process_data.
+
+    The split source is never loaded in full: duplicates come from the source's row-hash index,
+    pass one fits the imputation modes, category vocabularies and scaler statistics incrementally,
+    and pass two transforms the data chunk by chunk. Each pass reads the source once and routes
+    rows to their split using the stored split assignment. Peak memory is bounded by the chunk size
+    plus a few bytes per row for the assignment and duplicate masks, so datasets larger than RAM
+    can be processed.
+
+    Parameters:
+    - upload_folder: Directory where the data files are stored.
+    - options: Dictionary specifying processing options such as duplicate removal and missing value handling.
+    - cache_folder: Optional directory where the source's duplicate index is cached.
+    - chunk_size: Number of rows held in memory at a time.
+    - workers: Number of processes hashing the rows for the duplicate index.
+    """
+    label_column, datatypes = load_processing_metadata(upload_folder)
+    split_info, assignment = load_split(upload_folder)
+    source = split_info['source']
+    columns = split_info.get('columns')
+
+    # Read with the stored schema, or categorical columns as strings, so every chunk sees the same values
+    categorical_cols = [column for column, data_type in datatypes.items() if is_categorical(data_type)]
+    dtype = load_dtypes(upload_folder, columns) or {col: str for col in categorical_cols}
+
+    keep = find_duplicate_rows(source, assignment, cache_folder, chunk_size, columns, workers) if options.get('removeDuplicates') else None
+    fitted = fit_statistics(iter_split_chunks(source, assignment, keep, chunk_size, dtype, columns), options, label_column, categorical_cols)
+    num_columns = transform_and_write(upload_folder, iter_split_chunks(source, assignment, keep, chunk_size, dtype, columns),
+                                      options, label_column, fitted)
+
+    classes = list(fitted['vocabularies'][label_column].keys())
+    save_label_mapping(upload_folder, label_column, classes)
+    save_network_parameters(upload_folder, num_columns, len(classes))
+    encodings = {col: vocabulary for col, vocabulary in fitted['vocabularies'].items() if col != label_column}
+    scaling = get_scaling_parameters(options, fitted['stats']) if fitted['stats'] is not None else None
+    save_preprocessing(upload_folder, label_column, classes, fitted['feature_columns'], fitted['modes'], encodings, scaling)
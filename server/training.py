@@ -0,0 +1,239 @@
+import torch
+import torch.nn as nn
+import torch.optim as optim
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, TensorDataset
+from sklearn.metrics import precision_score, recall_score, accuracy_score, confusion_matrix
+
+# Number of rows per training batch
+TRAIN_BATCH_SIZE = 10
+
+class NeuralNetwork(nn.Module):
+    """
+    Defines the structure of the Neural Network using PyTorch.
+    """
+    def __init__(self, model_config):
+        """
+        Initializes the neural network model based on the provided model configuration.
+        
+        :param model_config: A dictionary containing the configuration of the model such as input size,
+                             layers, and their settings.
+        """
+        super(NeuralNetwork, self).__init__()
+        layers = []  # List to store layers of the network
+        input_size = model_config['input_size']  # Set initial input size
+
+        # Iterate through each layer in the model configuration
+        for layer in model_config['layers']:
+            # If the layer type is 'dense', add a Linear layer followed by an activation function if specified
+            if layer['type'] == 'dense':
+                layers.append(nn.Linear(input_size, layer['settings']['nodes']))  # Add a linear layer
+                if layer['settings']['activation'] == 'relu':
+                    layers.append(nn.ReLU())  # Add ReLU activation function
+                elif layer['settings']['activation'] == 'sigmoid' and layer == model_config['layers'][-1]:
+                    # Add sigmoid activation only if it's the final layer for binary classification
+                    layers.append(nn.Sigmoid())
+                input_size = layer['settings']['nodes']  # Update the input size for the next layer
+            
+            # If the layer type is 'dropout', add a Dropout layer
+            elif layer['type'] == 'dropout':
+                layers.append(nn.Dropout(layer['settings']['rate']))
+
+        self.model = nn.Sequential(*layers)  # Create the sequential model from the layers list
+        
+        # Set the loss function based on the output nodes
+        output_nodes = model_config['layers'][-1]['settings']['nodes']
+        self.loss_function = nn.BCELoss() if output_nodes == 1 else nn.CrossEntropyLoss()
+
+    def forward(self, x):
+        """
+        Defines the forward pass of the model.
+        
+        :param x: Input tensor to the network.
+        :return: Output tensor from the network.
+        """
+        return self.model(x)
+
+def compile_model(model_config):
+    """
+    Compiles the neural network model with the specified optimizer.
+    
+    :param model_config: A dictionary containing the configuration of the model.
+    :return: Compiled model and optimizer.
+    """
+    model = NeuralNetwork(model_config)  # Instantiate the model
+    optimizer = optim.RMSprop(model.parameters())  # Use RMSprop optimizer
+    return model, optimizer
+
+def resolve_output_layer(model_config):
+    """
+    Sizes the output layer for the stored labels, which are class codes: a sigmoid output only needs a single node.
+    
+    :param model_config: A dictionary containing the configuration of the model, updated in place.
+    :return: The configuration and the loss function matching its output activation.
+    """
+    if model_config['layers'][-1]['settings']['activation'] == 'sigmoid':
+        model_config['layers'][-1]['settings']['nodes'] = 1
+        return model_config, nn.BCELoss()
+    return model_config, nn.CrossEntropyLoss()
+
+def prepare_targets(y_batch, predictions, loss_function):
+    """
+    Shapes a batch of integer class codes into the targets expected by the loss function.
+    
+    :param y_batch: Tensor of integer class codes.
+    :param predictions: Model output for the batch.
+    :param loss_function: The loss function the targets are passed to.
+    :return: Target tensor matching the loss function's expectations.
+    """
+    if isinstance(loss_function, nn.CrossEntropyLoss):
+        return y_batch.long()  # CrossEntropyLoss consumes class indices directly
+    if predictions.dim() > 1 and predictions.shape[1] > 1:
+        # Expand to one-hot only when a per-class loss such as BCELoss needs it
+        return F.one_hot(y_batch.long(), num_classes=predictions.shape[1]).float()
+    return y_batch.float().reshape(predictions.shape)
+
+def collect_predictions(model, data_loader, loss_function):
+    """
+    Runs the model over a dataset and collects its predicted and true class codes.
+    
+    :param model: The neural network model.
+    :param data_loader: DataLoader for the dataset to evaluate.
+    :param loss_function: The loss function used for evaluation.
+    :return: Tuple of the summed batch losses, the number of batches, and the lists of predicted and true class codes.
+    """
+    model.eval()  # Set the model to evaluation mode
+    total_loss = 0
+    all_predictions = []
+    all_targets = []
+
+    with torch.no_grad():  # Disable gradient computation
+        for X_batch, y_batch in data_loader:
+            outputs = model(X_batch)
+            predictions = outputs.round()  # Get model predictions
+            loss = loss_function(predictions, prepare_targets(y_batch, predictions, loss_function))  # Calculate loss
+            total_loss += loss.item()
+            if outputs.dim() > 1 and outputs.shape[1] > 1:
+                predicted_labels = outputs.argmax(dim=1)  # Pick the most likely class code
+            else:
+                predicted_labels = predictions.reshape(-1)  # Round predictions to get binary output
+            all_predictions.extend(predicted_labels.cpu().numpy())
+            all_targets.extend(y_batch.cpu().numpy())
+
+    return total_loss, len(data_loader), all_predictions, all_targets
+
+def summarize_predictions(total_loss, num_batches, all_predictions, all_targets, calculate_confusion_matrix=False):
+    """
+    Calculates evaluation metrics from collected predictions.
+    
+    :param total_loss: Summed loss over the evaluated batches.
+    :param num_batches: Number of evaluated batches.
+    :param all_predictions: List of predicted class codes.
+    :param all_targets: List of true class codes.
+    :param calculate_confusion_matrix: Boolean indicating whether to calculate the confusion matrix.
+    :return: Dictionary of evaluation metrics.
+    """
+    # Calculate metrics
+    metrics = {
+        'loss': total_loss / num_batches,
+        'accuracy': accuracy_score(all_targets, all_predictions),
+        'precision': precision_score(all_targets, all_predictions, average='macro', zero_division=0),
+        'recall': recall_score(all_targets, all_predictions, average='macro', zero_division=0),
+    }
+
+    if calculate_confusion_matrix:
+        # Calculate and add confusion matrix to metrics
+        try:
+            metrics['confusion_matrix'] = confusion_matrix(all_targets, all_predictions).tolist()
+        except Exception as e:
+            print('Error', {'error': str(e)})
+
+    return metrics
+
+def evaluate_model(model, data_loader, loss_function, calculate_confusion_matrix=False):
+    """
+    Evaluates the model on a dataset.
+    
+    :param model: The neural network model.
+    :param data_loader: DataLoader for the dataset to evaluate.
+    :param loss_function: The loss function used for evaluation.
+    :param calculate_confusion_matrix: Boolean indicating whether to calculate the confusion matrix.
+    :return: Dictionary of evaluation metrics.
+    """
+    return summarize_predictions(*collect_predictions(model, data_loader, loss_function), calculate_confusion_matrix)
+
+def train_epoch(model, optimizer, train_loader, loss_function, epoch, progress=None):
+    """
+    Trains the model for one epoch.
+    
+    :param model: The neural network model, possibly wrapped for distributed training.
+    :param optimizer: The optimizer used for training.
+    :param train_loader: DataLoader for the training data.
+    :param loss_function: The loss function to use during training.
+    :param epoch: Current epoch, starting at 1.
+    :param progress: Optional progress reporter receiving batch updates.
+    :return: Mean training loss over the epoch's batches.
+    """
+    model.train()  # Set model to training mode
+    total_loss = 0
+    num_batches = len(train_loader)
+    for batch, (X_batch, y_batch) in enumerate(train_loader, start=1):
+        optimizer.zero_grad()  # Clear gradients
+        predictions = model(X_batch)  # Forward pass
+        targets = prepare_targets(y_batch, predictions, loss_function)  # Shape labels for the loss function
+        loss = loss_function(predictions, targets)  # Compute loss
+        loss.backward()  # Backpropagate errors
+        optimizer.step()  # Update weights
+        total_loss += loss.item()
+        if progress is not None:
+            progress.report_batch(epoch, batch, num_batches, total_loss / batch)  # Throttled by the channel
+    return total_loss / max(num_batches, 1)
+
+def validation_summary(metrics):
+    """Selects the validation metrics reported with an epoch's progress."""
+    return {'accuracy': metrics['accuracy'], 'precision': metrics['precision'], 'recall': metrics['recall']}
+
+def train_model(progress, model, optimizer, epochs, X_train, y_train, X_val, y_val, X_test, y_test, loss_function):
+    """
+    Trains the neural network model.
+    
+    Parameters:
+    - progress: ProgressChannel of the run, receiving batch and epoch updates and the test metrics.
+    - model: The neural network model to be trained.
+    - optimizer: The optimizer used for training.
+    - epochs: The number of epochs to train for.
+    - X_train, y_train: Training dataset features and labels.
+    - X_val, y_val: Validation dataset features and labels.
+    - X_test, y_test: Test dataset features and labels.
+    - loss_function: The loss function to use during training.
+    """
+    # Create TensorDatasets for training, validation, and testing
+    train_dataset = TensorDataset(torch.tensor(X_train, dtype=torch.float), torch.tensor(y_train, dtype=torch.long))
+    val_dataset = TensorDataset(torch.tensor(X_val, dtype=torch.float), torch.tensor(y_val, dtype=torch.long))
+    test_dataset = TensorDataset(torch.tensor(X_test, dtype=torch.float), torch.tensor(y_test, dtype=torch.long))
+    
+    # Create DataLoader instances for each dataset
+    train_loader = DataLoader(train_dataset, batch_size=TRAIN_BATCH_SIZE, shuffle=True)
+    val_loader = DataLoader(val_dataset, batch_size=TRAIN_BATCH_SIZE)
+    
+    # Optional learning rate scheduler for optimizer
+    scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=30, gamma=0.1)
+
+    # Training loop
+    for epoch in range(1, epochs+1):
+        train_loss = train_epoch(model, optimizer, train_loader, loss_function, epoch, progress)
+        scheduler.step()  # Update learning rate
+
+        # Evaluate model on validation set
+        val_metrics = evaluate_model(model, val_loader, loss_function)
+
+        # Report the epoch's validation metrics; they are batched with other updates
+        progress.report_epoch(epoch, validation_summary(val_metrics), train_loss)
+        print(f'Epoch {epoch}/{epochs} - Metrics: {val_metrics}')
+    progress.close()  # Send the updates still buffered
+
+    # Final evaluation on test set
+    test_loader = DataLoader(test_dataset, batch_size=32, shuffle=False)
+    test_metrics = evaluate_model(model, test_loader, loss_function, calculate_confusion_matrix=True)
+    print("Test set validation:", test_metrics)
+    progress.report_test(test_metrics)  # Emit final evaluation metrics to the run's room
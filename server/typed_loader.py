@@ -0,0 +1,267 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from utils.artifact_cache import ArtifactCache
+
+# Schema of the columns kept for processing, stored in the upload folder by the label selection step
+SCHEMA_FILE = 'column_schema.json'
+
+# Number of rows read at a time while inferring a schema
+SCHEMA_CHUNK_SIZE = 200000
+
+# String columns with more distinct values than this are kept as Python strings
+MAX_CATEGORIES = 10000
+
+# Integer widths tried in order, with the range of values each one holds
+INTEGER_DTYPES = [(name, np.iinfo(name)) for name in ['int8', 'int16', 'int32', 'int64']]
+
+def is_categorical(data_type):
+    """
+    Tells whether a column of the given dtype is encoded as a categorical feature.
+
+    Parameters:
+    - data_type: Name of the dtype, as stored in column_data_types.json.
+
+    Returns:
+    - True for strings, categories and booleans with missing values, which pandas used to read as objects.
+    """
+    return data_type in ['object', 'category', 'string', 'boolean']
+
+def is_numeric(data_type):
+    """
+    Tells whether a column of the given dtype holds numbers.
+
+    Parameters:
+    - data_type: Name of the dtype, as stored in column_data_types.json.
+
+    Returns:
+    - True for signed and unsigned integers and floats of any width.
+    """
+    return data_type.startswith(('int', 'uint', 'float'))
+
+def as_objects(values):
+    """
+    Converts a column read as a category or nullable boolean into Python objects with NaN for
+    missing values, as pandas reads such columns without a schema. Used by code that handles
+    values one by one, such as value mappings and the imputer.
+
+    Parameters:
+    - values: Series of a column.
+
+    Returns:
+    - The Series itself if it has a numpy dtype, otherwise its values as objects.
+    """
+    if isinstance(values.dtype, (pd.CategoricalDtype, pd.BooleanDtype)):
+        return values.astype(object).where(values.notna(), np.nan)
+    return values
+
+def as_object_frame(df):
+    """
+    Applies as_objects to every column of a DataFrame.
+
+    Parameters:
+    - df: DataFrame read with a compact schema.
+
+    Returns:
+    - A DataFrame whose category and nullable boolean columns hold Python objects.
+    """
+    return pd.DataFrame({col: as_objects(df[col]) for col in df.columns}, index=df.index)
+
+class ColumnState:
+    """What has been seen of one column so far: the narrowest kind holding every value and its range."""
+
+    def __init__(self):
+        self.kind = None  # None until a value is seen, then 'bool', 'int', 'float' or 'string'
+        self.has_missing = False
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.float32_safe = True
+        self.values = set()  # Distinct strings, or None once they cannot become categories
+
+    def merge_kind(self, kind):
+        """Widens the column's kind so it also holds values of `kind`."""
+        if self.kind is None or self.kind == kind:
+            self.kind = kind
+        elif {self.kind, kind} == {'int', 'float'}:
+            self.kind = 'float'
+        else:
+            # Values read as numbers or booleans in other chunks are not known as text
+            self.kind = 'string'
+            self.values = None
+
+    def update(self, column):
+        """Adds a chunk of the column, as pandas read it."""
+        present = column.dropna()
+        self.has_missing |= len(present) < len(column)
+        self.count += len(present)
+        if present.empty:
+            return
+
+        if present.dtype.kind == 'b' or (present.dtype == object and present.isin([True, False]).all()):
+            self.merge_kind('bool')
+        elif present.dtype.kind in 'iuf':
+            self.merge_kind('int' if present.dtype.kind in 'iu' else 'float')
+            self.min = present.min() if self.min is None else min(self.min, present.min())
+            self.max = present.max() if self.max is None else max(self.max, present.max())
+            if present.dtype.kind == 'f' and self.float32_safe:
+                # Safe only if the float32 value is written back as text that parses to the same number
+                values = present.to_numpy()
+                narrowed = values.astype(np.float32)
+                self.float32_safe = bool((narrowed.astype(np.float64) == values).all()
+                                         and (narrowed.astype(str).astype(np.float64) == values).all())
+        else:
+            self.merge_kind('string')
+            if self.values is not None:
+                self.values.update(present.unique())
+                if len(self.values) > MAX_CATEGORIES:
+                    self.values = None
+
+    def dtype(self):
+        """Returns the smallest dtype that holds every value of the column without loss."""
+        if self.kind is None:
+            return 'float32'  # Only missing values
+        if self.kind == 'bool':
+            return 'boolean' if self.has_missing else 'bool'
+        if self.kind == 'int':
+            for name, limits in INTEGER_DTYPES:
+                if limits.min <= self.min and self.max <= limits.max:
+                    return name
+            return 'uint64'
+        if self.kind == 'float':
+            # Also covers integers with missing values, which pandas reads as floats
+            return 'float32' if self.float32_safe else 'float64'
+        # Dictionary-encode strings when each distinct value is repeated on average
+        if self.values is not None and len(self.values) * 2 <= self.count:
+            return 'category'
+        return 'object'
+
+def infer_schema(file_path, columns=None, chunk_size=SCHEMA_CHUNK_SIZE):
+    """
+    Infers the compact schema of a CSV file in one chunked pass.
+
+    Each column gets the smallest dtype that holds its values exactly: the narrowest integer
+    width, float32 when every value survives the round trip, a nullable boolean when booleans are
+    missing, and a category of the distinct values for repetitive strings.
+
+    Parameters:
+    - file_path: Path of the CSV file.
+    - columns: Optional list of columns to infer (all columns by default).
+    - chunk_size: Number of rows read at a time.
+
+    Returns:
+    - Dictionary with the 'dtypes' of the columns and the sorted 'categories' of category columns.
+    """
+    states = None
+    for chunk in pd.read_csv(file_path, usecols=columns, chunksize=chunk_size):
+        if states is None:
+            states = {col: ColumnState() for col in chunk.columns}
+        for col in chunk.columns:
+            states[col].update(chunk[col])
+    if states is None:
+        states = {col: ColumnState() for col in pd.read_csv(file_path, usecols=columns, nrows=0).columns}
+
+    dtypes = {col: state.dtype() for col, state in states.items()}
+    categories = {col: sorted(states[col].values) for col, data_type in dtypes.items() if data_type == 'category'}
+    return {'dtypes': dtypes, 'categories': categories}
+
+def get_schema(file_path, cache_folder):
+    """
+    Returns the schema of a CSV file, inferring it once and caching it by the file's fingerprint.
+
+    Parameters:
+    - file_path: Path of the CSV file.
+    - cache_folder: Directory holding cached artifacts, or None to infer the schema without caching it.
+
+    Returns:
+    - Dictionary with 'dtypes' and 'categories', see infer_schema.
+    """
+    if cache_folder is None:
+        return infer_schema(file_path)
+    cache_path = ArtifactCache.path_for(cache_folder, 'schema', ArtifactCache.fingerprint(file_path), 'json')
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r') as file:
+            return json.load(file)
+
+    schema = infer_schema(file_path)
+    ArtifactCache.write_atomically(cache_path, lambda file: json.dump(schema, file), mode='w')
+    return schema
+
+def select_columns(schema, columns):
+    """
+    Restricts a schema to the given columns.
+
+    Parameters:
+    - schema: Dictionary with 'dtypes' and 'categories'.
+    - columns: List of columns to keep, or None to keep them all.
+
+    Returns:
+    - The restricted schema.
+    """
+    if columns is None:
+        return schema
+    return {'dtypes': {col: schema['dtypes'][col] for col in columns if col in schema['dtypes']},
+            'categories': {col: values for col, values in schema['categories'].items() if col in columns}}
+
+def pandas_dtypes(schema, columns=None):
+    """
+    Converts a schema into the dtype argument of pandas.read_csv.
+
+    Category columns get their full list of categories, so chunks and splits read separately
+    share the same codes.
+
+    Parameters:
+    - schema: Dictionary with 'dtypes' and 'categories'.
+    - columns: Optional list of the columns being read.
+
+    Returns:
+    - Dictionary mapping column names to dtypes.
+    """
+    schema = select_columns(schema, columns)
+    return {col: pd.CategoricalDtype(schema['categories'][col]) if data_type == 'category' else data_type
+            for col, data_type in schema['dtypes'].items()}
+
+def read_typed(file_path, cache_folder, usecols=None, **kwargs):
+    """
+    Reads a CSV file with its compact schema.
+
+    Parameters:
+    - file_path: Path of the CSV file.
+    - cache_folder: Directory holding cached artifacts.
+    - usecols: Optional list of columns to read.
+    - kwargs: Other arguments of pandas.read_csv, e.g. nrows or chunksize.
+
+    Returns:
+    - DataFrame (or chunk iterator) read with the schema's dtypes.
+    """
+    dtypes = pandas_dtypes(get_schema(file_path, cache_folder), usecols)
+    return pd.read_csv(file_path, usecols=usecols, dtype=dtypes, **kwargs)
+
+def save_schema(upload_folder, schema):
+    """
+    Stores the schema of the columns kept for processing, which every pipeline stage reads with.
+
+    Parameters:
+    - upload_folder: Directory where the processing metadata is stored.
+    - schema: Dictionary with 'dtypes' and 'categories'.
+    """
+    ArtifactCache.write_atomically(os.path.join(upload_folder, SCHEMA_FILE), lambda file: json.dump(schema, file), mode='w')
+
+def load_dtypes(upload_folder, columns=None):
+    """
+    Loads the stored schema as the dtype argument of pandas.read_csv.
+
+    Parameters:
+    - upload_folder: Directory where the processing metadata is stored.
+    - columns: Optional list of the columns being read.
+
+    Returns:
+    - Dictionary mapping column names to dtypes, or None if no schema has been stored, in which
+      case pandas infers the dtypes.
+    """
+    schema_path = os.path.join(upload_folder, SCHEMA_FILE)
+    if not os.path.exists(schema_path):
+        return None
+    with open(schema_path, 'r') as file:
+        return pandas_dtypes(json.load(file), columns)
@@ -0,0 +1,59 @@
+import hashlib
+import json
+import os
+import tempfile
+
+class ArtifactCache:
+    """
+    A utility class for caching artifacts derived from data files, such as duplicate indexes.
+    Cache entries are keyed by a fingerprint of the source file, so they are invalidated
+    automatically when the file is replaced or modified.
+    """
+
+    @staticmethod
+    def fingerprint(path, *extra):
+        """
+        Computes a cheap fingerprint of a file from its path, size and modification time.
+        
+        :param path: The file to fingerprint.
+        :param extra: Additional JSON-serializable values that distinguish artifacts of the same file (e.g. columns).
+        :return: A 16 character hexadecimal string.
+        """
+        stat = os.stat(path)
+        payload = json.dumps([os.path.abspath(path), stat.st_size, stat.st_mtime_ns, extra], default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def path_for(cache_folder, kind, key, extension):
+        """
+        Builds the path of a cache entry, creating the cache folder if needed.
+        
+        :param cache_folder: The directory holding cached artifacts.
+        :param kind: Short name of the artifact type (e.g. 'duplicates').
+        :param key: The fingerprint identifying the entry.
+        :param extension: File extension of the cached artifact.
+        :return: The path of the cache entry.
+        """
+        os.makedirs(cache_folder, exist_ok=True)
+        return os.path.join(cache_folder, f'{kind}_{key}.{extension}')
+
+    @staticmethod
+    def write_atomically(path, write, mode='wb'):
+        """
+        Calls `write(file)` on a uniquely named temporary file next to `path` and moves it into place
+        only once it is complete, so concurrent writers of the same artifact never mix their output
+        and readers never see a partial file.
+        
+        :param path: The final path of the artifact.
+        :param write: Function writing the artifact to the open file.
+        :param mode: 'wb' for binary artifacts or 'w' for text written with newline=''.
+        """
+        descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                                      prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+        try:
+            with open(descriptor, mode, **({} if 'b' in mode else {'newline': ''})) as file:
+                write(file)
+            os.replace(temporary_path, path)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
@@ -0,0 +1,60 @@
+import threading
+import traceback
+
+class BackgroundJobs:
+    """
+    A utility class for running slow refreshes (e.g. exact statistics) in background threads.
+    Jobs are keyed by the artifact they produce, so a job is never started twice while it is running.
+    """
+    _jobs = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def submit(key, target, *args):
+        """
+        Starts `target(*args)` in a daemon thread unless a job with the same key is still running.
+        
+        :param key: Identifier of the job, e.g. the kind and fingerprint of the artifact it builds.
+        :param target: The function to run.
+        :param args: Positional arguments passed to the function.
+        :return: True if a new job was started, False if one was already running.
+        """
+        with BackgroundJobs._lock:
+            job = BackgroundJobs._jobs.get(key)
+            if job is not None and job.is_alive():
+                return False
+            job = threading.Thread(target=BackgroundJobs._run, args=(key, target, args), daemon=True)
+            BackgroundJobs._jobs[key] = job
+            job.start()
+            return True
+
+    @staticmethod
+    def _run(key, target, args):
+        """Runs a job, logging failures instead of losing them with the thread."""
+        try:
+            target(*args)
+        except Exception:
+            print(f"Background job {key} failed:\n{traceback.format_exc()}")
+
+    @staticmethod
+    def is_running(key):
+        """
+        Checks whether a job is currently running.
+        
+        :param key: Identifier of the job.
+        :return: True if the job has been started and has not finished yet.
+        """
+        job = BackgroundJobs._jobs.get(key)
+        return job is not None and job.is_alive()
+
+    @staticmethod
+    def wait(key, timeout=None):
+        """
+        Blocks until a job has finished.
+        
+        :param key: Identifier of the job.
+        :param timeout: Maximum number of seconds to wait.
+        """
+        job = BackgroundJobs._jobs.get(key)
+        if job is not None:
+            job.join(timeout)
@@ -0,0 +1,31 @@
+import importlib
+
+class LazyModule:
+    """
+    A utility class standing in for a module until one of its attributes is used.
+    The module is imported on first attribute access, so importing code that refers to heavy
+    libraries (pandas, torch, sklearn) stays fast until the code actually runs.
+    """
+
+    def __init__(self, name):
+        """
+        :param name: Full name of the module, e.g. 'torch.nn'.
+        """
+        self._name = name
+        self._module = None
+
+    def load(self):
+        """
+        Imports the module if it has not been imported yet.
+
+        :return: The module.
+        """
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+    def __repr__(self):
+        return f"<LazyModule '{self._name}' ({'loaded' if self._module is not None else 'not loaded'})>"
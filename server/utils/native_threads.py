@@ -0,0 +1,112 @@
+import collections
+import sys
+import threading
+
+class NativeThreads:
+    """
+    A utility class for running CPU-bound work (training, calibration, benchmarks) in native threads.
+
+    Under eventlet or gevent every green thread shares one OS thread, so work that does not yield
+    would stall every other client. Once the standard library has been monkey patched, the work is
+    handed to the green library's pool of native threads and the calling green thread waits for it
+    without blocking the hub; otherwise it simply runs in the calling thread.
+    """
+    # Seconds between two deliveries of the events emitted by work running in a native thread
+    RELAY_INTERVAL = 0.05
+
+    @staticmethod
+    def green_library():
+        """
+        Finds the green thread library the standard library has been monkey patched with.
+
+        :return: 'eventlet', 'gevent' or None.
+        """
+        if 'eventlet' in sys.modules:
+            from eventlet import patcher
+            if patcher.is_monkey_patched('thread'):
+                return 'eventlet'
+        if 'gevent' in sys.modules:
+            from gevent import monkey
+            if monkey.is_module_patched('threading'):
+                return 'gevent'
+        return None
+
+    @staticmethod
+    def rlock():
+        """
+        Creates a reentrant lock that native threads can share, even after monkey patching.
+
+        :return: An unpatched threading.RLock.
+        """
+        library = NativeThreads.green_library()
+        if library == 'eventlet':
+            from eventlet import patcher
+            return patcher.original('threading').RLock()
+        if library == 'gevent':
+            from gevent import monkey
+            return monkey.get_original('threading', 'RLock')()
+        return threading.RLock()
+
+    @staticmethod
+    def run(target, *args):
+        """
+        Calls `target(*args)` in a native thread under eventlet or gevent, in the calling thread otherwise.
+
+        :param target: The function to run; it must not use green primitives or emit events itself.
+        :param args: Positional arguments passed to the function.
+        :return: The function's result; its exceptions are raised in the caller.
+        """
+        library = NativeThreads.green_library()
+        if library == 'eventlet':
+            from eventlet import tpool
+            return tpool.execute(target, *args)
+        if library == 'gevent':
+            import gevent
+            return gevent.get_hub().threadpool.apply(target, args)
+        return target(*args)
+
+    @staticmethod
+    def run_emitting(socketio, target, *args):
+        """
+        Like `run`, for work that emits Socket.IO events while it runs.
+
+        The function receives an emitter as its first argument. Off the hub, the emitter queues the
+        events and a background task on the hub emits them in order; the last ones are delivered
+        before this returns.
+
+        :param socketio: SocketIO server instance.
+        :param target: The function to run, called as `target(emitter, *args)`.
+        :param args: Further positional arguments passed to the function.
+        :return: The function's result; its exceptions are raised in the caller.
+        """
+        if NativeThreads.green_library() is None:
+            return target(socketio, *args)
+        emitter = RelayEmitter()
+        finished = threading.Event()  # Green, like the tasks waiting on it
+        delivered = threading.Event()
+
+        def deliver():
+            while True:
+                last = finished.is_set()
+                while emitter.events:
+                    event, data, to = emitter.events.popleft()
+                    socketio.emit(event, data, to=to)
+                if last:
+                    delivered.set()
+                    return
+                socketio.sleep(NativeThreads.RELAY_INTERVAL)
+
+        socketio.start_background_task(deliver)
+        try:
+            return NativeThreads.run(target, emitter, *args)
+        finally:
+            finished.set()
+            delivered.wait()
+
+class RelayEmitter:
+    """Stands in for the SocketIO server in a native thread, queuing the events for the hub to emit."""
+    def __init__(self):
+        self.events = collections.deque()  # Appending and popping are atomic, with no lock to patch
+
+    def emit(self, event, data, to=None):
+        self.events.append((event, data, to))
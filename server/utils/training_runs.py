@@ -0,0 +1,63 @@
+import threading
+
+class TrainingRuns:
+    """
+    A utility class tracking the training runs in progress, so a server process can stop taking new
+    runs and wait for the running ones to finish before it shuts down.
+    """
+    _runs = set()
+    _draining = False
+    _condition = threading.Condition()
+
+    @staticmethod
+    def start(run_id):
+        """
+        Registers a run that is about to start.
+
+        :param run_id: Identifier of the run.
+        :return: True if the run may start, False if the server is draining.
+        """
+        with TrainingRuns._condition:
+            if TrainingRuns._draining:
+                return False
+            TrainingRuns._runs.add(run_id)
+            return True
+
+    @staticmethod
+    def finish(run_id):
+        """
+        Unregisters a run once it has finished, successfully or not.
+
+        :param run_id: Identifier of the run.
+        """
+        with TrainingRuns._condition:
+            TrainingRuns._runs.discard(run_id)
+            TrainingRuns._condition.notify_all()
+
+    @staticmethod
+    def active():
+        """
+        Lists the runs in progress.
+
+        :return: List of run identifiers.
+        """
+        with TrainingRuns._condition:
+            return list(TrainingRuns._runs)
+
+    @staticmethod
+    def stop_accepting():
+        """Refuses new runs from now on, without waiting for the runs in progress."""
+        with TrainingRuns._condition:
+            TrainingRuns._draining = True
+
+    @staticmethod
+    def drain(timeout=None):
+        """
+        Refuses new runs from now on and blocks until the runs in progress have finished.
+
+        :param timeout: Maximum number of seconds to wait.
+        :return: True if every run finished, False if the timeout expired first.
+        """
+        with TrainingRuns._condition:
+            TrainingRuns._draining = True
+            return TrainingRuns._condition.wait_for(lambda: not TrainingRuns._runs, timeout)
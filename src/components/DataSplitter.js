@@ -7,6 +7,7 @@ function DataSplitter() {
     // State hooks for controlling input values and displaying results or errors
     const [trainSize, setTrainSize] = useState(60); // Initial state for training data ratio
     const [validationSize, setValidationSize] = useState(20); // Initial state for validation data ratio
+    const [stratify, setStratify] = useState(false); // Whether to keep label proportions equal across splits
     const [dataSizes, setDataSizes] = useState(null); // To store response from API about dataset sizes
     const [error, setError] = useState(''); // For displaying error messages
 
@@ -28,7 +29,7 @@ function DataSplitter() {
         if (validateInput()) {
             try {
                 // Calls the API with user-defined ratios and updates the state with the response
-                const response = await splitData(parseFloat(trainSize) / 100, parseFloat(validationSize) / 100);
+                const response = await splitData(parseFloat(trainSize) / 100, parseFloat(validationSize) / 100, { stratify });
                 setDataSizes(response); // Updates state with dataset sizes
                 setError(''); // Clears any previous error messages
             } catch (err) {
@@ -84,6 +85,15 @@ function DataSplitter() {
                     onChange={(e) => setValidationSize(parseFloat(e.target.value))}
                 />
             </div>
+            <div>
+                <label htmlFor="stratify">Stratify by label column:</label>
+                <input
+                    id="stratify"
+                    type="checkbox"
+                    checked={stratify}
+                    onChange={(e) => setStratify(e.target.checked)}
+                />
+            </div>
             <button onClick={handleSplitData}>Split Data</button>
             {dataSizes && (
                 <table  className="summary-table">
@@ -14,13 +14,18 @@ function DataSummary({ dataUploaded }) {
             return;
         }
 
-        const fetchData = async () => {
+        let refreshTimer = null;
+        const fetchData = async (showLoading) => {
             // Fetch data summary asynchronously
-            setIsLoading(true);
+            setIsLoading(showLoading);
             setError('');
             try {
                 const data = await getSummaryData(); // API call to fetch summary data
                 setSummaryData(data); // Set fetched data to state
+                if (data.refreshing) {
+                    // Exact statistics are being computed on the server, fetch them again shortly
+                    refreshTimer = setTimeout(() => fetchData(false), 2000);
+                }
             } catch (error) {
                 console.error('Error fetching data summary:', error);
                 setError('Error fetching data summary'); // Handle errors
@@ -29,9 +34,13 @@ function DataSummary({ dataUploaded }) {
             }
         };
 
-        fetchData(); // Trigger data fetching
+        fetchData(true); // Trigger data fetching
+        return () => clearTimeout(refreshTimer); // Stop polling when the component unmounts or data changes
     }, [dataUploaded]); // Effect runs when `dataUploaded` changes
 
+    // Formats an estimated value with its error bound, e.g. "1200 ± 35"
+    const withBound = (value, bound) => (bound ? `${value} ± ${bound}` : value);
+
     const renderTableBody = () => {
         // Render table rows for each column summary in the data
         if (!summaryData || !summaryData.summary) return null; // Return null if no summary data
@@ -40,7 +49,7 @@ function DataSummary({ dataUploaded }) {
             <tr key={column}>
                 <td>{column}</td>
                 <td>{details.data_type}</td>
-                <td>{details.missing_values}</td>
+                <td>{withBound(details.missing_values, summaryData.error_bounds?.missing_values?.[column])}</td>
                 <td>{(details.percent_missing || 0).toFixed(2)}%</td>
             </tr>
         ));
@@ -75,8 +84,9 @@ function DataSummary({ dataUploaded }) {
                     {summaryData && (
                         <ul className="data-stats">
                             <li><strong>Number of Columns:</strong> {summaryData.columns.length}</li>
-                            <li><strong>Number of Rows:</strong> {summaryData.row_count}</li>
-                            <li><strong>Duplicate Rows:</strong> {summaryData.duplicate_count}</li>
+                            <li><strong>Number of Rows:</strong> {withBound(summaryData.row_count, summaryData.error_bounds?.row_count)}</li>
+                            <li><strong>Duplicate Rows:</strong> {withBound(summaryData.duplicate_count, summaryData.error_bounds?.duplicate_count)}</li>
+                            {summaryData.approximate && <li><em>Approximate values (95% bounds); exact statistics are being computed.</em></li>}
                         </ul>
                     )}
                 </>
@@ -2,6 +2,14 @@ import React, { useState, useRef } from 'react';
 import { uploadData } from './api'; // Function to call the API for uploading data
 import '../styles/App.css';
 
+// File types the backend ingests (ALLOWED_EXTENSIONS in server/app.py); non-CSV files are converted to CSV
+const ACCEPTED_EXTENSIONS = ['.csv', '.xlsx', '.xls', '.json', '.txt'];
+
+// Checks whether a file has one of the accepted extensions
+const isAccepted = (file) => ACCEPTED_EXTENSIONS.some(extension => file.name.toLowerCase().endsWith(extension));
+
+const UNSUPPORTED_MESSAGE = `Only ${ACCEPTED_EXTENSIONS.join(', ')} files are accepted`;
+
 function DataUpload({ setDataUploaded }) {
     const [file, setFile] = useState(null); // State to store the selected file
     const [uploading, setUploading] = useState(false); // State to indicate if the file is being uploaded
@@ -14,24 +22,24 @@ function DataUpload({ setDataUploaded }) {
         e.preventDefault(); // Prevent default browser behavior
         e.stopPropagation(); // Stop the event from propagating further
         const droppedFile = e.dataTransfer.files[0]; // Get the dropped file
-        if (droppedFile && droppedFile.name.endsWith('.csv')) {
-            // Check if the file is a CSV
+        if (droppedFile && isAccepted(droppedFile)) {
+            // Check if the file is of a supported type
             setFile(droppedFile); // Set the file state
             setMessage(`File selected: ${droppedFile.name}`); // Set the message state
         } else {
-            setMessage('Only CSV files are accepted'); // Inform the user about acceptable file type
+            setMessage(UNSUPPORTED_MESSAGE); // Inform the user about acceptable file types
         }
     };
 
     const handleFileChange = (e) => {
         // Handle file selection via the file input
         const selectedFile = e.target.files[0]; // Get the selected file
-        if (selectedFile && selectedFile.name.endsWith('.csv')) {
-            // Check if the file is a CSV
+        if (selectedFile && isAccepted(selectedFile)) {
+            // Check if the file is of a supported type
             setFile(selectedFile); // Set the file state
             setMessage(`File selected: ${selectedFile.name}`); // Set the message state
         } else {
-            setMessage('Only CSV files are accepted'); // Inform the user about acceptable file type
+            setMessage(UNSUPPORTED_MESSAGE); // Inform the user about acceptable file types
         }
     };
 
@@ -71,12 +79,12 @@ function DataUpload({ setDataUploaded }) {
                  onDrop={handleDrop} 
                  onDragOver={(e) => e.preventDefault()}
                  onClick={openFileDialog}>
-                <p>Drag and drop a CSV file here, or click to select a file</p>
+                <p>Drag and drop a CSV, Excel, JSON or text file here, or click to select a file</p>
                 <input type="file" data-testid="file-input"
                        ref={fileInputRef}
                        onChange={handleFileChange} 
                        style={{ display: 'none' }} 
-                       accept=".csv" />
+                       accept={ACCEPTED_EXTENSIONS.join(',')} />
             </div>
             {file && <p className="file-info">{message}</p>}
             {uploading && <progress value={progress} max="100">{progress}%</progress>}
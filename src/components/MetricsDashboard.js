@@ -7,14 +7,16 @@ const MetricsDashboard = ({ websocket }) => {
   useEffect(() => {
     // Function to handle incoming metric updates
     const handleUpdateMetrics = (data) => {
+      // Each message batches the epochs finished since the previous one; batch-only updates carry none
+      if (!data.epochs || data.epochs.length === 0) return;
       // Transform metrics to percentages and round to 2 decimal places
-      const newData = {
-        epoch: data.epoch, // Current epoch number
-        accuracy: (data.metrics.accuracy * 100).toFixed(2), // Accuracy in percentage
-        precision: (data.metrics.precision * 100).toFixed(2), // Precision in percentage
-        recall: (data.metrics.recall * 100).toFixed(2), // Recall in percentage
-      };
-      setMetricsData(currentData => [...currentData, newData]); // Update state with new data
+      const newData = data.epochs.map(({ epoch, metrics }) => ({
+        epoch, // Epoch number
+        accuracy: (metrics.accuracy * 100).toFixed(2), // Accuracy in percentage
+        precision: (metrics.precision * 100).toFixed(2), // Precision in percentage
+        recall: (metrics.recall * 100).toFixed(2), // Recall in percentage
+      }));
+      setMetricsData(currentData => [...currentData, ...newData]); // Append the whole batch in one render
     };
 
     if (websocket) {
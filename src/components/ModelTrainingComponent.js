@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { getModelConfig } from './api';
+import { getModelBenchmark, getModelConfig, getModelExportUrl } from './api';
 import TrainingProgressIndicator from './TrainingProgressIndicator';
 import MetricsDashboard from './MetricsDashboard';
 import ConfusionMatrix from './ConfusionMatrix';
@@ -8,14 +8,20 @@ import io from 'socket.io-client';
 
 const ModelTrainingComponent = () => {
     const [epochs, setEpochs] = useState(10);
+    const [workers, setWorkers] = useState(1); // Local processes for data-parallel training
     const [trainingStatus, setTrainingStatus] = useState({
         progress: 0,
         estimatedTime: '',
         metrics: {},
         isTraining: false,
         confusion_matrix: [],
-        testMetrics: {}
+        testMetrics: {},
+        runId: null,
+        resources: null,
+        exportFormats: []
     });
+    const [benchmark, setBenchmark] = useState(null);
+    const [isBenchmarking, setIsBenchmarking] = useState(false);
     
     const [socket, setSocket] = useState(null);
 
@@ -34,6 +40,9 @@ const ModelTrainingComponent = () => {
                     metrics: ['accuracy'],
                     loss: modelConfig.layers[modelConfig.layers.length - 1].settings.nodes < 3 ? 'binary_crossentropy' : 'categorical_crossentropy',
                     inputSize: modelConfig.input_size,
+                    progressInterval: 0.5, // Seconds between progress messages
+                    batchProgress: true, // Report progress within epochs
+                    workers,
                 };
                 socketInstance.emit('startTraining', trainingConfig);
             } catch (error) {
@@ -42,23 +51,28 @@ const ModelTrainingComponent = () => {
             }
         });
 
+        socketInstance.on('trainingStarted', (data) => {
+            setTrainingStatus(prevStatus => ({ ...prevStatus, runId: data.run_id }));
+        });
+
         socketInstance.on('trainingProgress', (data) => {
-            console.log("Emitted data:", data);
             setTrainingStatus(prevStatus => ({
                 ...prevStatus,
                 progress: data.progress,
                 estimatedTime: data.estimatedTime,
-                metrics: data.metrics,
+                metrics: data.metrics || prevStatus.metrics, // Batch-only updates carry no new metrics
             }));
         });
 
-        socketInstance.on('trainingComplete', () => {
-            setTrainingStatus({
+        socketInstance.on('trainingComplete', (data) => {
+            setTrainingStatus(prevStatus => ({
+                ...prevStatus,
                 progress: 100,
-                estimatedTime: '', 
-                metrics: trainingStatus.metrics,
+                estimatedTime: '',
                 isTraining: false,
-            });
+                resources: data.resources, // Threads used by the run and how busy they were
+                exportFormats: data.export_formats || [], // Formats the trained model can be downloaded in
+            }));
             socketInstance.close();
             setSocket(null); // Reset the socket state
         });
@@ -85,6 +99,17 @@ const ModelTrainingComponent = () => {
         
     };
 
+    const runBenchmark = async () => {
+        setIsBenchmarking(true);
+        try {
+            setBenchmark(await getModelBenchmark(trainingStatus.runId));
+        } catch (error) {
+            console.error('Failed to benchmark the model:', error);
+        } finally {
+            setIsBenchmarking(false);
+        }
+    };
+
     // Dynamically generate labels for the confusion matrix based on its size
     const confusionMatrixLabels = Array.from({ length: trainingStatus.confusion_matrix.length }, (_, i) => i);
 
@@ -98,6 +123,14 @@ const ModelTrainingComponent = () => {
                 value={epochs}
                 onChange={(e) => setEpochs(Number(e.target.value))}
             />
+            <label htmlFor="workers">Worker processes:</label>
+            <input
+                type="number"
+                id="workers"
+                min="1"
+                value={workers}
+                onChange={(e) => setWorkers(Math.max(1, Number(e.target.value)))}
+            />
             <button onClick={startTraining} disabled={trainingStatus.isTraining || !epochs}>
                 {trainingStatus.isTraining ? 'Training...' : 'Train Model'}
             </button>
@@ -107,6 +140,44 @@ const ModelTrainingComponent = () => {
                 <ConfusionMatrix matrix={trainingStatus.confusion_matrix} labels={confusionMatrixLabels} />
             )}
             {Object.keys(trainingStatus.testMetrics).length > 0 && <TestMetrics metrics={trainingStatus.testMetrics} />}
+            {trainingStatus.resources && (
+                <p>
+                    {trainingStatus.resources.workers
+                        ? `Trained with ${trainingStatus.resources.world_size} worker processes in ${trainingStatus.resources.wall_seconds.toFixed(1)}s`
+                        : `Trained with ${trainingStatus.resources.threads} thread(s) in ${trainingStatus.resources.wall_seconds.toFixed(1)}s, ${trainingStatus.resources.cpu_scope === 'server' ? 'about ' : ''}${(trainingStatus.resources.utilization * 100).toFixed(0)}% CPU utilization`}
+                </p>
+            )}
+            {trainingStatus.exportFormats.length > 0 && !trainingStatus.isTraining && (
+                <div className="model-export">
+                    {trainingStatus.exportFormats.map(format => (
+                        <a key={format} href={getModelExportUrl(trainingStatus.runId, format)} download>
+                            Download {format === 'onnx' ? 'ONNX' : 'TorchScript'} model
+                        </a>
+                    ))}
+                    <button onClick={runBenchmark} disabled={isBenchmarking}>
+                        {isBenchmarking ? 'Benchmarking...' : 'Benchmark inference'}
+                    </button>
+                </div>
+            )}
+            {benchmark && (
+                <table className="benchmark-table">
+                    <thead>
+                        <tr><th>Format</th><th>Batch size</th><th>Median (ms)</th><th>p95 (ms)</th><th>Rows/s</th></tr>
+                    </thead>
+                    <tbody>
+                        {benchmark.results.map(result => (
+                            <tr key={`${result.format}-${result.batch_size}`}
+                                className={benchmark.fastest[result.batch_size] === result.format ? 'fastest' : ''}>
+                                <td>{result.format}</td>
+                                <td>{result.batch_size}</td>
+                                <td>{result.median_ms.toFixed(3)}</td>
+                                <td>{result.p95_ms.toFixed(3)}</td>
+                                <td>{Math.round(result.rows_per_second)}</td>
+                            </tr>
+                        ))}
+                    </tbody>
+                </table>
+            )}
         </div>
     );
 };
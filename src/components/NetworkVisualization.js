@@ -1,7 +1,34 @@
-import React, { useEffect, useRef, useContext } from 'react';
+import React, { useEffect, useRef, useContext, useState } from 'react';
 import * as d3 from 'd3';
 import { ModelConfigContext } from './ModelConfigContext';
-import { fetchNetworkParameters } from './api';
+import { fetchNetworkParameters, getModelCost } from './api';
+
+// Milliseconds without edits before the cost of the configuration is estimated again
+const COST_DELAY = 500;
+
+// Milliseconds between two requests while the epoch time of the configuration is being calibrated
+const CALIBRATION_INTERVAL = 1000;
+
+// Formats a count with a thousands, millions or billions suffix
+const formatCount = (value) => {
+  const units = [[1e9, 'G'], [1e6, 'M'], [1e3, 'k']];
+  const [scale, suffix] = units.find(([scale]) => value >= scale) || [1, ''];
+  return `${(value / scale).toFixed(scale === 1 ? 0 : 1)}${suffix}`;
+};
+
+// Formats a number of bytes in KB, MB or GB
+const formatBytes = (bytes) => {
+  const units = [[1 << 30, 'GB'], [1 << 20, 'MB'], [1 << 10, 'KB']];
+  const [scale, suffix] = units.find(([scale]) => bytes >= scale) || [1, 'B'];
+  return `${(bytes / scale).toFixed(1)} ${suffix}`;
+};
+
+// Formats a duration in seconds, minutes or hours
+const formatDuration = (seconds) => {
+  if (seconds < 60) return `${seconds.toFixed(1)} s`;
+  if (seconds < 3600) return `${(seconds / 60).toFixed(1)} min`;
+  return `${(seconds / 3600).toFixed(1)} h`;
+};
 
 const NetworkVisualization = () => {
   // Access the model configuration from the ModelConfigContext
@@ -10,6 +37,9 @@ const NetworkVisualization = () => {
   const svgRef = useRef(null);
   // Stores fetched network parameters, specifically the number of label classes
   const networkParamsRef = useRef({ num_label_classes: null });
+  // Estimated cost of training the configured model, or the reason it could not be estimated
+  const [cost, setCost] = useState(null);
+  const [costError, setCostError] = useState(null);
 
   // Effect hook to fetch network parameters once and draw the network visualization
   useEffect(() => {
@@ -26,6 +56,25 @@ const NetworkVisualization = () => {
     drawNetwork(modelConfig);
   }, [modelConfig]);
 
+  // Effect hook to estimate the cost of the configuration once the user pauses editing it
+  useEffect(() => {
+    let cancelled = false;
+    let timer;
+    const estimate = () => {
+      getModelCost(modelConfig)
+        .then(result => {
+          if (cancelled) return;
+          setCost(result);
+          setCostError(null);
+          // The epoch time is calibrated in the background; ask again until it is known
+          if (result.calibrating) timer = setTimeout(estimate, CALIBRATION_INTERVAL);
+        })
+        .catch(error => { if (!cancelled) { setCost(null); setCostError(error.message); } });
+    };
+    timer = setTimeout(estimate, COST_DELAY);
+    return () => { cancelled = true; clearTimeout(timer); };
+  }, [modelConfig]);
+
   // Function to draw the neural network visualization based on the model configuration
   const drawNetwork = (config) => {
     const svg = d3.select(svgRef.current);
@@ -97,7 +146,25 @@ const NetworkVisualization = () => {
     }
   };
 
-  return <svg ref={svgRef} width="100%" height="600px" style={{ border: '1px solid black', overflow: 'hidden' }} />;
+  return (
+    <div>
+      <svg ref={svgRef} width="100%" height="600px" style={{ border: '1px solid black', overflow: 'hidden' }} />
+      {cost && (
+        <div className="model-cost">
+          <p>Parameters: {formatCount(cost.parameters)}</p>
+          <p>Operations per row: {formatCount(cost.forward_flops)} (forward), {formatCount(cost.training_flops)} (training)</p>
+          <p>Training memory: {formatBytes(cost.memory.total)} (weights {formatBytes(cost.memory.parameters)},
+            gradients and optimizer {formatBytes(cost.memory.gradients + cost.memory.optimizer)},
+            activations {formatBytes(cost.memory.activations)}, data {formatBytes(cost.memory.data)})</p>
+          {cost.calibrating
+            ? <p>Estimated epoch time: measuring...</p>
+            : <p>Estimated epoch time: {formatDuration(cost.epoch_seconds)} for {cost.train_rows} training rows
+                on {cost.calibration.threads} thread(s)</p>}
+        </div>
+      )}
+      {costError && <p className="model-cost-error">Could not estimate the model's cost: {costError}</p>}
+    </div>
+  );
 };
 
 export default NetworkVisualization;
@@ -3,6 +3,7 @@ import React, { useEffect, useState } from 'react';
 const TrainingProgressIndicator = ({ websocket }) => {
   const [progress, setProgress] = useState(0); // Track the training progress percentage
   const [statusMessage, setStatusMessage] = useState('Awaiting Training Start...'); // Initial status message
+  const [position, setPosition] = useState(''); // Epoch and batch of the latest update
 
   useEffect(() => {
     if (websocket) {
@@ -10,6 +11,7 @@ const TrainingProgressIndicator = ({ websocket }) => {
         const handleTrainingProgress = (data) => {
             setProgress(data.progress); // Update progress state with data from the server
             updateStatusMessage(data.progress); // Update status message based on progress
+            setPosition(data.batch ? `Epoch ${data.epoch}, batch ${data.batch}/${data.num_batches}` : `Epoch ${data.epoch}`);
         };
 
         // Register event listener for training progress
@@ -49,6 +51,7 @@ const TrainingProgressIndicator = ({ websocket }) => {
       <h3>Training Progress</h3>
       <progress value={progress} max="100" style={{ width: '100%', backgroundColor: '#eee', color: progressColor(progress) }}></progress>
       <p style={{ color: progressColor(progress) }}>{progress.toFixed(0)}% Complete - {statusMessage}</p>
+      {position && <p>{position}</p>}
     </div>
   );
 };
@@ -10,7 +10,14 @@ const handleResponse = async (response) => {
     return response.json();
 };
 
+// Milliseconds between two checks of an upload being converted
+const UPLOAD_STATUS_INTERVAL = 1000;
+
+// Milliseconds between two checks of a benchmark running in the background
+const BENCHMARK_STATUS_INTERVAL = 1000;
+
 // Uploads data by posting a file to the backend, reports progress if callback provided
+
 export const uploadData = async (file, onProgress) => {
     const formData = new FormData();
     formData.append('file', file);
@@ -25,7 +32,22 @@ export const uploadData = async (file, onProgress) => {
         },
     });
 
-    return handleResponse(response);
+    const result = await handleResponse(response);
+    if (response.status !== 202) {
+        return result;
+    }
+
+    // Non-CSV files are converted in the background; resolve once the conversion has finished
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, UPLOAD_STATUS_INTERVAL));
+        const status = await handleResponse(await fetch(`${API_BASE_URL}/upload-status?upload=${encodeURIComponent(result.upload)}`));
+        if (status.state === 'ready') {
+            return result;
+        }
+        if (status.state === 'failed') {
+            throw new Error(status.error);
+        }
+    }
 };
 
 // Fetches visualization data for a given column name
@@ -64,6 +86,17 @@ export const selectLabelColumn = async (columnName) => {
     return handleResponse(response);
 };
 
+// Fetches a page of rows, optionally projected to some columns and filtered ('column:operator:value')
+export const getRows = async ({ offset = 0, limit = 100, columns = [], filters = [], dataset = 'original' } = {}) => {
+    const params = new URLSearchParams({ offset, limit, dataset });
+    if (columns.length > 0) {
+        params.append('columns', columns.join(','));
+    }
+    filters.forEach(filter => params.append('filter', filter));
+    const response = await fetch(`${API_BASE_URL}/rows?${params.toString()}`);
+    return handleResponse(response);
+};
+
 // Retrieves summary data for uploaded dataset
 export const getSummaryData = async () => {
     const response = await fetch(`${API_BASE_URL}/data-summary`);
@@ -81,14 +114,15 @@ export const getComparisonSummaryData = async () => {
 };
 
 // Splits data into training, validation, and test sets based on provided ratios
-export const splitData = async (trainSize, validationSize) => {
+// Optional splitOptions: { stratify, groupColumn, kFolds, fold }
+export const splitData = async (trainSize, validationSize, splitOptions = {}) => {
     try {
         const response = await fetch(`${API_BASE_URL}/split-data`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ trainSize, validationSize })
+            body: JSON.stringify({ trainSize, validationSize, ...splitOptions })
         });
         return handleResponse(response);
     } catch (error) {
@@ -160,3 +194,35 @@ export const fetchNetworkParameters = async () => {
     return response.json();
 };
 
+
+// Builds the download URL of a trained model exported to 'torchscript' or 'onnx'
+export const getModelExportUrl = (runId, format) => `${API_BASE_URL}/runs/${runId}/export?format=${format}`;
+
+// Measures single-row and batched inference latency of a trained model in each export format
+export const getModelBenchmark = async (runId, batchSizes = [1, 256]) => {
+    await handleResponse(await fetch(`${API_BASE_URL}/runs/${runId}/benchmark?batchSizes=${batchSizes.join(',')}`, {
+        method: 'POST'
+    }));
+
+    // The benchmark runs in the background; resolve with its report once it has finished
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, BENCHMARK_STATUS_INTERVAL));
+        const status = await handleResponse(await fetch(`${API_BASE_URL}/runs/${runId}/benchmark`));
+        if (status.state === 'ready') {
+            return status.report;
+        }
+        if (status.state === 'failed') {
+            throw new Error(status.error);
+        }
+    }
+};
+
+// Estimates the parameters, operations, memory and epoch time of a model configuration before training
+export const getModelCost = async (config) => {
+    const response = await fetch(`${API_BASE_URL}/model-cost`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ config })
+    });
+    return handleResponse(response);
+};
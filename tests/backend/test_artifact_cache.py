@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from utils.artifact_cache import ArtifactCache
+
+class TestArtifactCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'artifact.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_concurrent_writers_never_mix_their_output(self):
+        barrier = threading.Barrier(4)
+
+        def write(file, value):
+            barrier.wait()
+            for _ in range(200):
+                file.write(value * 1000)
+
+        threads = [threading.Thread(target=ArtifactCache.write_atomically, args=(self.path, lambda file, value=value: write(file, value)))
+                   for value in [b'a', b'b', b'c', b'd']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with open(self.path, 'rb') as file:
+            content = file.read()
+        self.assertEqual(len(content), 200000)
+        self.assertEqual(len(set(content)), 1)
+        self.assertEqual(os.listdir(self.folder), ['artifact.bin'])
+
+    def test_failed_write_leaves_nothing_behind(self):
+        def fail(file):
+            file.write('partial')
+            raise RuntimeError('interrupted')
+
+        with self.assertRaises(RuntimeError):
+            ArtifactCache.write_atomically(self.path, fail, mode='w')
+        self.assertEqual(os.listdir(self.folder), [])
+
+if __name__ == '__main__':
+    unittest.main()
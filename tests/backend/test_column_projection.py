@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+import column_projection
+from column_projection import load_projection, materialize_projection, prepared_projection, save_projection
+from data_splitter import read_split_frames, split_dataset
+from utils.background_jobs import BackgroundJobs
+
+class TestColumnProjection(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = os.path.join(self.folder, 'cache')
+        self.source = os.path.join(self.folder, 'data.csv')
+        pd.DataFrame({'a': range(20), 'b': range(20), 'c': ['x'] * 20}).to_csv(self.source, index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_drop_and_re_add_columns(self):
+        self.assertEqual(load_projection(self.folder, self.source), ['a', 'b', 'c'])
+        self.assertEqual(save_projection(self.folder, self.source, ['b', 'missing']), ['a', 'c'])
+        self.assertEqual(load_projection(self.folder, self.source), ['a', 'c'])
+        save_projection(self.folder, self.source, [])
+        self.assertEqual(load_projection(self.folder, self.source), ['a', 'b', 'c'])
+
+    def test_projection_is_applied_when_reading(self):
+        columns = save_projection(self.folder, self.source, ['b'])
+        self.assertEqual(materialize_projection(self.source, ['a', 'b', 'c'], self.cache), self.source)
+        self.assertEqual(pd.read_csv(materialize_projection(self.source, columns, self.cache)).columns.tolist(), ['a', 'c'])
+
+        split_dataset(self.folder, self.source, 0.6, 0.2, self.cache, columns=columns)
+        for split_df in read_split_frames(self.folder):
+            self.assertEqual(split_df.columns.tolist(), ['a', 'c'])
+
+    def test_large_projections_are_written_in_the_background(self):
+        with mock.patch.object(column_projection, 'INLINE_PROJECTION_BYTES', 10), \
+             mock.patch.object(BackgroundJobs, 'submit', return_value=True) as submit:
+            self.assertEqual(prepared_projection(self.source, ['a', 'b', 'c'], self.cache), self.source)
+            self.assertIsNone(prepared_projection(self.source, ['a', 'c'], self.cache))
+            self.assertEqual(submit.call_args.args[1], materialize_projection)
+
+            # Once written, the cached projection is served
+            path = materialize_projection(self.source, ['a', 'c'], self.cache)
+            self.assertEqual(prepared_projection(self.source, ['a', 'c'], self.cache), path)
+            self.assertEqual(submit.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from data_processing import process_label_column, save_label_mapping
+
+class TestDataProcessing(unittest.TestCase):
+    def test_labels_are_stored_as_int_codes(self):
+        # Labels across all splits share one class-index mapping
+        y_train = pd.Series(['cat', 'dog', 'cat'])
+        y_val = pd.Series(['eel'])
+        y_test = pd.Series(['dog', 'eel'])
+        encoded_train, encoded_val, encoded_test, classes = process_label_column(y_train, y_val, y_test)
+
+        self.assertEqual(classes, ['cat', 'dog', 'eel'])
+        self.assertEqual(list(encoded_train.columns), ['label'])
+        self.assertEqual(str(encoded_train['label'].dtype), 'int32')
+        self.assertEqual(encoded_train['label'].tolist(), [0, 1, 0])
+        self.assertEqual(encoded_val['label'].tolist(), [2])
+        self.assertEqual(encoded_test['label'].tolist(), [1, 2])
+
+    def test_missing_labels_are_mapped_to_null(self):
+        encoded_train, _, _, classes = process_label_column(pd.Series(['cat', np.nan]), pd.Series(['cat']), pd.Series([np.nan]))
+        self.assertEqual(encoded_train['label'].tolist(), [0, 1])
+        folder = tempfile.mkdtemp()
+        try:
+            save_label_mapping(folder, 'y', classes)
+            with open(os.path.join(folder, 'label_mapping.json')) as file:
+                self.assertEqual(json.load(file), {'label_column': 'y', 'classes': ['cat', None]})
+        finally:
+            shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import data_profile
+from data_profile import DataProfile, build_profile, load_profile, profile_path, refresh_statistics, summarize
+from sketches import CountMinSketch, HyperLogLog, ReservoirSample
+
+class TestDataProfile(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = os.path.join(self.folder, 'cache')
+        self.path = os.path.join(self.folder, 'data.csv')
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame({'a': rng.integers(0, 30, 3000), 'b': rng.choice(['x', 'y', 'z'], 3000)})
+        self.df.loc[::10, 'b'] = None
+        self.df.to_csv(self.path, index=False)
+        data_profile._loaded_profiles.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_sketches_stay_within_their_bounds(self):
+        values = np.random.default_rng(1).integers(0, 50000, 100000)
+        hashes = pd.util.hash_array(values)
+        distinct = HyperLogLog()
+        distinct.update(hashes)
+        self.assertLess(abs(distinct.estimate() - len(np.unique(values))), distinct.error_bound())
+
+        frequencies = CountMinSketch()
+        frequencies.update(hashes)
+        unique_values, counts = np.unique(values, return_counts=True)
+        overcount = frequencies.estimate(pd.util.hash_array(unique_values)) - counts
+        self.assertGreaterEqual(overcount.min(), 0)
+        self.assertGreaterEqual(np.mean(overcount <= frequencies.error_bound()), 0.95)
+
+    def test_reservoir_sample_keeps_positions(self):
+        sample = ReservoirSample(50)
+        for start in range(0, 1000, 64):
+            sample.update(pd.DataFrame({'x': np.arange(start, min(start + 64, 1000))}))
+        rows, positions = sample.result()
+        self.assertEqual(len(rows), 50)
+        np.testing.assert_array_equal(rows['x'].to_numpy(), positions)
+
+    def test_profile_is_exact_for_counts(self):
+        profile = build_profile(self.path, chunk_size=700)
+        self.assertEqual(profile.num_rows, 3000)
+        self.assertEqual(profile.missing, {'a': 0, 'b': 300})
+        self.assertLess(abs(profile.distinct['a'].estimate() - 30), 2)
+        values, counts, error_bound = profile.value_counts('b')
+        expected = self.df['b'].value_counts()
+        for value, count in zip(values, counts):
+            self.assertTrue(0 <= count - expected[value] <= error_bound)
+
+    def test_saved_profile_is_plain_data(self):
+        profile = build_profile(self.path, chunk_size=700)
+        path = profile_path(self.path, self.cache)
+        profile.save(path)
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(1), b'{')
+
+        loaded = load_profile(self.path, self.cache)
+        self.assertIs(load_profile(self.path, self.cache), loaded)
+        self.assertEqual(loaded.summary(), profile.summary())
+        self.assertEqual(loaded.value_counts('b'), profile.value_counts('b'))
+        self.assertEqual(loaded.value_counts('a'), profile.value_counts('a'))
+        np.testing.assert_array_equal(loaded.sample_positions, profile.sample_positions)
+
+        empty_path = os.path.join(self.folder, 'empty.csv')
+        pd.DataFrame({'a': []}).to_csv(empty_path, index=False)
+        build_profile(empty_path).save(profile_path(empty_path, self.cache))
+        self.assertEqual(DataProfile.load(profile_path(empty_path, self.cache)).num_rows, 0)
+
+    def test_summarize_prefers_exact_statistics(self):
+        self.assertEqual(summarize(self.path, self.cache)['method'], 'head_sample')
+        refresh_statistics(self.path, self.cache, workers=2)
+        summary = summarize(self.path, self.cache)
+        self.assertEqual(summary['method'], 'exact')
+        self.assertEqual(summary['duplicate_count'], int(self.df.duplicated().sum()))
+        self.assertFalse(summary['approximate'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+import numpy as np
+from sklearn.model_selection import train_test_split
+from data_splitter import SPLIT_CODES, assign_splits
+
+class TestDataSplitter(unittest.TestCase):
+    def test_matches_two_step_train_test_split(self):
+        assignment, folds = assign_splits(100, 0.6, 0.2)
+        train_idx, test_idx = train_test_split(np.arange(100), test_size=0.2, random_state=42)
+        train_idx, val_idx = train_test_split(train_idx, test_size=0.25, random_state=42)
+        self.assertIsNone(folds)
+        np.testing.assert_array_equal(np.flatnonzero(assignment == SPLIT_CODES['val']), np.sort(val_idx))
+        np.testing.assert_array_equal(np.flatnonzero(assignment == SPLIT_CODES['test']), np.sort(test_idx))
+
+    def test_stratified_and_grouped_splits(self):
+        labels = np.repeat([0, 1], [80, 20])
+        assignment, _ = assign_splits(100, 0.6, 0.2, stratify=labels)
+        self.assertEqual(int(labels[assignment == SPLIT_CODES['test']].sum()), 4)
+
+        groups = np.repeat(np.arange(25), 4)
+        assignment, _ = assign_splits(100, 0.6, 0.2, groups=groups)
+        for group in range(25):
+            self.assertEqual(len(set(assignment[groups == group])), 1)
+
+    def test_k_fold_generation(self):
+        assignment, folds = assign_splits(100, 0.6, 0.2, k_folds=4, fold=2)
+        self.assertEqual(sorted(set(folds[assignment != SPLIT_CODES['test']])), [0, 1, 2, 3])
+        np.testing.assert_array_equal(assignment == SPLIT_CODES['val'], folds == 2)
+
+    def test_invalid_options_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, 'stratified and grouped'):
+            assign_splits(100, 0.6, 0.2, stratify=np.zeros(100), groups=np.arange(100))
+        for k_folds in [1, 128]:
+            with self.assertRaisesRegex(ValueError, 'number of folds'):
+                assign_splits(1000, 0.6, 0.2, k_folds=k_folds)
+        with self.assertRaisesRegex(ValueError, 'Fold must be'):
+            assign_splits(100, 0.6, 0.2, k_folds=4, fold=4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+from distributed_training import train_distributed
+from progress_channel import ProgressChannel
+from training import compile_model, evaluate_model
+
+class RecordingSocket:
+    def __init__(self):
+        self.messages = []
+
+    def emit(self, event, data, to=None):
+        self.messages.append((event, data, to))
+
+class TestDistributedTraining(unittest.TestCase):
+    def test_two_workers_train_and_report_from_rank_zero(self):
+        generator = torch.Generator().manual_seed(0)
+        X = torch.randn(120, 4, generator=generator)
+        y = (X[:, 0] > 0).long()
+        tensors = (X[:80], y[:80], X[80:100], y[80:100], X[100:], y[100:])
+        model_config = {'input_size': 4, 'layers': [{'type': 'dense', 'settings': {'nodes': 8, 'activation': 'relu'}},
+                                                    {'type': 'dense', 'settings': {'nodes': 2, 'activation': 'softmax'}}]}
+        socket = RecordingSocket()
+        progress = ProgressChannel(socket, 'run', 3, interval=0)
+
+        model, _ = compile_model(model_config)
+        usage = train_distributed(progress, model_config, torch.nn.CrossEntropyLoss(), 3, tensors, num_workers=2, model=model)
+
+        self.assertEqual(usage['world_size'], 2)
+        self.assertEqual(len(usage['workers']), 2)
+        events = [event for event, _, room in socket.messages if room == 'run']
+        self.assertEqual(events[-1], 'testMetrics')
+        epochs = [record['epoch'] for event, data, _ in socket.messages if event == 'trainingProgress' for record in data['epochs']]
+        self.assertEqual(epochs, [1, 2, 3])
+        # Each worker trains on half of the 80 training rows
+        batches = {data['num_batches'] for event, data, _ in socket.messages if event == 'trainingProgress' and data['batch']}
+        self.assertEqual(batches, {4})
+        test_metrics = socket.messages[-1][1]
+        self.assertEqual(sum(map(sum, test_metrics['confusion_matrix'])), 20)
+        # The local model received rank 0's trained weights
+        model.eval()
+        local_metrics = evaluate_model(model, DataLoader(TensorDataset(X[100:], y[100:]), batch_size=32), torch.nn.CrossEntropyLoss(), True)
+        self.assertEqual(local_metrics['confusion_matrix'], test_metrics['confusion_matrix'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import gzip
+import hashlib
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+import pandas as pd
+from werkzeug.datastructures import Accept
+import downloads
+from downloads import (choose_encoding, content_hash, export_processed_splits, get_compressed_variant,
+                       prepared_compressed_variant, prepared_content_hash)
+from utils.background_jobs import BackgroundJobs
+
+class TestDownloads(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = os.path.join(self.folder, 'cache')
+        self.path = os.path.join(self.folder, 'data.csv')
+        pd.DataFrame({'a': range(100), 'b': ['x', 'y'] * 50}).to_csv(self.path, index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_content_hash_and_gzip_variant(self):
+        with open(self.path, 'rb') as file:
+            raw = file.read()
+        self.assertEqual(content_hash(self.path, self.cache), hashlib.sha256(raw).hexdigest())
+        with open(get_compressed_variant(self.path, 'gzip', self.cache), 'rb') as file:
+            self.assertEqual(gzip.decompress(file.read()), raw)
+
+    def test_large_files_are_prepared_in_the_background(self):
+        with mock.patch.object(downloads, 'INLINE_PREPARE_BYTES', 10), \
+             mock.patch.object(BackgroundJobs, 'submit', return_value=True) as submit:
+            self.assertIsNone(prepared_content_hash(self.path, self.cache))
+            self.assertIsNone(prepared_compressed_variant(self.path, 'gzip', self.cache))
+            self.assertEqual([call.args[1] for call in submit.call_args_list], [content_hash, get_compressed_variant])
+
+            # Once prepared, the cached artifacts are served
+            content_hash(self.path, self.cache)
+            get_compressed_variant(self.path, 'gzip', self.cache)
+            self.assertIsNotNone(prepared_content_hash(self.path, self.cache))
+            self.assertIsNotNone(prepared_compressed_variant(self.path, 'gzip', self.cache))
+            self.assertEqual(submit.call_count, 2)
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding(Accept([('gzip', 1)])), 'gzip')
+        self.assertIsNone(choose_encoding(Accept([])))
+        self.assertIsNone(choose_encoding(Accept([('gzip', 1)]), 'identity'))
+        with self.assertRaises(ValueError):
+            choose_encoding(Accept([]), 'br')
+
+    def test_export_processed_splits(self):
+        for split in ['train', 'val', 'test']:
+            pd.DataFrame({'a': [1.0, 2.0]}).to_csv(os.path.join(self.folder, f'processed_{split}.csv'), index=False)
+            pd.DataFrame({'label': [0, 1]}).to_csv(os.path.join(self.folder, f'processed_y_{split}.csv'), index=False)
+
+        with zipfile.ZipFile(export_processed_splits(self.folder, 'jsonl', self.cache)) as archive:
+            self.assertEqual(archive.namelist(), ['train.jsonl', 'val.jsonl', 'test.jsonl'])
+            exported = pd.read_json(archive.open('val.jsonl'), lines=True)
+        self.assertEqual(exported.to_dict('list'), {'a': [1.0, 2.0], 'label': [0, 1]})
+        with self.assertRaises(ValueError):
+            export_processed_splits(self.folder, 'xml', self.cache)
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is required to write parquet files')
+    def test_parquet_export_keeps_one_schema_across_chunks(self):
+        for split in ['train', 'val', 'test']:
+            with open(os.path.join(self.folder, f'processed_{split}.csv'), 'w') as file:
+                file.write('a\n1\n2\n1.5\n\n')
+            pd.DataFrame({'label': [0, 1, 0, 1]}).to_csv(os.path.join(self.folder, f'processed_y_{split}.csv'), index=False)
+
+        with mock.patch.object(downloads, 'EXPORT_CHUNK_SIZE', 2):
+            path = export_processed_splits(self.folder, 'parquet', self.cache)
+        with zipfile.ZipFile(path) as archive:
+            exported = pd.read_parquet(archive.open('train.parquet'))
+        self.assertEqual(exported['a'].tolist()[:3], [1.0, 2.0, 1.5])
+        self.assertTrue(pd.isna(exported['a'].iloc[3]))
+        self.assertEqual(exported['label'].tolist(), [0, 1, 0, 1])
+
+if __name__ == '__main__':
+    unittest.main()
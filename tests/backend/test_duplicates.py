@@ -0,0 +1,34 @@
+import unittest
+import numpy as np
+import pandas as pd
+from duplicates import DuplicateIndex, build_duplicate_index, verify_collisions
+
+class TestDuplicates(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'a': rng.integers(0, 3, 200), 'b': rng.choice(['x', 'y'], 200), 'c': rng.integers(0, 2, 200)})
+        df.loc[::10, 'a'] = np.nan
+        self.df = df
+
+    def test_matches_pandas_duplicated(self):
+        index = DuplicateIndex.from_frame(self.df)
+        np.testing.assert_array_equal(index.duplicated(), self.df.duplicated().values)
+        self.assertEqual(index.duplicate_count, int(self.df.duplicated().sum()))
+
+    def test_chunked_and_multiprocess_hashing_agree(self):
+        chunks = lambda: (self.df.iloc[start:start + 30] for start in range(0, len(self.df), 30))
+        single = build_duplicate_index(chunks)
+        parallel = build_duplicate_index(chunks, workers=2)
+        np.testing.assert_array_equal(single.keys, parallel.keys)
+        np.testing.assert_array_equal(single.duplicated(), self.df.duplicated().values)
+
+    def test_hash_collisions_are_verified(self):
+        # Pretend two different rows hashed to the same value
+        df = pd.DataFrame({'a': [1, 2, 1]})
+        hashes = np.array([7, 7, 7], dtype=np.uint64)
+        keys = hashes.copy()
+        verify_collisions(iter([df]), hashes, np.array([7], dtype=np.uint64), keys)
+        np.testing.assert_array_equal(DuplicateIndex(keys).duplicated(), [False, False, True])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+import ingestion
+from ingestion import get_status, ingest_in_background, ingest_upload
+from utils.background_jobs import BackgroundJobs
+
+class TestIngestion(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.df = pd.DataFrame({'a': [1, 2, 3], 'b': ['x', 'y', 'z']})
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_json_lines_and_text_are_converted_to_csv(self):
+        json_path = os.path.join(self.folder, 'data.json')
+        self.df.to_json(json_path, orient='records', lines=True)
+        text_path = os.path.join(self.folder, 'table.txt')
+        self.df.to_csv(text_path, sep='\t', index=False)
+
+        for path in [json_path, text_path]:
+            canonical_path = ingest_upload(path)
+            self.assertTrue(canonical_path.endswith('.csv'))
+            pd.testing.assert_frame_equal(pd.read_csv(canonical_path), self.df)
+
+    def test_json_lines_keep_keys_first_seen_in_later_chunks(self):
+        path = os.path.join(self.folder, 'late.json')
+        with open(path, 'w') as file:
+            file.write('{"a": 1}\n{"a": 2}\n{"a": 3, "c": "new"}\n')
+        with mock.patch.object(ingestion, 'CHUNK_SIZE', 2):
+            converted = pd.read_csv(ingest_upload(path))
+        self.assertEqual(list(converted.columns), ['a', 'c'])
+        self.assertEqual(converted['c'].tolist()[2], 'new')
+
+    def test_background_conversion_reports_its_status(self):
+        for name, content, state in [('good.json', '{"a": 1}\n{"a": 2}\n', 'ready'), ('bad.json', '{"a": 1}\n{"a"\n', 'failed')]:
+            path = os.path.join(self.folder, name)
+            with open(path, 'w') as file:
+                file.write(content)
+            ready = []
+            ingest_in_background(path, ready.append)
+            BackgroundJobs.wait(f'ingestion_{name}', timeout=30)
+            self.assertEqual(get_status(path)['state'], state)
+            self.assertEqual(ready, [path[:-5] + '.csv'] if state == 'ready' else [])
+        self.assertEqual(sorted(f for f in os.listdir(self.folder) if f.endswith('.csv')), ['good.csv'])
+
+    @unittest.skipUnless(importlib.util.find_spec('openpyxl'), 'openpyxl is required to write xlsx files')
+    def test_multi_sheet_workbook_is_stacked(self):
+        path = os.path.join(self.folder, 'book.xlsx')
+        with pd.ExcelWriter(path) as writer:
+            self.df.to_excel(writer, sheet_name='first', index=False)
+            self.df.to_excel(writer, sheet_name='second', index=False)
+
+        converted = pd.read_csv(ingest_upload(path))
+        pd.testing.assert_frame_equal(converted, pd.concat([self.df, self.df], ignore_index=True))
+
+if __name__ == '__main__':
+    unittest.main()
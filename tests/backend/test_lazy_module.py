@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+import unittest
+from utils.lazy_module import LazyModule
+
+SERVER_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'server'))
+
+class TestLazyModule(unittest.TestCase):
+    def test_module_loads_on_first_attribute(self):
+        module = LazyModule('json')
+        self.assertIn('not loaded', repr(module))
+        self.assertEqual(module.dumps([1]), '[1]')
+        self.assertIn('loaded', repr(module))
+        self.assertIs(module.load(), sys.modules['json'])
+
+    def test_importing_app_skips_heavy_libraries(self):
+        probe = ("import sys, app; "
+                 "print('loaded:' + ','.join(m for m in ['torch', 'pandas', 'sklearn'] if m in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', probe], cwd=SERVER_FOLDER,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip().splitlines()[-1], 'loaded:')
+
+if __name__ == '__main__':
+    unittest.main()
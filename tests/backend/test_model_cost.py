@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+import model_cost
+import training
+from data_splitter import split_dataset
+from model_cost import complete_config, estimate_cost, split_rows
+from training import compile_model
+from utils.background_jobs import BackgroundJobs
+
+class TestModelCost(unittest.TestCase):
+    def setUp(self):
+        self.config = {'layers': [{'type': 'dense', 'settings': {'nodes': 16, 'activation': 'relu'}},
+                                  {'type': 'dropout', 'settings': {'rate': 0.5}},
+                                  {'type': 'dense', 'settings': {'nodes': 8, 'activation': 'relu'}}]}
+        self.network_parameters = {'num_cols': 5, 'num_label_classes': 2}
+        model_cost._calibrations.clear()
+
+    def test_sizes_match_the_built_model(self):
+        full_config = complete_config(self.config, self.network_parameters)
+        self.assertEqual(full_config['layers'][-1]['settings'], {'nodes': 1, 'activation': 'sigmoid'})
+        self.assertEqual(complete_config(full_config, self.network_parameters), full_config)
+
+        with mock.patch.object(model_cost, 'CALIBRATION_SECONDS', 0.01):
+            cost = estimate_cost(self.config, self.network_parameters, (95, 20, 20), {})
+        model = compile_model(full_config)[0]
+        self.assertEqual(cost['parameters'], sum(parameter.numel() for parameter in model.parameters()))
+        self.assertEqual(cost['forward_flops'], (11 * 16 + 16) + 16 + (33 * 8 + 8) + (17 * 1 + 1))
+        self.assertEqual(cost['memory']['optimizer'], cost['parameters'] * 4)
+        self.assertEqual(cost['memory']['data'], 135 * 5 * 4)
+        self.assertEqual(cost['batches_per_epoch'], 10)
+        self.assertEqual(cost['calibration']['method'], 'full')
+        self.assertGreater(cost['epoch_seconds'], 0)
+
+        with self.assertRaises(ValueError):
+            estimate_cost({'layers': [{'type': 'dense', 'settings': {'nodes': 0, 'activation': 'relu'}}]},
+                          self.network_parameters, (95, 20, 20), {})
+
+    def test_large_models_are_calibrated_on_narrower_copies(self):
+        config = {'layers': [{'type': 'dense', 'settings': {'nodes': 4000, 'activation': 'relu'}},
+                             {'type': 'dense', 'settings': {'nodes': 4000, 'activation': 'relu'}}]}
+        with mock.patch.object(model_cost, 'MAX_CALIBRATION_PARAMETERS', 10000), \
+             mock.patch.object(model_cost, 'CALIBRATION_SECONDS', 0.01), \
+             mock.patch.object(model_cost, 'time_batches', wraps=model_cost.time_batches) as time_batches:
+            cost = estimate_cost(config, {'num_cols': 100, 'num_label_classes': 3}, (1000, 0, 0), {})
+        self.assertEqual(cost['parameters'], 101 * 4000 + 4001 * 4000 + 4001 * 3)
+        self.assertEqual(cost['calibration']['method'], 'scaled')
+        timed_widths = [call.args[0]['layers'][0]['settings']['nodes'] for call in time_batches.call_args_list]
+        self.assertEqual(timed_widths[0], 1)
+        self.assertLess(max(timed_widths), 100)
+        self.assertGreater(cost['calibration']['train_seconds_per_batch'], 0)
+        self.assertGreater(cost['calibration']['eval_seconds_per_batch'], 0)
+
+    def test_wide_inputs_are_calibrated_on_narrower_batches(self):
+        config = {'layers': [{'type': 'dense', 'settings': {'nodes': 2, 'activation': 'relu'}}]}
+        with mock.patch.object(model_cost, 'CALIBRATION_SECONDS', 0.01), \
+             mock.patch.object(model_cost, 'time_batches', wraps=model_cost.time_batches) as time_batches:
+            cost = estimate_cost(config, {'num_cols': 200000, 'num_label_classes': 2}, (100, 0, 0), {})
+        self.assertEqual(cost['calibration']['method'], 'scaled')
+        timed_inputs = [call.args[0]['input_size'] for call in time_batches.call_args_list]
+        self.assertLessEqual(max(timed_inputs) * training.TRAIN_BATCH_SIZE * model_cost.FLOAT_BYTES, model_cost.MAX_CALIBRATION_BATCH_BYTES)
+
+    def test_requests_calibrate_in_the_background(self):
+        with mock.patch.object(model_cost, 'CALIBRATION_SECONDS', 0.01):
+            pending = estimate_cost(self.config, self.network_parameters, (95, 20, 20), {}, background=True)
+            self.assertTrue(pending['calibrating'])
+            self.assertIsNone(pending['epoch_seconds'])
+            self.assertEqual(pending['parameters'], estimate_cost(self.config, self.network_parameters, (95, 20, 20), {})['parameters'])
+            BackgroundJobs.wait(model_cost.calibrate_in_background(complete_config(self.config, self.network_parameters), 0, {}), timeout=30)
+            ready = estimate_cost(self.config, self.network_parameters, (95, 20, 20), {}, background=True)
+        self.assertFalse(ready['calibrating'])
+        self.assertGreater(ready['epoch_seconds'], 0)
+
+    def test_calibrations_are_bounded(self):
+        with mock.patch.object(model_cost, 'MAX_CALIBRATIONS', 2), \
+             mock.patch.object(model_cost, 'time_batches', return_value=(0.002, 0.001, 1)):
+            for nodes in [1, 2, 3]:
+                estimate_cost({'layers': [{'type': 'dense', 'settings': {'nodes': nodes, 'activation': 'relu'}}]},
+                              self.network_parameters, (95, 20, 20), {})
+        self.assertEqual(len(model_cost._calibrations), 2)
+
+    def test_rows_come_from_the_split(self):
+        folder = tempfile.mkdtemp()
+        try:
+            with self.assertRaises(FileNotFoundError):
+                split_rows(folder)
+            source = os.path.join(folder, 'data.csv')
+            pd.DataFrame({'a': np.arange(50), 'y': np.arange(50) % 2}).to_csv(source, index=False)
+            split_dataset(folder, source, 0.6, 0.2, os.path.join(folder, 'cache'))
+            self.assertEqual(split_rows(folder), (30, 10, 10))
+        finally:
+            shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import torch
+import model_export
+from data_processing import process_data
+from data_splitter import read_split_frames, split_dataset
+from label_column_selector import select_label_column
+from model_export import (benchmark_in_background, benchmark_model, benchmark_options, export_model, get_benchmark_status,
+                          load_preprocessing, load_trained_model, preprocess_rows, save_trained_model)
+from utils.background_jobs import BackgroundJobs
+from streaming_processing import process_data_streaming
+from training import compile_model
+
+class TestModelExport(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'a': rng.normal(size=80), 'b': rng.integers(0, 4, 80),
+                           'c': rng.choice(['x', 'y', 'z'], 80), 'y': rng.choice(['p', 'q'], 80)})
+        df.loc[::7, 'a'] = np.nan
+        df.loc[::9, 'c'] = np.nan
+        self.source = os.path.join(self.folder, 'data.csv')
+        df.to_csv(self.source, index=False)
+        split_dataset(self.folder, self.source, 0.6, 0.2, os.path.join(self.folder, 'cache'))
+        select_label_column(self.folder, self.source, 'y', None, os.path.join(self.folder, 'cache'))
+        self.options = {'handleMissingValues': True, 'encodeCategorical': True, 'featureScaling': 'standardization'}
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def load_preprocessing(self):
+        with open(os.path.join(self.folder, 'preprocessing.json')) as file:
+            return json.load(file)
+
+    def test_preprocessing_reproduces_processed_rows(self):
+        for process in [lambda: process_data(self.folder, self.options),
+                        lambda: process_data_streaming(self.folder, self.options, os.path.join(self.folder, 'cache'), chunk_size=13)]:
+            process()
+            raw_train = read_split_frames(self.folder)[0]
+            expected = pd.read_csv(os.path.join(self.folder, 'processed_train.csv')).to_numpy()
+            np.testing.assert_allclose(preprocess_rows(raw_train, self.load_preprocessing()), expected, rtol=1e-5, atol=1e-5)
+
+    def save_run(self):
+        process_data(self.folder, self.options)
+        model_config = {'input_size': 3, 'layers': [{'type': 'dense', 'settings': {'nodes': 4, 'activation': 'relu'}},
+                                                    {'type': 'dropout', 'settings': {'rate': 0.5}},
+                                                    {'type': 'dense', 'settings': {'nodes': 2, 'activation': 'softmax'}}]}
+        model, _ = compile_model(model_config)
+        save_trained_model(self.folder, 'run', model, model_config, load_preprocessing(self.folder))
+
+    def test_exports_match_eager_model_and_bundle_preprocessing(self):
+        self.save_run()
+
+        eager, metadata = load_trained_model(self.folder, 'run')
+        self.assertEqual(metadata['preprocessing'], self.load_preprocessing())
+        extra_files = {model_export.METADATA_KEY: ''}
+        traced = torch.jit.load(export_model(self.folder, 'run', 'torchscript'), _extra_files=extra_files)
+        self.assertEqual(json.loads(extra_files[model_export.METADATA_KEY]), metadata)
+        inputs = torch.randn(5, 3)
+        with torch.no_grad():
+            torch.testing.assert_close(traced(inputs), eager(inputs))
+
+        report = benchmark_model(self.folder, 'run', batch_sizes=[1, 32], runs=5)
+        formats = {result['format'] for result in report['results']}
+        self.assertTrue({'eager', 'torchscript'} <= formats)
+        self.assertEqual(set(report['fastest']), {'1', '32'})
+        for result in report['results']:
+            self.assertLess(result['max_abs_difference'], 1e-5)
+        if model_export.onnx is None:
+            self.assertIn('onnx', report['skipped'])
+            with self.assertRaises(ValueError):
+                export_model(self.folder, 'run', 'onnx')
+
+    @unittest.skipUnless(model_export.onnx is not None, 'The onnx package is not installed')
+    def test_onnx_export_bundles_preprocessing(self):
+        self.save_run()
+        path = export_model(self.folder, 'run', 'onnx')
+        proto = model_export.onnx.load(path)
+        properties = {prop.key: prop.value for prop in proto.metadata_props}
+        self.assertEqual(json.loads(properties[model_export.METADATA_KEY]), load_trained_model(self.folder, 'run')[1])
+        self.assertEqual([name for name in os.listdir(self.folder) if name.endswith('.tmp')], [])
+        if model_export.onnxruntime is not None:
+            eager = load_trained_model(self.folder, 'run')[0]
+            session = model_export.onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+            inputs = np.random.default_rng(0).standard_normal((4, 3)).astype(np.float32)
+            with torch.no_grad():
+                np.testing.assert_allclose(session.run(None, {'features': inputs})[0], eager(torch.from_numpy(inputs)).numpy(), atol=1e-5)
+
+    def test_benchmark_runs_in_the_background_with_limited_options(self):
+        self.assertEqual(benchmark_options([0, 10 ** 9, 8, 8, 2, 3, 4], 10 ** 6), ([1, 2, 3, 4], model_export.MAX_BENCHMARK_RUNS))
+        self.assertEqual(benchmark_options(None, 0), (model_export.BENCHMARK_BATCH_SIZES, 1))
+        with self.assertRaises(FileNotFoundError):
+            benchmark_in_background(self.folder, 'unknown')
+
+        self.save_run()
+        self.assertIsNone(get_benchmark_status(self.folder, 'run'))
+        self.assertTrue(benchmark_in_background(self.folder, 'run', [1, 16], 3))
+        BackgroundJobs.wait('benchmark_run', timeout=60)
+        status = get_benchmark_status(self.folder, 'run')
+        self.assertEqual(status['state'], 'ready')
+        self.assertEqual(set(status['report']['fastest']), {'1', '16'})
+
+    def test_model_keeps_the_preprocessing_it_was_trained_with(self):
+        self.save_run()
+        trained_with = load_preprocessing(self.folder)
+        process_data(self.folder, dict(self.options, featureScaling='normalization'))
+        self.assertNotEqual(load_preprocessing(self.folder), trained_with)
+        self.assertEqual(load_trained_model(self.folder, 'run')[1]['preprocessing'], trained_with)
+
+    def test_missing_run(self):
+        with self.assertRaises(FileNotFoundError):
+            export_model(self.folder, 'unknown', 'torchscript')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+import data_processing
+import pipeline_plan
+from data_processing import process_data
+from data_splitter import split_dataset
+from pipeline_plan import EXECUTION_LOCK_FILE, execute_plan, preview_plan, save_plan
+
+class TestPipelinePlan(unittest.TestCase):
+    def setUp(self):
+        # Two identical wizard states: one processed eagerly, one through the recorded plan
+        self.folders = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'a': rng.normal(size=90), 'c': rng.choice(['x', 'y'], 90), 'y': rng.choice(['p', 'q', None], 90)})
+        df.loc[::8, 'a'] = np.nan
+        for folder in self.folders:
+            source = os.path.join(folder, 'data.csv')
+            df.to_csv(source, index=False)
+            split_dataset(folder, source, 0.6, 0.2, os.path.join(folder, 'cache'))
+            with open(os.path.join(folder, 'data_selected_columns.json'), 'w') as file:
+                json.dump({'label_column': 'y'}, file)
+            with open(os.path.join(folder, 'column_data_types.json'), 'w') as file:
+                json.dump({col: str(df[col].dtype) for col in df.columns}, file)
+        self.options = {'removeDuplicates': True, 'handleMissingValues': False,
+                        'encodeCategorical': True, 'featureScaling': 'normalization'}
+
+    def tearDown(self):
+        for folder in self.folders:
+            shutil.rmtree(folder)
+
+    def read_network_parameters(self, folder):
+        with open(os.path.join(folder, 'network_parameters.json')) as file:
+            return json.load(file)
+
+    def test_plan_is_executed_once_and_matches_eager_processing(self):
+        eager, planned = self.folders
+        process_data(eager, self.options)
+        save_plan(planned, self.options, os.path.join(planned, 'cache'))
+
+        # The network parameters are known before anything is processed, missing labels included
+        self.assertFalse(os.path.exists(os.path.join(planned, 'processed_train.csv')))
+        self.assertEqual(self.read_network_parameters(planned), self.read_network_parameters(eager))
+
+        self.assertTrue(execute_plan(planned))
+        self.assertFalse(execute_plan(planned))
+        for name in ['processed_train', 'processed_test', 'processed_y_val']:
+            pd.testing.assert_frame_equal(pd.read_csv(os.path.join(planned, f'{name}.csv')), pd.read_csv(os.path.join(eager, f'{name}.csv')))
+
+    @unittest.skipUnless(pipeline_plan.fcntl is not None, 'File locks require fcntl')
+    def test_execution_waits_for_the_lock_held_by_another_process(self):
+        planned = self.folders[1]
+        save_plan(planned, self.options, os.path.join(planned, 'cache'))
+        # A lock taken through another open file stands in for another worker process executing the plan
+        with open(os.path.join(planned, EXECUTION_LOCK_FILE), 'a') as lock_file:
+            pipeline_plan.fcntl.flock(lock_file, pipeline_plan.fcntl.LOCK_EX)
+            execution = threading.Thread(target=execute_plan, args=(planned,))
+            execution.start()
+            time.sleep(0.3)
+            self.assertFalse(os.path.exists(os.path.join(planned, 'processed_train.csv')))
+            pipeline_plan.fcntl.flock(lock_file, pipeline_plan.fcntl.LOCK_UN)
+        execution.join()
+        self.assertTrue(os.path.exists(os.path.join(planned, 'processed_train.csv')))
+        self.assertFalse([name for name in os.listdir(planned) if name.endswith('.tmp')])
+
+    def test_preview_evaluates_a_sample(self):
+        planned = self.folders[1]
+        save_plan(planned, self.options, os.path.join(planned, 'cache'))
+        preview = preview_plan(planned, num_rows=30)
+        self.assertEqual(preview.columns.tolist(), ['a', 'c', 'label', 'split'])
+        self.assertEqual(sorted(preview['split'].unique()), ['test', 'train', 'val'])
+        self.assertLessEqual(len(preview), 30)
+        self.assertFalse(os.path.exists(os.path.join(planned, 'processed_train.csv')))
+
+    def test_preview_during_processing_keeps_the_fitted_imputation(self):
+        eager, planned = self.folders
+        options = dict(self.options, handleMissingValues=True)
+        process_data(eager, options)
+        save_plan(planned, options, os.path.join(planned, 'cache'))
+
+        # A preview fitted on its sample runs between the training split being imputed and the validation split
+        as_object_frame = data_processing.as_object_frame
+        calls = []
+        def as_object_frame_with_preview(df):
+            calls.append(len(df))
+            if len(calls) == 2:
+                previews.append(preview_plan(planned, num_rows=6))
+            return as_object_frame(df)
+        previews = []
+        with mock.patch.object(data_processing, 'as_object_frame', side_effect=as_object_frame_with_preview):
+            process_data(planned, options)
+        self.assertEqual(len(previews), 1)
+        with open(os.path.join(eager, 'preprocessing.json')) as expected, open(os.path.join(planned, 'preprocessing.json')) as actual:
+            self.assertEqual(json.load(actual)['imputation'], json.load(expected)['imputation'])
+        for name in ['processed_val', 'processed_test']:
+            pd.testing.assert_frame_equal(pd.read_csv(os.path.join(planned, f'{name}.csv')), pd.read_csv(os.path.join(eager, f'{name}.csv')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from before_after import calculate_metrics, data_comparison, read_csv_files
+from data_processing import process_data
+from data_splitter import split_dataset
+from processing_metrics import load_processed_metrics
+from streaming_processing import process_data_streaming
+
+class TestProcessingMetrics(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = os.path.join(self.folder, 'cache')
+        rng = np.random.default_rng(1)
+        df = pd.DataFrame({'a': rng.normal(size=80), 'c': rng.choice(['x', 'y'], 80), 'y': rng.choice(['p', 'q'], 80)})
+        df.loc[::7, 'a'] = np.nan
+        # Repeated rows land in different splits and chunks
+        df = pd.concat([df, df.iloc[:40]], ignore_index=True)
+        self.source = os.path.join(self.folder, 'data.csv')
+        df.to_csv(self.source, index=False)
+        split_dataset(self.folder, self.source, 0.6, 0.2, self.cache)
+        with open(os.path.join(self.folder, 'data_selected_columns.json'), 'w') as file:
+            json.dump({'label_column': 'y'}, file)
+        with open(os.path.join(self.folder, 'column_data_types.json'), 'w') as file:
+            json.dump({col: str(df[col].dtype) for col in df.columns}, file)
+        self.options = {'removeDuplicates': False, 'handleMissingValues': False,
+                        'encodeCategorical': True, 'featureScaling': 'normalization'}
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def assert_side_output_matches_files(self):
+        expected = calculate_metrics(read_csv_files(self.folder))
+        metrics = load_processed_metrics(self.folder)
+        self.assertEqual(metrics['num_rows'], expected['num_rows'])
+        self.assertEqual(metrics['duplicate_rows'], expected['duplicate_rows'])
+        self.assertGreater(metrics['duplicate_rows'], 0)
+        self.assertEqual(metrics['missing_values'], {col: int(count) for col, count in expected['missing_values'].items()})
+
+    def test_in_memory_processing_writes_metrics(self):
+        process_data(self.folder, self.options)
+        self.assert_side_output_matches_files()
+
+    def test_streaming_processing_writes_metrics(self):
+        process_data_streaming(self.folder, self.options, self.cache, chunk_size=25)
+        self.assert_side_output_matches_files()
+
+    def test_comparison_uses_cached_metrics(self):
+        process_data(self.folder, self.options)
+        uncached = data_comparison(self.folder, self.source)
+        cached = data_comparison(self.folder, self.source, self.cache)
+        self.assertEqual(cached['before']['duplicate_rows'], uncached['before']['duplicate_rows'])
+        self.assertEqual(cached['before']['missing_values'], {col: int(count) for col, count in uncached['before']['missing_values'].items()})
+        self.assertEqual(cached['after'], uncached['after'])
+
+        # Reprocessing replaces the processed files, so stale metrics are not served
+        process_data(self.folder, {**self.options, 'removeDuplicates': True})
+        self.assertEqual(load_processed_metrics(self.folder)['duplicate_rows'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from progress_channel import ProgressChannel
+
+class RecordingSocket:
+    def __init__(self):
+        self.messages = []
+
+    def emit(self, event, data, to=None):
+        self.messages.append((event, data, to))
+
+class TestProgressChannel(unittest.TestCase):
+    def setUp(self):
+        self.socket = RecordingSocket()
+        self.now = 0.0
+
+    def make_channel(self, total_epochs, **kwargs):
+        return ProgressChannel(self.socket, 'run', total_epochs, interval=1.0, clock=lambda: self.now, **kwargs)
+
+    def test_many_short_epochs_are_coalesced_without_losing_metrics(self):
+        channel = self.make_channel(1000)
+        for epoch in range(1, 1001):
+            self.now += 0.01
+            for batch in range(1, 4):
+                channel.report_batch(epoch, batch, 3, 0.5)
+            channel.report_epoch(epoch, {'accuracy': epoch / 1000})
+        channel.close()
+
+        # Ten seconds of training at one message per second
+        self.assertLessEqual(len(self.socket.messages), 12)
+        epochs = [record['epoch'] for _, data, _ in self.socket.messages for record in data['epochs']]
+        self.assertEqual(epochs, list(range(1, 1001)))
+        event, last, room = self.socket.messages[-1]
+        self.assertEqual((event, room), ('trainingProgress', 'run'))
+        self.assertEqual(last['progress'], 100.0)
+        self.assertEqual(last['metrics'], {'accuracy': 1.0})
+
+    def test_long_epoch_reports_batches(self):
+        channel = self.make_channel(2)
+        for batch in range(1, 101):
+            self.now += 0.1
+            channel.report_batch(1, batch, 100, 0.5)
+
+        # Updates within the first epoch, each at most once per interval
+        positions = [data['batch'] for _, data, _ in self.socket.messages]
+        self.assertGreater(len(positions), 5)
+        self.assertLessEqual(len(positions), 11)
+        self.assertAlmostEqual(self.socket.messages[-1][1]['progress'], positions[-1] / 100 * 50)
+        self.assertTrue(all(not data['epochs'] for _, data, _ in self.socket.messages))
+
+    def test_batch_updates_can_be_disabled(self):
+        channel = self.make_channel(1, batch_updates=False)
+        channel.report_batch(1, 1, 10, 0.5)
+        channel.close()
+        self.assertEqual(self.socket.messages, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import threading
+import time
+import unittest
+from unittest import mock
+import torch
+import torch.nn as nn
+import resource_manager
+from resource_manager import TrainingResources, clamp_workers, core_sets, parse_cpulist, plan_resources, plan_worker_resources, recommended_threads
+
+class TestResourceManager(unittest.TestCase):
+    def test_parse_cpulist(self):
+        self.assertEqual(parse_cpulist('0-3,8,10-11\n'), [0, 1, 2, 3, 8, 10, 11])
+
+    def test_core_sets_stay_on_one_node(self):
+        nodes = [list(range(0, 8)), list(range(8, 16))]
+        with mock.patch.object(resource_manager, 'numa_nodes', return_value=nodes):
+            sets = core_sets(4)
+        self.assertEqual(sets, [[0, 1, 2, 3], [8, 9, 10, 11], [4, 5, 6, 7], [12, 13, 14, 15]])
+        with mock.patch.object(resource_manager, 'numa_nodes', return_value=[[0, 1]]):
+            self.assertEqual(core_sets(3), [[0], [1], [0]])
+
+    def test_small_models_get_one_thread(self):
+        self.assertEqual(recommended_threads(nn.Linear(4, 2), 10, 64), 1)
+        self.assertEqual(recommended_threads(nn.Linear(1024, 1024), 64, 8), 8)
+        config = {'TRAINING_THREADS': 0, 'TRAINING_CPU_AFFINITY': ''}
+        with mock.patch.object(resource_manager, 'available_cores', return_value=list(range(8))):
+            self.assertEqual(plan_resources(config, nn.Linear(4, 2), 10, requested_threads=3).threads, 3)
+            # Requests are limited to the cores left after the reserved ones
+            self.assertEqual(plan_resources(config, nn.Linear(4, 2), 10, requested_threads=64).threads, 7)
+            self.assertEqual(plan_worker_resources(config, nn.Linear(4, 2), 10, 2, requested_threads='64')[0], 3)
+
+    def test_worker_requests_are_limited(self):
+        config = {'TRAINING_CPU_AFFINITY': '', 'TRAINING_MAX_WORKERS': 0}
+        with mock.patch.object(resource_manager, 'available_cores', return_value=list(range(8))):
+            self.assertEqual(clamp_workers(config, '3'), 3)
+            self.assertEqual(clamp_workers(config, 1000), 7)
+            self.assertEqual(clamp_workers({**config, 'TRAINING_MAX_WORKERS': 2}, 4), 2)
+            for workers in [0, -1]:
+                with self.assertRaises(ValueError):
+                    clamp_workers(config, workers)
+
+    def test_threads_are_restored_and_usage_reported(self):
+        previous = torch.get_num_threads()
+        with TrainingResources(1) as resources:
+            self.assertEqual(torch.get_num_threads(), 1)
+            torch.randn(200, 200) @ torch.randn(200, 200)
+        self.assertEqual(torch.get_num_threads(), previous)
+        self.assertEqual(resources.usage['threads'], 1)
+        self.assertGreater(resources.usage['wall_seconds'], 0)
+        self.assertGreaterEqual(resources.usage['utilization'], 0)
+        self.assertEqual(resources.usage['cpu_scope'], 'server')
+
+    def test_cpu_time_of_helper_threads_is_counted(self):
+        def spin():
+            end = time.perf_counter() + 0.2
+            while time.perf_counter() < end:
+                pass
+        with TrainingResources(2) as resources:
+            helper = threading.Thread(target=spin)
+            helper.start()
+            helper.join()
+        self.assertGreater(resources.usage['cpu_seconds'], 0.1)
+
+    def test_jobs_in_one_process_run_one_at_a_time(self):
+        order = []
+        def job(name):
+            with TrainingResources(1):
+                order.append(name)
+                time.sleep(0.05)
+                order.append(name)
+        threads = [threading.Thread(target=job, args=(name,)) for name in 'ab']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn(order, [['a', 'a', 'b', 'b'], ['b', 'b', 'a', 'a']])
+        # Cores are only pinned in a process dedicated to the job
+        self.assertIsNone(TrainingResources(1, [0]).cores)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from unittest import mock
+import row_index
+from row_index import build_row_index, filter_rows, parse_filter, read_rows
+
+class TestRowIndex(unittest.TestCase):
+    def setUp(self):
+        # Include quoted fields with embedded newlines, which must not be mistaken for row ends
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'data.csv')
+        self.df = pd.DataFrame({'i': np.arange(1000), 's': ['a,"b"\nc' if i % 7 == 0 else f'v{i}' for i in range(1000)]})
+        self.df.to_csv(self.path, index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_pages_match_full_read(self):
+        index = build_row_index(self.path, stride=64)
+        self.assertEqual(index.num_rows, 1000)
+        for offset, limit in [(0, 10), (63, 2), (640, 100), (990, 50)]:
+            page = read_rows(self.path, index, offset, limit, ['i', 's'])
+            expected = self.df.iloc[offset:offset + limit].reset_index(drop=True)
+            pd.testing.assert_frame_equal(page, expected)
+
+    def test_filters_and_projection(self):
+        filters = [parse_filter('i:gt:10'), parse_filter('s:contains:v')]
+        matches = [i for i in range(11, 1000) if i % 7]
+        page, total, has_more, complete = filter_rows(self.path, filters, 1, 2, ['i'])
+        self.assertEqual(page['i'].tolist(), [12, 13])
+        self.assertEqual(page.columns.tolist(), ['i'])
+        self.assertEqual((total, has_more, complete), (len(matches), True, True))
+
+        # The scan stops at the chunk after the page's last match, counting a lower bound
+        with mock.patch.object(row_index, 'FILTER_CHUNK_SIZE', 50):
+            page, total, has_more, complete = filter_rows(self.path, filters, 300, 20)
+            self.assertEqual(page['i'].tolist(), matches[300:320])
+            self.assertTrue(has_more)
+            self.assertFalse(complete)
+            self.assertGreater(total, 320)
+            self.assertLess(total, len(matches))
+            page, total, has_more, complete = filter_rows(self.path, filters, len(matches) - 5, 20)
+            self.assertEqual((page['i'].tolist(), total, has_more, complete), (matches[-5:], len(matches), False, True))
+        with self.assertRaisesRegex(ValueError, 'cannot be compared'):
+            filter_rows(self.path, [parse_filter('s:gt:3')], 0, 10)
+
+    def test_blank_lines_are_skipped_like_pandas(self):
+        with open(self.path, 'w') as file:
+            file.write('\n\ni,s\n' + ''.join(f'{i},v{i}\n' + ('\n  \r\n' if i % 5 == 0 else '') for i in range(100)) + '100,"x\n\ny"')
+        expected = pd.read_csv(self.path)
+        with mock.patch.object(row_index, 'SCAN_BLOCK_SIZE', 37):
+            index = build_row_index(self.path, stride=8)
+        self.assertEqual(index.num_rows, len(expected))
+        for offset, limit in [(0, 3), (4, 9), (50, 20), (95, 10)]:
+            pd.testing.assert_frame_equal(read_rows(self.path, index, offset, limit), expected.iloc[offset:offset + limit].reset_index(drop=True))
+
+    def test_filter_values_may_contain_colons(self):
+        self.assertEqual(parse_filter('time:eq:12:30'), ('time', 'eq', '12:30'))
+        self.assertEqual(parse_filter('a:b:contains:x'), ('a:b', 'contains', 'x'))
+        self.assertEqual(parse_filter('age:gt:30'), ('age', 'gt', 30))
+        with self.assertRaises(ValueError):
+            parse_filter('age:between:3')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import threading
+import time
+import unittest
+from unittest import mock
+import serve
+from serve import parse_args, worker_command
+from utils.native_threads import NativeThreads
+from utils.training_runs import TrainingRuns
+
+class TestServe(unittest.TestCase):
+    def tearDown(self):
+        TrainingRuns._runs.clear()
+        TrainingRuns._draining = False
+
+    def test_drain_waits_for_runs_and_refuses_new_ones(self):
+        self.assertTrue(TrainingRuns.start('a'))
+        finisher = threading.Timer(0.2, TrainingRuns.finish, args=('a',))
+        finisher.start()
+        started = time.monotonic()
+        self.assertTrue(TrainingRuns.drain(timeout=5))
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertFalse(TrainingRuns.start('b'))
+        self.assertEqual(TrainingRuns.active(), [])
+
+    def test_drain_times_out(self):
+        TrainingRuns.start('a')
+        self.assertFalse(TrainingRuns.drain(timeout=0.05))
+
+    def test_stop_accepting_does_not_wait(self):
+        TrainingRuns.start('a')
+        TrainingRuns.stop_accepting()
+        self.assertFalse(TrainingRuns.start('b'))
+        self.assertEqual(TrainingRuns.active(), ['a'])
+
+    def test_workers_need_a_message_queue(self):
+        self.assertEqual(parse_args([]).async_mode, 'threading')
+        with self.assertRaises(SystemExit):
+            parse_args(['--workers', '2'])
+        with mock.patch.object(serve.importlib.util, 'find_spec', return_value=None), self.assertRaises(SystemExit):
+            parse_args(['--workers', '2', '--message-queue', 'redis://localhost:6379/0'])
+        with mock.patch.object(serve.importlib.util, 'find_spec', return_value=object()):
+            args = parse_args(['--workers', '2', '--message-queue', 'redis://localhost:6379/0', '--async-mode', 'threading'])
+        command = worker_command(args, 1)
+        self.assertEqual(command[command.index('--worker-index') + 1], '1')
+        self.assertEqual(command[command.index('--message-queue') + 1], 'redis://localhost:6379/0')
+
+    def test_work_runs_in_the_calling_thread_without_monkey_patching(self):
+        socketio = mock.Mock()
+        self.assertIsNone(NativeThreads.green_library())
+        self.assertEqual(NativeThreads.run_emitting(socketio, lambda emitter, value: (emitter, value), 1), (socketio, 1))
+        self.assertEqual(NativeThreads.run(threading.get_ident), threading.get_ident())
+
+    def test_events_of_work_off_the_hub_are_relayed_in_order(self):
+        socketio = mock.Mock(sleep=time.sleep, start_background_task=lambda target: threading.Thread(target=target).start())
+        def work(emitter):
+            for i in range(20):
+                emitter.emit('trainingProgress', i, to='run')
+            return threading.get_ident()
+
+        def run_in_thread(target, *args):
+            result = []
+            thread = threading.Thread(target=lambda: result.append(target(*args)))
+            thread.start()
+            thread.join()
+            return result[0]
+
+        with mock.patch.object(NativeThreads, 'green_library', return_value='eventlet'), \
+             mock.patch.object(NativeThreads, 'run', side_effect=run_in_thread):
+            self.assertNotEqual(NativeThreads.run_emitting(socketio, work), threading.get_ident())
+        self.assertEqual([call.args[1] for call in socketio.emit.call_args_list], list(range(20)))
+
+if __name__ == '__main__':
+    unittest.main()
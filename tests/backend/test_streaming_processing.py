@@ -0,0 +1,59 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from data_processing import process_data
+from data_splitter import split_dataset
+from streaming_processing import RunningStats, process_data_streaming
+
+class TestStreamingProcessing(unittest.TestCase):
+    def setUp(self):
+        # Build a small dataset with missing values and duplicates spread over the three splits
+        self.folders = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'a': rng.normal(size=120), 'b': rng.integers(0, 4, 120),
+                           'c': rng.choice(['x', 'y'], 120), 'y': rng.choice(['p', 'q', 'r'], 120)})
+        df.loc[::9, 'a'] = np.nan
+        df = pd.concat([df, df.iloc[:15]])
+        for folder in self.folders:
+            source = os.path.join(folder, 'data.csv')
+            df.to_csv(source, index=False)
+            split_dataset(folder, source, 0.6, 0.2, os.path.join(folder, 'cache'))
+            with open(os.path.join(folder, 'data_selected_columns.json'), 'w') as file:
+                json.dump({'label_column': 'y'}, file)
+            with open(os.path.join(folder, 'column_data_types.json'), 'w') as file:
+                json.dump({col: str(df[col].dtype) for col in df.columns}, file)
+
+    def tearDown(self):
+        for folder in self.folders:
+            shutil.rmtree(folder)
+
+    def test_running_stats_match_full_pass(self):
+        values = np.random.default_rng(1).normal(size=(100, 3))
+        values[::7, 1] = np.nan
+        stats = RunningStats(3)
+        for start in range(0, 100, 13):
+            stats.update(values[start:start + 13])
+        np.testing.assert_allclose(stats.mean, np.nanmean(values, axis=0))
+        np.testing.assert_allclose(stats.variance, np.nanvar(values, axis=0))
+        np.testing.assert_allclose(stats.max, np.nanmax(values, axis=0))
+
+    def test_streaming_matches_in_memory_processing(self):
+        options = {'removeDuplicates': True, 'handleMissingValues': True,
+                   'encodeCategorical': True, 'featureScaling': 'standardization'}
+        in_memory, streaming = self.folders
+        process_data(in_memory, options)
+        process_data_streaming(streaming, options, os.path.join(streaming, 'cache'), chunk_size=17)
+
+        for name in ['processed_train', 'processed_val', 'processed_test', 'processed_y_train', 'processed_y_val', 'processed_y_test']:
+            expected = pd.read_csv(os.path.join(in_memory, f'{name}.csv'))
+            actual = pd.read_csv(os.path.join(streaming, f'{name}.csv'))
+            np.testing.assert_allclose(actual.values.astype(float), expected.values.astype(float))
+        with open(os.path.join(streaming, 'network_parameters.json')) as file:
+            self.assertEqual(json.load(file), {'num_cols': 3, 'num_label_classes': 3})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from data_processing import process_data
+from data_splitter import read_split_frames, split_dataset
+from label_column_selector import select_label_column
+from streaming_processing import process_data_streaming
+from typed_loader import infer_schema, pandas_dtypes
+
+class TestTypedLoader(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'a': rng.normal(size=90), 'b': rng.integers(-5, 5, 90), 'h': rng.integers(0, 8, 90) / 4,
+                           'c': rng.choice(['x', 'y', 'z'], 90), 'g': rng.choice([True, False], 90).astype(object),
+                           'y': rng.choice(['p', 'q'], 90)})
+        df.loc[::7, 'h'] = np.nan
+        df.loc[::9, 'c'] = np.nan
+        df.loc[::5, 'g'] = np.nan
+        self.df = pd.concat([df, df.iloc[:10]])
+        self.source = os.path.join(self.folder, 'data.csv')
+        self.df.to_csv(self.source, index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_infers_smallest_lossless_dtypes(self):
+        schema = infer_schema(self.source, chunk_size=16)
+        self.assertEqual(schema['dtypes'], {'a': 'float64', 'b': 'int8', 'h': 'float32', 'c': 'category',
+                                            'g': 'boolean', 'y': 'category'})
+        self.assertEqual(schema['categories'], {'c': ['x', 'y', 'z'], 'y': ['p', 'q']})
+
+        typed = pd.read_csv(self.source, dtype=pandas_dtypes(schema))
+        untyped = pd.read_csv(self.source)
+        for col in untyped.columns:
+            np.testing.assert_array_equal(typed[col].astype(object).where(typed[col].notna(), None),
+                                          untyped[col].astype(object).where(untyped[col].notna(), None))
+        self.assertLess(typed.memory_usage(deep=True).sum(), untyped.memory_usage(deep=True).sum() / 2)
+
+    def test_columns_with_mixed_chunks_stay_strings(self):
+        with open(self.source, 'w') as file:
+            file.write('v\n' + '1\n' * 20 + 'a\n' * 20)
+        self.assertEqual(infer_schema(self.source, chunk_size=10)['dtypes'], {'v': 'object'})
+
+    def test_typed_processing_matches_untyped_processing(self):
+        options = {'removeDuplicates': True, 'handleMissingValues': True,
+                   'encodeCategorical': True, 'featureScaling': 'standardization'}
+        untyped, typed, streaming = [os.path.join(self.folder, name) for name in ['untyped', 'typed', 'streaming']]
+        for folder in [untyped, typed, streaming]:
+            os.makedirs(folder)
+            split_dataset(folder, self.source, 0.6, 0.2, os.path.join(folder, 'cache'))
+        with open(os.path.join(untyped, 'data_selected_columns.json'), 'w') as file:
+            json.dump({'label_column': 'y'}, file)
+        with open(os.path.join(untyped, 'column_data_types.json'), 'w') as file:
+            json.dump({col: str(dtype) for col, dtype in pd.read_csv(self.source).dtypes.items()}, file)
+        for folder in [typed, streaming]:
+            self.assertEqual(select_label_column(folder, self.source, 'y', None, os.path.join(folder, 'cache'))[1], 200)
+        self.assertEqual(read_split_frames(typed)[0]['c'].dtype, 'category')
+
+        process_data(untyped, options)
+        process_data(typed, options)
+        process_data_streaming(streaming, options, os.path.join(streaming, 'cache'), chunk_size=17)
+        for name in ['processed_train', 'processed_val', 'processed_test', 'processed_y_train', 'processed_combined_y']:
+            expected = pd.read_csv(os.path.join(untyped, f'{name}.csv'))
+            pd.testing.assert_frame_equal(pd.read_csv(os.path.join(typed, f'{name}.csv')), expected)
+            actual = pd.read_csv(os.path.join(streaming, f'{name}.csv'))
+            if name.startswith('processed_y') or name == 'processed_combined_y':
+                pd.testing.assert_frame_equal(actual, expected)
+            else:
+                np.testing.assert_allclose(actual.values.astype(float), expected.values.astype(float))
+
+if __name__ == '__main__':
+    unittest.main()